@@ -1,368 +1,223 @@
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-import pymysql
+import plotly.io as pio
 from pymysql.err import Error
 import numpy as np
+import io
+import threading
+import time
+
+from securecheck import (backends, config, db, frame_cache, loader, logbook, overview, partitions, report, rollups,
+                         shared)
+from securecheck.approx import ApproxIndex
+from securecheck.catalog import get_queries, iter_queries
+from securecheck.data import CSV_PATH, DURATION_MAP
+from securecheck.predict import OutcomeIndex
+from securecheck.profiling import QueryProfiler
+from securecheck.jobs import QueryJob, QueryRunner
+from securecheck.result_cache import ResultCache
+from securecheck.scan import SharedScan
+from securecheck.stream import stream_csv
+from securecheck.vehicles import TOP_VIEWS, VehicleIndex
+
+# The first start after the CSV changes streams it into the cache in chunks
+if not frame_cache.is_cached(CSV_PATH):
+    progress_bar = st.progress(0.0, text="Building the columnar cache...")
+    frame_cache.build(CSV_PATH, progress=lambda p: progress_bar.progress(p.fraction, text=p.describe()))
+    progress_bar.empty()
+
+# Changes whenever the CSV or the cleaning code does; publishes the shared
+# frame for it if no process has yet
+def data_version():
+    return shared.ensure(CSV_PATH)
+
+# Every server process (and app.py) maps the same read-only frame instead of
+# holding its own copy; the next version is attached on the first rerun
+# after it is published
+@st.cache_resource(max_entries=1)
+def attach_data(version):
+    return shared.attach(version, CSV_PATH)
 
-@st.cache_data
 def load_data():
-    df = pd.read_csv('C:/Users/vikiy/Downloads/traffic_stops - traffic_stops_with_vehicle_number (1).csv')
-    
-    df['search_type'] = df['search_type'].fillna('Unknown')
-    
-    df['stop_date'] = pd.to_datetime(df['stop_date']).dt.date
-    df['stop_time'] = df['stop_time'].apply(lambda x: f"{x}:00:00" if len(str(x)) <= 2 else x)
-    df['stop_time'] = pd.to_datetime(df['stop_time'], format='%H:%M:%S').dt.time  
-    
-    string_cols = ['country_name', 'driver_race', 'violation_raw', 'violation', 'stop_outcome', 'vehicle_number', 'search_type', 'driver_gender']
-    for x in string_cols:
-        df[x] = df[x].astype(str)
-        df[x] = df[x].str.strip()
-    
-    df['driver_gender'] = df['driver_gender'].replace({'M': 1, "F": 0})
-    bool_cols = ['search_conducted', 'is_arrested', 'drugs_related_stop']
-    for col in bool_cols:
-        df[col] = df[col].replace({True: 1, False: 0})
-    duration_map = {'0-15 Min': 1, '16-30 Min': 2, '30+ Min': 3}
-    df['stop_duration'] = df['stop_duration'].map(duration_map)
-    return df
-
-df = load_data()
-
-# Simple MySQL connection
-def get_db_connection():
-    try:
-        return pymysql.connect(
-            host='localhost', database='police_logs', user='root', 
-            password='admin', charset='utf8mb4',
-            cursorclass=pymysql.cursors.DictCursor
-        )
-    except Error:
-        st.error("Database connection failed")
-        return None
+    return attach_data(data_version())
+
+# Logs saved from the Prediction form: journaled, then group-committed to MySQL.
+# Everything built from df below subscribes, so new logs are folded in place.
+@st.cache_resource
+def get_log_writer():
+    return logbook.LogWriter(pool=get_pool() if config.BACKEND == 'mysql' else None)
+
+# Overview aggregates are answered from this cube instead of scanning df
+@st.cache_resource(max_entries=1)
+def get_cube(version):
+    cube = rollups.Cube(attach_data(version))
+    get_log_writer().subscribe(cube.update)
+    return cube
+
+# Row offsets per month of stop_date: a date range only reads the months it overlaps
+@st.cache_resource(max_entries=1)
+def get_month_index(version):
+    months = partitions.MonthIndex(attach_data(version))
+    get_log_writer().subscribe(months.update)
+    return months
+
+# Stratified sample and vehicle sketches for the approximate mode, grown as logs are saved
+@st.cache_resource(max_entries=1)
+def get_approx_index(version):
+    index = ApproxIndex(attach_data(version))
+    get_log_writer().subscribe(index.update)
+    return index
+
+# Preview, metrics and chart tables, computed once per data version, number
+# of logged rows, date range and mode; a range builds its own cube from its months
+@st.cache_data(max_entries=4)
+def overview_summary(version, logged_rows, date_range=None, approximate=False):
+    if approximate:
+        return overview.summarize_sample(get_approx_index(version), date_range)
+    if date_range is None:
+        return overview.summarize(attach_data(version), get_cube(version).frame, vehicles=get_vehicle_index(version))
+    rows = get_month_index(version).frame(date_range)
+    return overview.summarize(rows, rollups.build_cube(rows))
+
+# Charts are cached as Plotly JSON and only built for the tab being shown
+@st.cache_data(max_entries=12)
+def overview_figure(version, logged_rows, tab, date_range=None, approximate=False):
+    fig = overview.build_figure(tab, overview_summary(version, logged_rows, date_range, approximate))
+    return None if fig is None else fig.to_json()
+
+# Run All answers the queries sharing a GROUP BY key in one pass over df
+@st.cache_resource(max_entries=1)
+def get_shared_scan(version):
+    scan = SharedScan(attach_data(version))
+    get_log_writer().subscribe(scan.append)
+    return scan
+
+# Prediction page lookups: built once per data version, then O(1) per form submit
+@st.cache_resource(max_entries=1)
+def get_outcome_index(version):
+    index = OutcomeIndex(attach_data(version))
+    get_log_writer().subscribe(index.update)
+    return index
+
+# Plate lookups for the Vehicles page: a hash index over df, updated as logs are saved
+@st.cache_resource(max_entries=1)
+def get_vehicle_index(version):
+    index = VehicleIndex(attach_data(version))
+    get_log_writer().subscribe(index.update)
+    return index
+
+# One connection pool per server process, shared by every session.
+# Host, credentials and pool size come from securecheck.config.
+@st.cache_resource
+def get_pool():
+    return db.ConnectionPool()
+
+# Loads the CSV into MySQL once per server process instead of on every rerun;
+# the loader skips the file when its fingerprint is unchanged and otherwise
+# only upserts new or changed rows. Use `python -m securecheck.loader` to
+# load outside the app.
+@st.cache_resource(show_spinner="Syncing traffic_stops with the source CSV...")
+def sync_ledger():
+    with get_pool().connection() as conn:
+        summary = loader.sync_source(conn, CSV_PATH)
+    warm_result_cache(get_backend(), get_result_cache())
+    return summary
+
+# Catalog queries run on MySQL or, with SECURECHECK_BACKEND=duckdb, in-process
+# over the cleaned frame without needing a server
+@st.cache_resource(show_spinner="Opening the analytics backend...")
+def get_backend():
+    if config.BACKEND == 'duckdb':
+        backend = backends.DuckDBBackend.from_source(CSV_PATH, load_data())
+        get_log_writer().subscribe(backend.append)
+        warm_result_cache(backend, get_result_cache())
+        return backend
+    return backends.open_backend(config.BACKEND, pool=get_pool())
+
+# Catalog results shared by all sessions until the data version changes
+@st.cache_resource
+def get_result_cache():
+    return ResultCache()
+
+# Timings of every catalog query run, for the diagnostics panel and slow-query log
+@st.cache_resource
+def get_profiler():
+    return QueryProfiler()
+
+def warm_result_cache(backend, cache):
+    profiler = get_profiler()
+    # Runs in the background so the first page render isn't held up
+    def warm():
+        try:
+            version = backend.data_version()
+            queries = [(name, backend.route(name, sql)) for _, name, sql in iter_queries()]
+            cache.warm(queries, version, lambda name, sql: profiler.run(backend, name, sql))
+        except backends.BackendError:
+            pass
+    threading.Thread(target=warm, daemon=True).start()
 
 def create_simple_table():
-    conn = get_db_connection()
-    if not conn:
-        return
     try:
-        with conn.cursor() as cursor:
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS traffic_stops (
-                    stop_date DATE,
-                    stop_time TIME,
-                    country_name VARCHAR(100),
-                    driver_gender TINYINT(1),
-                    driver_age_raw INT,
-                    driver_age INT,
-                    driver_race VARCHAR(100),
-                    violation_raw VARCHAR(100),
-                    violation VARCHAR(100),
-                    search_conducted TINYINT(1),
-                    search_type VARCHAR(100),
-                    stop_outcome VARCHAR(100),
-                    is_arrested TINYINT(1),
-                    stop_duration TINYINT(1),
-                    drugs_related_stop TINYINT(1),
-                    vehicle_number VARCHAR(50),
-                    INDEX idx_vehicle (vehicle_number),
-                    INDEX idx_date (stop_date),
-                    INDEX idx_time (stop_time)
-                )
-            """)
-            
-            cursor.execute("TRUNCATE TABLE traffic_stops")
-            
-            # Insert data directly
-            data = [tuple(row) for row in df[[
-                'stop_date', 'stop_time', 'country_name', 'driver_gender', 
-                'driver_age_raw', 'driver_age', 'driver_race', 'violation_raw',
-                'violation', 'search_conducted', 'search_type', 'stop_outcome',
-                'is_arrested', 'stop_duration', 'drugs_related_stop', 'vehicle_number'
-            ]].values]
-            
-            insert_query = """
-                INSERT INTO traffic_stops VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-            """
-            cursor.executemany(insert_query, data)
-            conn.commit()
-    except Error as e:
+        return sync_ledger()
+    except (Error, db.PoolTimeout) as e:
         st.error(f"Table creation/loading error: {e}")
-    finally:
-        conn.close()
 
-create_simple_table()
+if config.BACKEND == 'mysql':
+    create_simple_table()
 
 def execute_query(sql):
-    conn = get_db_connection()
-    if not conn:
+    try:
+        return get_backend().run(sql)
+    except backends.BackendError as e:
+        st.error(f"Query error: {e}")
         return pd.DataFrame()
+
+# Worker threads for the Queries page, so a long query doesn't block the session
+@st.cache_resource
+def get_query_runner():
+    return QueryRunner(get_backend())
+
+def catalog_sql(backend, name, sql, date_range):
+    # The rollups cover the whole history, so a date range runs the base query
+    # over just the rows (on a partitioned table, the partitions) in range
+    if date_range is None:
+        return name, backend.route(name, sql)
+    return f"{name} [{date_range.describe()}]", partitions.restrict(sql, date_range)
+
+def start_catalog_query(name, sql, date_range=None):
+    # A cached result comes back as-is; otherwise a QueryJob streams it in the background
+    backend = get_backend()
+    cache = get_result_cache()
+    profiler = get_profiler()
+    version = backend.data_version()
+    name, sql = catalog_sql(backend, name, sql, date_range)
+    cached = cache.get(name, version)
+    if cached is not None:
+        return cached
+
+    def finished(job):
+        if job.status == 'done':
+            cache.put(name, version, job.result())
+            profiler.record(name, backend.name, job.stats())
+
+    return get_query_runner().submit(name, sql, on_done=finished)
+
+def execute_catalog_query(name, sql, explain=False, date_range=None):
+    # On MySQL, aggregates are read from the rollup tables the loader keeps current
+    backend = get_backend()
+    name, sql = catalog_sql(backend, name, sql, date_range)
+    profiler = get_profiler()
     try:
-        with conn.cursor() as cursor:
-            cursor.execute(sql)
-            return pd.DataFrame(cursor.fetchall())
-    except Error as e:
+        version = backend.data_version()
+        if explain:
+            # A plan needs a real run, so skip the cached result
+            result = profiler.run(backend, name, sql, explain=True)
+            get_result_cache().put(name, version, result)
+            return result
+        return get_result_cache().get_or_run(name, version, lambda: profiler.run(backend, name, sql))
+    except backends.BackendError as e:
         st.error(f"Query error: {e}")
         return pd.DataFrame()
-    finally:
-        conn.close()
-
-# Define all queries in exact order
-def get_queries():
-    return {
-        "Vehicle-Based": {
-            "Top 10 vehicle numbers involved in drug-related stops": """
-                SELECT vehicle_number, COUNT(*) AS count 
-                FROM traffic_stops 
-                WHERE drugs_related_stop = 1 
-                GROUP BY vehicle_number 
-                LIMIT 10
-            """,
-            "Vehicles most frequently searched": """
-                SELECT vehicle_number, COUNT(*) AS count 
-                FROM traffic_stops 
-                WHERE search_conducted = 1 
-                GROUP BY vehicle_number 
-                ORDER BY count DESC 
-                LIMIT 10
-            """
-        },
-        "Demographic-Based": {
-            "Driver age group with highest arrest rate": """
-                WITH age_groups AS (
-                    SELECT 
-                        CASE 
-                            WHEN driver_age < 20 THEN 'Under 20'
-                            WHEN driver_age BETWEEN 20 AND 29 THEN '20-29'
-                            WHEN driver_age BETWEEN 30 AND 39 THEN '30-39'
-                            WHEN driver_age BETWEEN 40 AND 49 THEN '40-49'
-                            WHEN driver_age BETWEEN 50 AND 59 THEN '50-59'
-                            WHEN driver_age BETWEEN 60 AND 69 THEN '60-69'
-                            WHEN driver_age >= 70 THEN '70+'
-                            ELSE 'Unknown'
-                        END AS age_group,
-                        is_arrested
-                    FROM traffic_stops
-                )
-                SELECT age_group, 
-                       ROUND(100.0 * SUM(is_arrested) / COUNT(*), 2) AS arrest_rate
-                FROM age_groups
-                GROUP BY age_group
-                ORDER BY arrest_rate DESC
-                LIMIT 1
-            """,
-            "Gender distribution of drivers stopped in each country": """
-                SELECT 
-                    country_name, 
-                    CASE 
-                        WHEN driver_gender = 0 THEN 'female' 
-                        WHEN driver_gender = 1 THEN 'male' 
-                        ELSE 'unknown' 
-                    END AS driver_gender,
-                    driver_race, 
-                    ROUND(AVG(driver_age), 1) AS avg_age, 
-                    COUNT(*) AS total_stops 
-                FROM traffic_stops 
-                GROUP BY country_name, driver_race, driver_gender 
-                ORDER BY country_name, total_stops DESC;
-            """,
-            "Race and gender combination with highest search rate": """
-                SELECT 
-                    driver_race, 
-                    CASE 
-                        WHEN driver_gender = 0 THEN 'female' 
-                        WHEN driver_gender = 1 THEN 'male' 
-                        ELSE 'unknown' 
-                    END AS driver_gender,
-                    ROUND(100.0 * SUM(search_conducted) / COUNT(*), 2) AS search_rate 
-                FROM traffic_stops 
-                GROUP BY driver_race, driver_gender 
-                ORDER BY search_rate DESC 
-                LIMIT 1
-            """
-        },
-        "Time & Duration Based": {
-            "Time of day with most traffic stops": """
-                SELECT HOUR(stop_time) AS hour, COUNT(*) AS count 
-                FROM traffic_stops 
-                GROUP BY hour 
-                ORDER BY count DESC 
-                LIMIT 1
-            """,
-            "Average stop duration for different violations": """
-                WITH duration_map AS (
-                    SELECT violation,
-                           CASE 
-                               WHEN stop_duration = 1 THEN 7.5
-                               WHEN stop_duration = 2 THEN 23
-                               WHEN stop_duration = 3 THEN 45
-                               ELSE 0
-                           END AS duration_min
-                    FROM traffic_stops
-                )
-                SELECT violation, AVG(duration_min) AS avg_duration
-                FROM duration_map
-                GROUP BY violation
-                ORDER BY avg_duration DESC
-            """,
-            "Stops more likely to lead to arrests": """
-                WITH time_period AS (
-                    SELECT 
-                        CASE 
-                            WHEN HOUR(stop_time) BETWEEN 20 AND 23 
-                                 OR HOUR(stop_time) BETWEEN 0 AND 5 THEN 'Night'
-                            ELSE 'Day'
-                        END AS period,
-                        is_arrested
-                    FROM traffic_stops
-                )
-                SELECT period, 
-                       ROUND(100.0 * SUM(is_arrested) / COUNT(*), 2) AS arrest_rate
-                FROM time_period
-                GROUP BY period
-            """
-        },
-        "Violation-Based": {
-            "Violations most associated with searches or arrests": """
-                SELECT violation, 
-                       ROUND(100.0 * SUM(search_conducted OR is_arrested) / COUNT(*), 2) AS association_rate 
-                FROM traffic_stops 
-                GROUP BY violation 
-                ORDER BY association_rate DESC
-            """,
-            "Violations most common among younger drivers (<25)": """
-                SELECT violation, COUNT(*) AS count 
-                FROM traffic_stops 
-                WHERE driver_age < 25 
-                GROUP BY violation 
-                ORDER BY count DESC
-            """,
-            "Violation that rarely results in search or arrest": """
-                SELECT violation, 
-                       ROUND(100.0 * SUM(search_conducted OR is_arrested) / COUNT(*), 2) AS rate 
-                FROM traffic_stops 
-                GROUP BY violation 
-                ORDER BY rate ASC 
-                LIMIT 1
-            """
-        },
-        "Location-Based": {
-            "Countries with highest rate of drug-related stops": """
-                SELECT country_name, 
-                       ROUND(100.0 * SUM(drugs_related_stop) / COUNT(*), 2) AS drug_rate 
-                FROM traffic_stops 
-                GROUP BY country_name 
-                ORDER BY drug_rate DESC
-            """,
-            "Arrest rate by country and violation": """
-                SELECT country_name, violation, 
-                       ROUND(100.0 * SUM(is_arrested) / COUNT(*), 2) AS arrest_rate 
-                FROM traffic_stops 
-                GROUP BY country_name, violation 
-                ORDER BY country_name, arrest_rate DESC
-            """,
-            "Country with most stops with search conducted": """
-                SELECT country_name, SUM(search_conducted) AS search_count 
-                FROM traffic_stops 
-                GROUP BY country_name 
-                ORDER BY search_count DESC 
-                LIMIT 1
-            """
-        },
-        "Complex": {
-            "Yearly Breakdown of Stops and Arrests by Country": """
-                SELECT 
-                    country_name, 
-                    year,
-                    total_stops,
-                    total_arrests,
-                    arrest_rate,
-                    RANK() OVER (PARTITION BY year ORDER BY total_stops DESC) AS rank_by_stops
-                FROM (
-                    SELECT 
-                        country_name, 
-                        EXTRACT(YEAR FROM stop_date) AS year, 
-                        COUNT(*) AS total_stops, 
-                        SUM(is_arrested) AS total_arrests,
-                        ROUND(SUM(is_arrested)*100.0 / COUNT(*), 2) AS arrest_rate
-                    FROM traffic_stops
-                    GROUP BY country_name, year
-                ) AS yearly_data
-                ORDER BY year, total_stops DESC
-            """,
-            "Driver Violation Trends Based on Age and Race": """
-                SELECT d.driver_race, d.driver_age_group, v.violation, v.total_cases
-                FROM (
-                    SELECT driver_race,
-                           CASE 
-                               WHEN driver_age < 25 THEN '<25'
-                               WHEN driver_age BETWEEN 25 AND 40 THEN '25-40'
-                               WHEN driver_age BETWEEN 41 AND 60 THEN '41-60'
-                               ELSE '>60'
-                           END AS driver_age_group,
-                           violation,
-                           COUNT(*) AS total_cases
-                    FROM traffic_stops
-                    GROUP BY driver_race, driver_age_group, violation
-                ) v
-                JOIN (
-                    SELECT DISTINCT driver_race,
-                           CASE 
-                               WHEN driver_age < 25 THEN '<25'
-                               WHEN driver_age BETWEEN 25 AND 40 THEN '25-40'
-                               WHEN driver_age BETWEEN 41 AND 60 THEN '41-60'
-                               ELSE '>60'
-                           END AS driver_age_group
-                    FROM traffic_stops
-                ) d
-                ON v.driver_race = d.driver_race AND v.driver_age_group = d.driver_age_group
-                ORDER BY v.total_cases DESC
-            """,
-            "Time Period Analysis of Stops": """
-                SELECT EXTRACT(YEAR FROM stop_date) AS year, 
-                       EXTRACT(MONTH FROM stop_date) AS month, 
-                       HOUR(stop_time) AS hour, 
-                       COUNT(*) AS count 
-                FROM traffic_stops 
-                GROUP BY year, month, hour 
-                ORDER BY year, month, hour
-            """,
-            "Violations with High Search and Arrest Rates": """
-                SELECT violation,
-                       ROUND(SUM(search_conducted)*100.0 / COUNT(*), 2) AS search_rate,
-                       ROUND(SUM(is_arrested)*100.0 / COUNT(*), 2) AS arrest_rate,
-                       RANK() OVER (ORDER BY SUM(is_arrested) DESC) AS rank_by_arrests
-                FROM traffic_stops
-                GROUP BY violation
-                HAVING search_rate > 10 OR arrest_rate > 10
-                ORDER BY rank_by_arrests
-            """,
-            "Driver Demographics by Country": """
-                SELECT 
-                    country_name, 
-                    CASE 
-                        WHEN driver_gender = 0 THEN 'female' 
-                        WHEN driver_gender = 1 THEN 'male' 
-                        ELSE 'unknown' 
-                    END AS driver_gender, 
-                    driver_race, 
-                    ROUND(AVG(driver_age), 1) AS avg_age, 
-                    COUNT(*) AS total_stops 
-                FROM traffic_stops 
-                GROUP BY country_name, driver_race, driver_gender 
-                ORDER BY country_name, total_stops DESC
-            """,
-            "Top 5 Violations with Highest Arrest Rates": """
-                SELECT violation, 
-                       ROUND(SUM(is_arrested)*100.0 / COUNT(*), 2) AS arrest_rate 
-                FROM traffic_stops 
-                GROUP BY violation 
-                ORDER BY arrest_rate DESC 
-                LIMIT 5
-            """
-        }
-    }
 
 st.sidebar.title("🚦 Traffic Stops Analytics")
 
@@ -373,70 +228,71 @@ if st.sidebar.button("🔍 Queries", use_container_width=True):
     st.session_state.page = "Queries" 
 if st.sidebar.button("🎯 Prediction", use_container_width=True):
     st.session_state.page = "Prediction"
+if st.sidebar.button("🚗 Vehicles", use_container_width=True):
+    st.session_state.page = "Vehicles"
+if st.sidebar.button("📥 Ingest", use_container_width=True):
+    st.session_state.page = "Ingest"
 
 # Initialize session state
 if 'page' not in st.session_state:
     st.session_state.page = "Overview"
 
+# Date range honored by the Overview aggregates and the catalog queries
+first_date, last_date = get_month_index(data_version()).bounds()
+period = st.sidebar.selectbox("Date Range", [*partitions.PRESETS, "Custom"])
+if period == "Custom":
+    picked = st.sidebar.date_input("From / To", (first_date, last_date), min_value=first_date, max_value=last_date)
+    # Until the second date is picked the range is still open-ended
+    date_range = partitions.DateRange(*picked) if len(picked) == 2 else partitions.DateRange(*picked[:1])
+else:
+    date_range = partitions.preset(period, last_date)
+if date_range:
+    st.sidebar.caption(f"Stops from {date_range.describe()}")
+
 # Overview Page
 if st.session_state.page == "Overview":
     st.title("Traffic Stops Overview")
+    version = data_version()
+    logged_rows = get_log_writer().rows
+    # Approximate figures come from a fixed-size sample; switch back to check them
+    approximate = st.radio("Mode", ["Exact", "Approximate"], horizontal=True) == "Approximate"
+    summary = overview_summary(version, logged_rows, date_range, approximate)
+
+    def shown(name, value):
+        # Estimates carry their 95% margin
+        return value if summary.margins is None else f"{value:,} ± {summary.margins[name]:,}"
 
     # Data Table Preview
     st.header("Data Preview")
     st.write("Sample of the traffic stops dataset (first 10 rows):")
-    preview_cols = ['stop_date', 'stop_time', 'country_name', 'driver_gender', 'driver_age', 'driver_race', 'violation', 'stop_outcome']
-    preview_df = df[preview_cols].head(10)
-    preview_df['driver_gender'] = preview_df['driver_gender'].replace({1: 'Male', 0: 'Female'})
-    st.dataframe(preview_df, use_container_width=True)
+    st.dataframe(summary.preview, use_container_width=True)
 
     # Key Metrics Dashboard
     st.header("Key Metrics")
-    col1, col2, col3, col4 = st.columns(4)
+    col1, col2, col3, col4, col5 = st.columns(5)
     with col1:
-        total_stops = df.shape[0]
-        st.metric("Total Stops", total_stops)
+        st.metric("Total Stops", shown('total_stops', summary.total_stops))
     with col2:
-        arrest_rate = round(100 * df['is_arrested'].mean(), 2)
-        st.metric("Arrest Rate (%)", arrest_rate)
+        st.metric("Arrest Rate (%)", shown('arrest_rate', summary.arrest_rate))
     with col3:
-        search_rate = round(100 * df['search_conducted'].mean(), 2)
-        st.metric("Search Rate (%)", search_rate)
+        st.metric("Search Rate (%)", shown('search_rate', summary.search_rate))
     with col4:
-        avg_age = round(df['driver_age'].mean(), 1)
-        st.metric("Average Driver Age", avg_age)
+        st.metric("Average Driver Age", shown('avg_age', summary.avg_age))
+    with col5:
+        st.metric("Distinct Vehicles", shown('distinct_vehicles', summary.distinct_vehicles))
+    if approximate:
+        st.caption("Estimated from a stratified sample per country and violation, distinct vehicles from "
+                   "HyperLogLog sketches and the most stopped vehicles (over all dates) from a count-min "
+                   "sketch; ± is a 95% confidence interval.")
 
-    # Visual Insights
+    # Visual Insights: only the selected chart is rendered (st.tabs would draw all three)
     st.header("Visual Insights")
-    tab1, tab2, tab3 = st.tabs(["Geographical Distribution", "Violation Breakdown", "Demographic Insights"])
-
-    with tab1:
-        if not df.empty and 'country_name' in df.columns:
-            country_data = df['country_name'].value_counts().reset_index()
-            country_data.columns = ['Country', 'Count']
-            fig = px.bar(country_data, x='Country', y='Count', title="Stops by Country", color="Country", text='Count')
-            st.plotly_chart(fig, use_container_width=True)
-        else:
-            st.warning("No data available for Country chart.")
-
-    with tab2:
-        if not df.empty and 'violation' in df.columns:
-            violation_data = df['violation'].value_counts().reset_index()
-            violation_data.columns = ['Violation', 'Count']
-            fig = px.pie(violation_data, names='Violation', values='Count', title="Violation Breakdown")
-            st.plotly_chart(fig, use_container_width=True)
-        else:
-            st.warning("No data available for Violation chart.")
-
-    with tab3:
-        if not df.empty and 'driver_gender' in df.columns and 'driver_race' in df.columns:
-            demo_data = df.groupby(['driver_gender', 'driver_race']).size().reset_index(name='Count')
-            demo_data['driver_gender'] = demo_data['driver_gender'].replace({1: 'Male', 0: 'Female'})
-            fig = px.bar(demo_data, x='driver_race', y='Count', color='driver_gender', barmode='group',
-                         title="Stops by Gender and Race", text='Count')
-            st.plotly_chart(fig, use_container_width=True)
-        else:
-            st.warning("No data available for Demographic chart.")
+    tab = st.radio("Chart", overview.TABS, horizontal=True, label_visibility="collapsed")
+    fig_json = overview_figure(version, logged_rows, tab, date_range, approximate)
+    if fig_json:
+        st.plotly_chart(pio.from_json(fig_json), use_container_width=True)
+    else:
+        st.warning(f"No data available for the {tab} chart.")
 
 # Queries Page
 elif st.session_state.page == "Queries":
@@ -452,18 +308,111 @@ elif st.session_state.page == "Queries":
     queries_in_category = queries[selected_category]
     selected_query = st.selectbox("Select Query", list(queries_in_category.keys()))
 
-    # Query execution block
+    explain = st.checkbox("Capture EXPLAIN ANALYZE (runs the query a second time)")
+
+    # Query execution block: runs in the background and streams its rows in
     if st.button("Execute Query"):
         sql = queries_in_category[selected_query]
-        st.subheader(selected_query)
-    
-        with st.spinner("Running query..."):
-            result_df = execute_query(sql)
-        
-            if not result_df.empty:
-                st.dataframe(result_df, use_container_width=True)
-            else:
-                st.warning("No results returned from query")
+        st.session_state.query_name = selected_query
+        if explain:
+            with st.spinner("Running query..."):
+                st.session_state.query_run = execute_catalog_query(selected_query, sql, explain, date_range)
+        else:
+            try:
+                st.session_state.query_run = start_catalog_query(selected_query, sql, date_range)
+            except backends.BackendError as e:
+                st.error(f"Query error: {e}")
+                st.session_state.query_run = pd.DataFrame()
+
+    run = st.session_state.get('query_run')
+    if run is not None:
+        st.subheader(st.session_state.query_name)
+        status = st.empty()
+        table = st.empty()
+        if isinstance(run, QueryJob):
+            # Clicking Cancel reruns the script, which ends the polling loop below
+            if not run.done and st.button("Cancel Query"):
+                run.cancel()
+            while not run.done:
+                status.info(f"Running for {run.elapsed:.1f}s, {run.rows:,} rows so far...")
+                table.dataframe(run.head(100), use_container_width=True)
+                time.sleep(0.25)
+            status.empty()
+            if run.status == 'failed':
+                st.error(f"Query error: {run.error}")
+            elif run.status != 'done':
+                st.warning(f"Query {run.status} after {run.elapsed:.1f}s; showing the {run.rows:,} rows received.")
+            result_df = run.result()
+        else:
+            result_df = run
+
+        if not result_df.empty:
+            table.dataframe(result_df, use_container_width=True)
+        elif not isinstance(run, QueryJob) or run.status == 'done':
+            st.warning("No results returned from query")
+
+    # Run all: every catalog query at once, as one downloadable report
+    st.subheader("Catalog Report")
+    if st.button("Run All Queries"):
+        backend = get_backend()
+        try:
+            version = backend.data_version()
+        except backends.BackendError as e:
+            st.error(f"Query error: {e}")
+        else:
+            cache = get_result_cache()
+            profiler = get_profiler()
+            progress_bar = st.progress(0.0)
+            done = []
+
+            def show_progress(entry):
+                done.append(entry)
+                progress_bar.progress(len(done) / len(list(iter_queries())), text=f"Finished: {entry.name}")
+
+            def run(name, sql):
+                key, sql = catalog_sql(backend, name, sql, date_range)
+                return cache.get_or_run(key, version, lambda: profiler.run(backend, key, sql))
+
+            started = time.perf_counter()
+            # The shared scan covers the whole history, so a date range runs every query on its own
+            st.session_state.report = report.run_catalog(
+                run, progress=show_progress, scan=None if date_range else get_shared_scan(data_version()))
+            st.session_state.report_seconds = time.perf_counter() - started
+            progress_bar.empty()
+
+    entries = st.session_state.get('report')
+    if entries:
+        slowest = max(e.seconds for e in entries)
+        st.caption(f"{len(entries)} queries in {st.session_state.report_seconds:.2f}s "
+                   f"(slowest {slowest:.2f}s, {sum(e.seconds for e in entries):.2f}s if run one by one)")
+        st.dataframe(report.summary(entries), use_container_width=True)
+        col1, col2 = st.columns(2)
+        col1.download_button("Download HTML", report.write_html(entries), "catalog_report.html", "text/html")
+        if report.excel_available():
+            workbook = io.BytesIO()
+            report.write_excel(entries, workbook)
+            col2.download_button("Download Excel", workbook.getvalue(), "catalog_report.xlsx")
+
+    stats = get_result_cache().stats()
+    st.caption(f"Result cache: {stats['hits']} hits, {stats['misses']} misses, {stats['entries']} cached")
+
+    # Diagnostics: latency over the recent runs of each query
+    profiler = get_profiler()
+    with st.expander("Diagnostics"):
+        last_run = profiler.last(selected_query)
+        if last_run:
+            col1, col2, col3, col4 = st.columns(4)
+            col1.metric("Wall Time (ms)", f"{last_run.seconds * 1000:,.1f}")
+            col2.metric("Connection Wait (ms)", f"{last_run.acquire_seconds * 1000:,.1f}")
+            col3.metric("Rows", f"{last_run.rows:,}")
+            col4.metric("Result Size (KB)", f"{last_run.bytes / 1024:,.1f}")
+            if last_run.plan:
+                st.code(last_run.plan)
+        else:
+            st.write("This query has not run since the server started; cached results are not timed.")
+        st.dataframe(profiler.summary(), use_container_width=True)
+        st.caption(f"Runs over {profiler.slow_seconds:g}s are logged as slow queries "
+                   "(SECURECHECK_SLOW_QUERY_SECONDS).")
 
 # Prediction Page
 elif st.session_state.page == "Prediction":
@@ -484,29 +433,32 @@ elif st.session_state.page == "Prediction":
         search_conducted = st.selectbox("Was a Search Conducted?", ["0", "1"])
         search_type = st.text_input("Search Type")
         drugs_related_stop = st.selectbox("Was it Drug Related?", ["0", "1"])
-        stop_duration = st.selectbox("Stop Duration", df['stop_duration'].dropna().unique())
+        duration_labels = {code: label for label, code in DURATION_MAP.items()}
+        stop_duration = st.selectbox("Stop Duration", list(duration_labels), format_func=duration_labels.get)
         vehicle_number = st.text_input("Vehicle Number")
         timestamp = pd.Timestamp.now()
 
         submitted = st.form_submit_button("Predict Stop Outcome & Violation")
 
         if submitted:
-            # Filter data for prediction
-            filtered_data = df[
-                (df['driver_gender'] == driver_gender) &
-                (df['driver_age'] == driver_age) &
-                (df['search_conducted'] == int(search_conducted)) &
-                (df['stop_duration'] == stop_duration) &
-                (df['drugs_related_stop'] == int(drugs_related_stop))
-            ]
-
-            # Predict stop outcome
-            if not filtered_data.empty:
-                predicted_outcome = filtered_data['stop_outcome'].mode()[0]
-                predicted_violation = filtered_data['violation'].mode()[0]
+            # Look up the most common outcome and violation for similar stops,
+            # backing off to coarser matches when there is no exact one
+            prediction = get_outcome_index(data_version()).predict(
+                driver_gender=1 if driver_gender == "male" else 0,
+                driver_age=int(driver_age),
+                search_conducted=int(search_conducted),
+                stop_duration=stop_duration,
+                drugs_related_stop=int(drugs_related_stop),
+            )
+
+            if prediction:
+                predicted_outcome = prediction.outcome
+                predicted_violation = prediction.violation
+                basis = f"Based on {prediction.support:,} past stops ({prediction.level})."
             else:
                 predicted_outcome = "warning"  # Default fallback
                 predicted_violation = "speeding"  # Default fallback
+                basis = "No past stops to base this on."
 
             # Natural Language summary
             search_text = "A search was conducted" if int(search_conducted) else "No search was conducted"
@@ -519,9 +471,130 @@ elif st.session_state.page == "Prediction":
 
                 **Predicted Stop Outcome:** {predicted_outcome}
 
+                _{basis}_
+
                 A {driver_age}-year-old {driver_gender} driver in {county_name} was stopped at 
                 {stop_time.strftime('%I:%M %p')} on {stop_date}
                 {search_text}, and the stop {drug_text}.
-                Stop duration: **{stop_duration}**.
+                Stop duration: **{duration_labels[stop_duration]}**.
                 Vehicle Number: **{vehicle_number}**.
-                """)
\ No newline at end of file
+                """)
+
+            # Saved after predicting, so the new log doesn't vote for itself.
+            # It is journaled before append returns and reaches MySQL with the
+            # next group commit; violation and outcome stay unrecorded.
+            writer = get_log_writer()
+            try:
+                row = writer.append(logbook.record(
+                    stop_date, stop_time,
+                    country_name=county_name,
+                    driver_gender='M' if driver_gender == "male" else 'F',
+                    driver_age=int(driver_age),
+                    driver_race=driver_race,
+                    search_conducted=bool(int(search_conducted)),
+                    search_type=search_type,
+                    stop_duration=duration_labels[stop_duration],
+                    drugs_related_stop=bool(int(drugs_related_stop)),
+                    vehicle_number=vehicle_number,
+                ))
+                st.success(f"Log saved as entry {row + 1:,} of {writer.source_path}.")
+                if writer.error:
+                    st.warning(f"{writer.pending:,} saved logs are waiting for MySQL: {writer.error}")
+            except (OSError, ValueError) as e:
+                st.error(f"Could not save the log: {e}")
+
+# Vehicle History Page
+elif st.session_state.page == "Vehicles":
+    st.header("🚗 Vehicle History")
+    st.write("Check a plate for prior stops, searches, arrests and drug-related stops.")
+    vehicles = get_vehicle_index(data_version())
+
+    plate = st.text_input("Vehicle Number").strip()
+    if plate:
+        history, seconds = vehicles.timed_lookup(plate)
+        if history is None:
+            st.success(f"No prior stops on record for {plate}.")
+        else:
+            col1, col2, col3, col4 = st.columns(4)
+            col1.metric("Prior Stops", f"{history.stops:,}")
+            col2.metric("Searches", f"{history.searches:,}")
+            col3.metric("Arrests", f"{history.arrests:,}")
+            col4.metric("Drug-Related Stops", f"{history.drug_stops:,}")
+            st.caption(f"First stopped {history.first_seen}, last stopped {history.last_seen}; "
+                       f"looked up in {seconds * 1e6:,.0f} µs.")
+            st.dataframe(vehicles.rows(history), use_container_width=True)
+
+    for col, (view, title) in zip(st.columns(len(TOP_VIEWS)), TOP_VIEWS.items()):
+        with col:
+            st.subheader(title)
+            st.dataframe(pd.DataFrame(vehicles.top(view), columns=['vehicle_number', 'count']),
+                         use_container_width=True, hide_index=True)
+
+# Ingest Page
+elif st.session_state.page == "Ingest":
+    st.header("📥 Streaming Ingestion")
+    st.write("Reads the CSV in fixed-size chunks and writes each chunk straight to the selected targets, "
+             "so memory use is bounded by the chunk size rather than the file size.")
+
+    with st.form("ingest_form"):
+        source_path = st.text_input("CSV Path", CSV_PATH)
+        chunk_size = st.number_input("Rows per Chunk", min_value=1000, value=config.CHUNK_SIZE, step=10000)
+        to_mysql = st.checkbox("MySQL (traffic_stops)", value=True)
+        mode = st.selectbox("MySQL Load Mode", ["values", "infile"])
+        to_cache = st.checkbox("Columnar cache", value=True)
+        to_partitions = st.checkbox("Partitioned Parquet (year/month)", value=False)
+        start = st.form_submit_button("Start Ingestion")
+
+    if start:
+        progress_bar = st.progress(0.0)
+        col1, col2 = st.columns(2)
+        rows_metric = col1.empty()
+        rate_metric = col2.empty()
+
+        def show_progress(p):
+            progress_bar.progress(p.fraction, text=f"{p.fraction:.0%} of file read")
+            rows_metric.metric("Rows Ingested", f"{p.rows:,}")
+            rate_metric.metric("Rows / sec", f"{p.rows_per_sec:,.0f}")
+
+        conn = None
+        cache = None
+        layout = None
+        sinks = []
+        try:
+            if to_mysql:
+                conn = db.connect(local_infile=mode == "infile")
+                sinks.append(loader.BulkSink(conn, source_path, mode))
+            if to_cache:
+                cache = frame_cache.cache_sink(source_path)
+                sinks.append(cache)
+            if to_partitions:
+                layout = partitions.PartitionSink(config.PARTITION_DIR)
+                sinks.append(layout)
+            result = stream_csv(source_path, sinks, int(chunk_size), show_progress)
+            if cache:
+                frame_cache.prune(cache.path)
+                # Every process attached to the shared frame switches on its next rerun
+                shared.publish(source_path)
+            show_progress(result)
+            st.success(f"Ingested {result.rows:,} rows in {result.seconds:.1f}s "
+                       f"({result.rows_per_sec:,.0f} rows/sec)")
+            attach_data.clear()
+            get_cube.clear()
+            overview_summary.clear()
+            overview_figure.clear()
+            get_outcome_index.clear()
+            get_shared_scan.clear()
+            get_vehicle_index.clear()
+            get_month_index.clear()
+            get_approx_index.clear()
+            get_backend.clear()
+            get_query_runner.clear()
+        except (Error, OSError) as e:
+            if cache:
+                cache.abort()
+            if layout:
+                layout.abort()
+            st.error(f"Ingestion error: {e}")
+        finally:
+            if conn:
+                conn.close()
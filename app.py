@@ -1,5 +1,9 @@
 import streamlit as st
-import pandas as pd
+
+from securecheck import frame_cache, partitions, shared
+from securecheck.approx import ApproxIndex
+from securecheck.data import CSV_PATH
+from securecheck.filters import FilterIndex, approximate_summary
 
 # ---- PAGE CONFIG ----
 st.set_page_config(page_title="Traffic Stops Dashboard", layout="wide")
@@ -8,49 +12,91 @@ st.set_page_config(page_title="Traffic Stops Dashboard", layout="wide")
 st.title("🚓 Traffic Stops Data Dashboard")
 
 # ---- LOAD DATA ----
-@st.cache_data
-def load_data():
-    return pd.read_csv("C:/Users/vikiy/Downloads/traffic_stops - traffic_stops_with_vehicle_number (1).csv", low_memory=False)
+# Maps the same read-only cleaned frame as the main dashboard, shared by every
+# server process; the CSV is only parsed (in bounded chunks) when it has changed.
+@st.cache_resource(max_entries=1)
+def load_data(version):
+    df = shared.attach(version, CSV_PATH)
+    # A shallow copy with its own gender column; the shared frame is never written
+    return df.assign(driver_gender=df['driver_gender'].map({1: 'M', 0: 'F'}).astype('category'))
+
+if not frame_cache.is_cached(CSV_PATH):
+    progress_bar = st.progress(0.0, text="Building the columnar cache...")
+    frame_cache.build(CSV_PATH, progress=lambda p: progress_bar.progress(p.fraction, text=p.describe()))
+    progress_bar.empty()
+
+# Built once per data version; reruns only touch the selected rows instead of
+# copying the whole frame
+@st.cache_resource(max_entries=1)
+def get_filter_index(version):
+    return FilterIndex(load_data(version))
+
+# Row offsets per month of stop_date, so a date range only touches its months
+@st.cache_resource(max_entries=1)
+def get_month_index(version):
+    return partitions.MonthIndex(load_data(version))
+
+# Stratified sample for the approximate mode, built once per data version
+@st.cache_resource(max_entries=1)
+def get_approx_index(version):
+    return ApproxIndex(load_data(version))
 
-df = load_data()
+version = shared.ensure(CSV_PATH)
+index = get_filter_index(version)
+months = get_month_index(version)
 
 st.sidebar.header("🔍 Filters")
+# Approximate figures come from a fixed-size sample; switch back to check them
+mode = st.sidebar.radio("Mode", ["Exact", "Approximate"], horizontal=True)
 
 # ---- SIDEBAR FILTERS ----
-countries = st.sidebar.multiselect("Select Country", df["country_name"].dropna().unique())
-genders = st.sidebar.multiselect("Select Gender", df["driver_gender"].dropna().unique())
-violations = st.sidebar.multiselect("Select Violation", df["violation"].dropna().unique())
+first_date, last_date = months.bounds()
+period = st.sidebar.selectbox("Date Range", [*partitions.PRESETS, "Custom"])
+if period == "Custom":
+    picked = st.sidebar.date_input("From / To", (first_date, last_date), min_value=first_date, max_value=last_date)
+    # Until the second date is picked the range is still open-ended
+    date_range = partitions.DateRange(*picked) if len(picked) == 2 else partitions.DateRange(*picked[:1])
+else:
+    date_range = partitions.preset(period, last_date)
+if date_range:
+    st.sidebar.caption(f"Stops from {date_range.describe()}")
+countries = st.sidebar.multiselect("Select Country", index.options("country_name"))
+genders = st.sidebar.multiselect("Select Gender", index.options("driver_gender"))
+violations = st.sidebar.multiselect("Select Violation", index.options("violation"))
 
-filtered_df = df.copy()
+if mode == "Approximate":
+    sample = get_approx_index(version).sample()
+    summary = approximate_summary(sample, date_range, country_name=countries, driver_gender=genders,
+                                  violation=violations)
+else:
+    summary = index.summarize(index.select(months.select(date_range), country_name=countries,
+                                           driver_gender=genders, violation=violations))
 
-if countries:
-    filtered_df = filtered_df[filtered_df["country_name"].isin(countries)]
-if genders:
-    filtered_df = filtered_df[filtered_df["driver_gender"].isin(genders)]
-if violations:
-    filtered_df = filtered_df[filtered_df["violation"].isin(violations)]
+def shown(name, value):
+    # Estimates carry their 95% margin
+    return f"{value:,}" if summary.margins is None else f"{value:,} ± {summary.margins[name]:,}"
 
 # ---- METRICS ----
 col1, col2, col3 = st.columns(3)
-col1.metric("Total Stops", f"{len(filtered_df):,}")
-col2.metric("Total Arrests", f"{filtered_df['is_arrested'].sum():,}")
-col3.metric("Drug-Related Stops", f"{filtered_df['drugs_related_stop'].sum():,}")
+col1.metric("Total Stops", shown('total_stops', summary.total_stops))
+col2.metric("Total Arrests", shown('total_arrests', summary.total_arrests))
+col3.metric("Drug-Related Stops", shown('drug_stops', summary.drug_stops))
+if summary.margins is not None:
+    st.caption(f"Estimated from a stratified sample of {len(sample.rows):,} of {int(sample.population.sum()):,} "
+               "stops; ± is a 95% confidence interval.")
 
 # ---- DATA PREVIEW ----
 st.write("### 🧾 Filtered Data Preview")
-st.dataframe(filtered_df.head(20), use_container_width=True)
+st.dataframe(summary.preview, use_container_width=True)
 
 # ---- CHARTS ----
 st.write("### 📊 Arrests by Gender")
-if "driver_gender" in filtered_df.columns:
-    st.bar_chart(filtered_df.groupby("driver_gender")["is_arrested"].sum())
+st.bar_chart(summary.arrests_by_gender)
 
 st.write("### ⏰ Stops by Violation Type")
-if "violation" in filtered_df.columns:
-    st.bar_chart(filtered_df["violation"].value_counts())
+st.bar_chart(summary.stops_by_violation)
 
 st.write("### 🚗 Average Driver Age by Gender")
-if "driver_age" in filtered_df.columns:
-    st.bar_chart(filtered_df.groupby("driver_gender")["driver_age"].mean())
+st.bar_chart(summary.avg_age_by_gender)
 
 st.caption("Built with ❤️ using Streamlit")
@@ -0,0 +1 @@
+"""Shared ingestion and analytics helpers for the SecureCheck dashboards."""
@@ -0,0 +1,82 @@
+"""Index advisor for the catalog workload.
+
+Runs ``EXPLAIN`` on every query in ``get_queries()`` and flags the ones that
+read traffic_stops with a full table scan, or a full scan of an index that
+does not cover the query:
+
+    python -m securecheck.advisor            # the SQL the app runs (rollups where available)
+    python -m securecheck.advisor --base     # the original SQL against traffic_stops
+
+``--migrate`` first adds the generated columns and covering indexes from
+``loader.GENERATED_COLUMNS`` / ``loader.SECONDARY_INDEXES``.
+"""
+import argparse
+from collections import namedtuple
+
+from securecheck import db, loader, rollups
+from securecheck.catalog import iter_queries
+
+Finding = namedtuple('Finding', 'name table access key rows extra problem')
+
+
+def _problem(step):
+    if step['table'] != 'traffic_stops':
+        return None
+    extra = step.get('Extra') or ''
+    if step['type'] == 'ALL':
+        return 'full table scan'
+    if step['type'] == 'index' and 'Using index' not in extra:
+        return 'full index scan with row lookups'
+    return None
+
+
+def explain(conn, sql):
+    """The traditional EXPLAIN rows for ``sql``."""
+    with conn.cursor() as cursor:
+        cursor.execute("EXPLAIN " + sql.strip().rstrip(';'))
+        return cursor.fetchall()
+
+
+def advise(conn, use_rollups=True):
+    """One ``Finding`` per EXPLAIN step of every catalog query."""
+    findings = []
+    for _, name, sql in iter_queries():
+        if use_rollups:
+            sql = rollups.route(name, sql)
+        for step in explain(conn, sql):
+            findings.append(Finding(name, step['table'], step['type'], step['key'], step['rows'],
+                                    step.get('Extra'), _problem(step)))
+    return findings
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="EXPLAIN the catalog queries and flag full scans.")
+    parser.add_argument('--base', action='store_true', help="explain the original SQL, not the rollup rewrites")
+    parser.add_argument('--migrate', action='store_true',
+                        help="add the generated columns and covering indexes first")
+    args = parser.parse_args(argv)
+
+    conn = db.connect()
+    try:
+        if args.migrate:
+            loader.add_generated_columns(conn)
+            loader.create_indexes(conn)
+        findings = advise(conn, use_rollups=not args.base)
+    finally:
+        conn.close()
+
+    flagged = set()
+    for f in findings:
+        marker = '!!' if f.problem else '  '
+        print(f"{marker} {f.name[:50]:<50} {str(f.table)[:16]:<16} {str(f.access):<8} "
+              f"{str(f.key or '-')[:20]:<20} {str(f.rows):>10}  {f.extra or ''}")
+        if f.problem:
+            flagged.add(f.name)
+    print(f"\n{len(flagged)} of {len({f.name for f in findings})} queries scan traffic_stops in full")
+    for f in findings:
+        if f.problem:
+            print(f"  {f.name}: {f.problem}")
+
+
+if __name__ == '__main__':
+    main()
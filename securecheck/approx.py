@@ -0,0 +1,352 @@
+"""Approximate answers with error bounds, from a stratified sample and sketches.
+
+``ApproxIndex`` keeps a reservoir sample of the stops in every
+(country_name, violation) stratum, about ``SECURECHECK_SAMPLE_SIZE`` rows in
+all, split in proportion to the strata (at least ``MIN_PER_STRATUM`` each).
+A sampled row stands for N_h / n_h stops of its stratum, so totals, rates
+and chart tables are weighted sums over the sample whatever the size of the
+log, and their 95% confidence intervals follow from the variance within each
+stratum.  Country and violation totals need no estimate: they are the
+stratum sizes.
+
+Next to the sample:
+
+- one ``HyperLogLog`` per stop date estimates the distinct vehicles of any
+  date range (1.6% standard error)
+- a ``CountMinSketch`` with a ``TopK`` of candidates keeps the most stopped
+  vehicles; a count is never under-estimated, and over-estimated by at most
+  e / width of all stops with probability 1 - e^-depth
+
+``update`` (a ``LogWriter`` subscriber) folds logged stops into all three.
+"""
+import math
+import threading
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from securecheck import config
+from securecheck.vehicles import TopK
+
+STRATA = ['country_name', 'violation']
+MIN_PER_STRATUM = 50
+
+# Two-sided 95% normal quantile
+Z_95 = 1.96
+
+Estimate = namedtuple('Estimate', 'value margin')
+
+
+class Sample(namedtuple('Sample', 'rows strata population sampled')):
+    """Sampled ``rows``, the stratum of each, and per stratum its stops (N_h) and sampled rows (n_h)."""
+
+    @property
+    def weights(self):
+        return self.population[self.strata] / self.sampled[self.strata]
+
+
+def _hash(values, key):
+    return pd.util.hash_array(np.asarray(values, dtype=object), hash_key=key, categorize=True)
+
+
+def _bit_length(x):
+    # Exact, where a float log2 would round up just below powers of two
+    x = x.copy()
+    length = np.zeros(len(x), np.int64)
+    for shift in (32, 16, 8, 4, 2, 1):
+        big = x >= np.uint64(1 << shift)
+        length[big] += shift
+        x[big] >>= np.uint64(shift)
+    return length + (x > 0)
+
+
+class HyperLogLog:
+    """Distinct-count estimate in 2**p one-byte registers; sketches merge with ``union``."""
+
+    _KEY = 'securecheck0hyll'
+
+    def __init__(self, p=12, registers=None):
+        self.p = p
+        self.registers = np.zeros(1 << p, np.uint8) if registers is None else registers
+
+    @classmethod
+    def positions(cls, values, p):
+        """The register of each value, and the rank it sets there."""
+        h = _hash(values, cls._KEY)
+        index = (h >> np.uint64(64 - p)).astype(np.intp)
+        rest = h & np.uint64((1 << (64 - p)) - 1)
+        return index, ((64 - p) - _bit_length(rest) + 1).astype(np.uint8)
+
+    def add(self, values):
+        index, rank = self.positions(values, self.p)
+        np.maximum.at(self.registers, index, rank)
+
+    @classmethod
+    def union(cls, sketches, p=12):
+        registers = [sketch.registers for sketch in sketches]
+        return cls(p, np.max(registers, axis=0)) if registers else cls(p)
+
+    def count(self):
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.sum(np.ldexp(1.0, -self.registers.astype(np.int64)))
+        zeros = np.count_nonzero(self.registers == 0)
+        if estimate <= 2.5 * m and zeros:
+            # Small cardinalities: linear counting over the empty registers
+            estimate = m * math.log(m / zeros)
+        return estimate
+
+    @property
+    def relative_error(self):
+        return 1.04 / math.sqrt(len(self.registers))
+
+
+class CountMinSketch:
+    """Approximate counts in ``depth`` rows of ``width`` counters, one hash per row."""
+
+    def __init__(self, width=4096, depth=5):
+        self.width = width
+        self.depth = depth
+        self.table = np.zeros((depth, width), np.int64)
+        self.total = 0
+
+    def _columns(self, values):
+        return [(_hash(values, f"securecheckcms{row:02d}") % np.uint64(self.width)).astype(np.intp)
+                for row in range(self.depth)]
+
+    def add(self, values, counts):
+        for row, columns in enumerate(self._columns(values)):
+            np.add.at(self.table[row], columns, counts)
+        self.total += int(np.sum(counts))
+
+    def estimate(self, values):
+        return np.min([self.table[row][columns] for row, columns in enumerate(self._columns(values))], axis=0)
+
+    @property
+    def error_bound(self):
+        """How far above the true count an estimate can be, with probability 1 - e**-depth."""
+        return math.e / self.width * self.total
+
+
+class HeavyHitters:
+    """The ``k`` most frequent values seen, counted by a ``CountMinSketch``."""
+
+    def __init__(self, k=10, width=4096, depth=5):
+        self.sketch = CountMinSketch(width, depth)
+        self.top = TopK(k)
+
+    def add(self, values):
+        counts = pd.Series(values).value_counts()
+        counts = counts[counts > 0]
+        if counts.empty:
+            return
+        keys = counts.index.to_numpy(object)
+        self.sketch.add(keys, counts.to_numpy(np.int64))
+        estimates = self.sketch.estimate(keys)
+        candidates = range(len(keys))
+        if len(keys) > self.top.k:
+            # A value below the batch's k-th estimate has k values ahead of it
+            cut = len(keys) - self.top.k
+            candidates = np.flatnonzero(estimates >= np.partition(estimates, cut)[cut])
+        for i in candidates:
+            self.top.offer(keys[i], int(estimates[i]))
+
+    def items(self):
+        """``(value, estimated count)`` pairs, best first."""
+        return self.top.items()
+
+
+def _stratum_keys(frame):
+    # Missing values become None, so keys of later batches compare equal
+    columns = [frame[col].astype(object).where(frame[col].notna(), None) for col in STRATA]
+    return list(zip(*columns))
+
+
+class StratifiedReservoir:
+    """Uniform samples of row offsets per stratum, kept current with algorithm R.
+
+    ``build`` sizes each stratum's reservoir in proportion to its rows;
+    strata first seen by ``add`` get ``min_per_stratum`` slots.
+    """
+
+    def __init__(self, size=config.SAMPLE_SIZE, min_per_stratum=MIN_PER_STRATUM, seed=0):
+        self.size = size
+        self.min_per_stratum = min_per_stratum
+        self._rng = np.random.default_rng(seed)
+        self._ids = {}
+        self.seen = []
+        self._capacity = []
+        self._slots = []
+
+    def _new_stratum(self, key, capacity):
+        self._ids[key] = len(self.seen)
+        self.seen.append(0)
+        self._capacity.append(capacity)
+        self._slots.append([])
+        return self._ids[key]
+
+    def build(self, frame):
+        """Sample all of ``frame`` at once; its rows are offsets 0...len(frame) - 1."""
+        codes = frame.groupby(STRATA, dropna=False, observed=True, sort=False).ngroup().to_numpy()
+        n_strata = codes.max() + 1 if len(codes) else 0
+        _, first = np.unique(codes, return_index=True)
+        keys = _stratum_keys(frame.iloc[first])
+        order = np.argsort(codes, kind='stable')
+        starts = np.concatenate([[0], np.cumsum(np.bincount(codes, minlength=n_strata))])
+        for code, key in enumerate(keys):
+            rows = order[starts[code]:starts[code + 1]]
+            capacity = max(self.min_per_stratum, math.ceil(self.size * len(rows) / len(codes)))
+            h = self._new_stratum(key, capacity)
+            self.seen[h] = len(rows)
+            chosen = rows if len(rows) <= capacity else self._rng.choice(rows, capacity, replace=False)
+            self._slots[h] = chosen.tolist()
+
+    def add(self, frame, first_offset):
+        """Offer the rows of ``frame``, offsets ``first_offset...``, one at a time."""
+        for offset, key in enumerate(_stratum_keys(frame), first_offset):
+            h = self._ids.get(key)
+            if h is None:
+                h = self._new_stratum(key, self.min_per_stratum)
+            self.seen[h] += 1
+            slots = self._slots[h]
+            if len(slots) < self._capacity[h]:
+                slots.append(offset)
+            else:
+                # The n-th row of a stratum replaces a sampled one with probability capacity / n
+                j = self._rng.integers(self.seen[h])
+                if j < len(slots):
+                    slots[j] = offset
+
+    def sample(self):
+        """``(offsets, strata, population, sampled)`` of the current sample."""
+        sizes = np.array([len(slots) for slots in self._slots], np.int64)
+        offsets = np.fromiter((o for slots in self._slots for o in slots), np.int64, int(sizes.sum()))
+        strata = np.repeat(np.arange(len(sizes)), sizes)
+        return offsets, strata, np.asarray(self.seen, np.float64), sizes.astype(np.float64)
+
+
+def _variance(sample, values):
+    """Variance of the weighted total of ``values`` (one per sampled row), stratum by stratum."""
+    k = len(sample.population)
+    n, N = sample.sampled, sample.population
+    s1 = np.bincount(sample.strata, values, k)
+    s2 = np.bincount(sample.strata, values * values, k)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        within = np.where(n > 1, (s2 - s1 * s1 / n) / (n - 1), 0.0)
+        # Fully sampled strata (n = N) add nothing
+        terms = np.where(n > 0, N * N * (1 - n / N) * within / n, 0.0)
+    return max(float(terms.sum()), 0.0)
+
+
+def estimate_total(sample, values):
+    """Population total of ``values``, one per sampled row (0 outside the rows of interest)."""
+    values = np.asarray(values, np.float64)
+    return Estimate(float(sample.weights @ values), Z_95 * math.sqrt(_variance(sample, values)))
+
+
+def estimate_ratio(sample, numerator, denominator):
+    """Population ratio of two totals, e.g. arrests over stops, with a linearized interval."""
+    numerator = np.asarray(numerator, np.float64)
+    denominator = np.asarray(denominator, np.float64)
+    total = float(sample.weights @ denominator)
+    if total == 0:
+        return Estimate(float('nan'), float('nan'))
+    ratio = float(sample.weights @ numerator) / total
+    return Estimate(ratio, Z_95 * math.sqrt(_variance(sample, numerator - ratio * denominator)) / total)
+
+
+def weighted_counts(sample, by, values=None):
+    """Estimated total of ``values`` (default: stops) per value of column(s) ``by`` of the sampled rows."""
+    weights = sample.weights if values is None else sample.weights * values
+    keys = [sample.rows[col].to_numpy(object) for col in ([by] if isinstance(by, str) else by)]
+    return pd.Series(weights).groupby(keys).sum()
+
+
+class ApproxIndex:
+    """The stratified sample and the vehicle sketches of the loaded frame, grown by ``update``."""
+
+    def __init__(self, df, sample_size=config.SAMPLE_SIZE, top_k=10, p=12, seed=0):
+        self.df = df
+        self.p = p
+        self._lock = threading.Lock()
+        self._reservoir = StratifiedReservoir(sample_size, seed=seed)
+        self._reservoir.build(df)
+        self._top_vehicles = HeavyHitters(top_k)
+        self._top_vehicles.add(df['vehicle_number'])
+        self._undated = HyperLogLog(p)
+        self._daily = {}
+        self._add_distinct(df)
+        self._appended = []
+        self._rows = len(df)
+        self._sample = None
+
+    def _add_distinct(self, frame):
+        known = frame['vehicle_number'].notna().to_numpy()
+        days = frame['stop_date'].to_numpy('datetime64[D]')[known]
+        index, rank = HyperLogLog.positions(frame['vehicle_number'].to_numpy(object)[known], self.p)
+        dated = ~np.isnat(days)
+        np.maximum.at(self._undated.registers, index[~dated], rank[~dated])
+        day_numbers, day_codes = np.unique(days[dated].astype(np.int64), return_inverse=True)
+        m = 1 << self.p
+        # All days' registers in one flat array, then one sketch per day
+        registers = np.zeros(len(day_numbers) * m, np.uint8)
+        np.maximum.at(registers, day_codes * m + index[dated], rank[dated])
+        for i, day in enumerate(day_numbers):
+            block = registers[i * m:(i + 1) * m]
+            sketch = self._daily.get(int(day))
+            if sketch is None:
+                self._daily[int(day)] = HyperLogLog(self.p, block)
+            else:
+                np.maximum(sketch.registers, block, out=sketch.registers)
+
+    def update(self, rows):
+        """Fold newly ingested ``rows`` (cleaned stops) into the sample and sketches."""
+        rows = rows.reset_index(drop=True)
+        with self._lock:
+            self._reservoir.add(rows, self._rows)
+            self._top_vehicles.add(rows['vehicle_number'])
+            self._add_distinct(rows)
+            self._appended.append(rows)
+            self._rows += len(rows)
+            self._sample = None
+
+    def sample(self):
+        """The current ``Sample``; rebuilt only after an ``update``."""
+        with self._lock:
+            if self._sample is None:
+                offsets, strata, population, sampled = self._reservoir.sample()
+                loaded = offsets < len(self.df)
+                parts = [self.df.take(offsets[loaded])]
+                if not loaded.all():
+                    logged = pd.concat(self._appended, ignore_index=True)
+                    parts.append(logged.take(offsets[~loaded] - len(self.df)))
+                rows = pd.concat(parts, ignore_index=True) if len(parts) > 1 else parts[0].reset_index(drop=True)
+                strata = np.concatenate([strata[loaded], strata[~loaded]])
+                self._sample = Sample(rows, strata, population, sampled)
+            return self._sample
+
+    def distinct_vehicles(self, date_range=None):
+        """Estimated distinct vehicle numbers stopped in ``date_range`` (None = ever)."""
+        with self._lock:
+            if date_range is None:
+                sketches = [self._undated, *self._daily.values()]
+            else:
+                start = None if date_range.start is None else date_range.start.to_datetime64().astype('datetime64[D]')
+                end = None if date_range.end is None else date_range.end.to_datetime64().astype('datetime64[D]')
+                sketches = [sketch for day, sketch in self._daily.items()
+                            if (start is None or day >= start.astype(np.int64))
+                            and (end is None or day <= end.astype(np.int64))]
+            union = HyperLogLog.union(sketches, self.p)
+        value = union.count()
+        return Estimate(value, Z_95 * union.relative_error * value)
+
+    def top_vehicles(self):
+        """``(vehicle_number, estimated stops)`` of the most stopped vehicles, best first."""
+        with self._lock:
+            return self._top_vehicles.items()
+
+    @property
+    def vehicle_count_error(self):
+        """How far the ``top_vehicles`` counts can be above the truth (probability 1 - e^-5)."""
+        return self._top_vehicles.sketch.error_bound
@@ -0,0 +1,278 @@
+"""Engines the catalog SQL can run on.
+
+``MySQLBackend`` sends queries to the server through the shared pool and
+reads aggregates from the rollup tables.  ``DuckDBBackend`` runs the same
+``get_queries()`` SQL in-process over the cleaned frame, so the dashboard
+works where no MySQL server is reachable and skips the round trip per
+aggregate.  ``SECURECHECK_BACKEND`` picks one.
+
+``python -m securecheck.backends`` times every catalog query on each backend.
+"""
+import argparse
+import re
+import time
+
+import pandas as pd
+import pymysql
+from pymysql.err import Error
+
+from securecheck import config, db, frame_cache, loader, rollups
+from securecheck.catalog import iter_queries
+from securecheck.data import CATEGORY_COLUMNS
+from securecheck.profiling import QueryStats, result_bytes
+
+try:
+    import duckdb
+except ImportError:
+    duckdb = None
+
+BACKENDS = ('mysql', 'duckdb')
+
+
+class BackendError(Exception):
+    """A query failed, or the backend could not be opened."""
+
+
+class MySQLBackend:
+    name = 'mysql'
+
+    def __init__(self, pool=None, use_rollups=True):
+        self.pool = pool or db.ConnectionPool()
+        self.use_rollups = use_rollups
+
+    def _call(self, fn):
+        try:
+            with self.pool.connection() as conn:
+                return fn(conn)
+        except (Error, db.PoolTimeout) as e:
+            raise BackendError(str(e)) from e
+
+    def route(self, name, sql):
+        return rollups.route(name, sql) if self.use_rollups else sql
+
+    def data_version(self):
+        return self._call(loader.data_version)
+
+    def run(self, sql):
+        return self._call(lambda conn: db.fetch_frame(conn, sql))
+
+    def profile(self, sql, explain=False):
+        """Run ``sql``, returning the frame and its ``QueryStats``."""
+        started = time.perf_counter()
+
+        def timed(conn):
+            acquired = time.perf_counter()
+            frame = db.fetch_frame(conn, sql)
+            finished = time.perf_counter()
+            # EXPLAIN ANALYZE runs the query again, after the timing
+            plan = _explain_mysql(conn, sql) if explain else None
+            return frame, acquired, finished, plan
+
+        frame, acquired, finished, plan = self._call(timed)
+        return frame, QueryStats(finished - started, acquired - started, len(frame), result_bytes(frame), plan)
+
+    def stream(self, sql, batch_size=config.FETCH_BATCH, on_start=None):
+        """Yield the result of ``sql`` in frames of at most ``batch_size`` rows.
+
+        Rows come from an unbuffered server-side cursor, so only one batch is
+        held at a time.  ``on_start`` is called with a function that cancels
+        the statement (``KILL QUERY`` from a second connection).
+        """
+        try:
+            with self.pool.connection() as conn:
+                if on_start:
+                    on_start(lambda: _kill_query(conn.thread_id()))
+                with conn.cursor(pymysql.cursors.SSDictCursor) as cursor:
+                    cursor.execute(sql)
+                    while True:
+                        rows = cursor.fetchmany(batch_size)
+                        if not rows:
+                            break
+                        yield pd.DataFrame(rows)
+        except (Error, db.PoolTimeout) as e:
+            raise BackendError(str(e)) from e
+
+
+def _kill_query(thread_id):
+    # The interrupted connection raises and is discarded by the pool
+    try:
+        conn = db.connect()
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("KILL QUERY %s", (thread_id,))
+        finally:
+            conn.close()
+    except Error as e:
+        raise BackendError(str(e)) from e
+
+
+def _explain_mysql(conn, sql):
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("EXPLAIN ANALYZE " + sql.strip().rstrip(';'))
+            return '\n'.join(str(value) for row in cursor.fetchall() for value in row.values())
+    except Error as e:
+        # Needs MySQL 8.0.18 or later
+        return f"EXPLAIN ANALYZE failed: {e}"
+
+
+# MySQL sums a boolean expression as 0/1; DuckDB wants an explicit cast
+_SUM_OR = re.compile(r'SUM\((\w+) OR (\w+)\)', re.IGNORECASE)
+
+# stop_time becomes a TIME so HOUR() works unchanged, stop_date a DATE, and
+# categoricals plain VARCHAR: as ENUMs they would sort in dictionary order
+# rather than alphabetically like MySQL
+LOAD_SQL = """
+    CREATE TABLE traffic_stops AS
+    SELECT * REPLACE (TIME '00:00:00' + stop_time AS stop_time, CAST(stop_date AS DATE) AS stop_date, {})
+    FROM stops_frame
+""".format(', '.join(f"CAST({col} AS VARCHAR) AS {col}" for col in CATEGORY_COLUMNS))
+
+APPEND_SQL = LOAD_SQL.replace("CREATE TABLE traffic_stops AS", "INSERT INTO traffic_stops")
+
+
+def to_duckdb(sql):
+    """Rewrite the MySQL-only constructs the catalog uses."""
+    return _SUM_OR.sub(r'SUM(CAST((\1 = 1 OR \2 = 1) AS INTEGER))', sql)
+
+
+class DuckDBBackend:
+    name = 'duckdb'
+
+    def __init__(self, frame, version):
+        if duckdb is None:
+            raise BackendError("duckdb is not installed (pip install duckdb)")
+        self._conn = duckdb.connect()
+        self._conn.register('stops_frame', frame)
+        self._conn.execute(LOAD_SQL)
+        self._conn.unregister('stops_frame')
+        self._version = version
+        self._appended = 0
+
+    @classmethod
+    def from_source(cls, path=config.CSV_PATH, frame=None):
+        """Load ``path`` (or an already loaded ``frame`` of it) into DuckDB."""
+        if frame is None:
+            frame = frame_cache.load_stops(path)
+        return cls(frame, frame_cache.source_fingerprint(path))
+
+    def route(self, name, sql):
+        return sql
+
+    def data_version(self):
+        return f"{self._version}+{self._appended}" if self._appended else self._version
+
+    def append(self, rows):
+        """Insert ``rows`` (cleaned stops), e.g. logs saved after the load."""
+        try:
+            with self._conn.cursor() as cursor:
+                cursor.register('stops_frame', rows)
+                cursor.execute(APPEND_SQL)
+                cursor.unregister('stops_frame')
+        except duckdb.Error as e:
+            raise BackendError(str(e)) from e
+        self._appended += len(rows)
+
+    def run(self, sql):
+        try:
+            # A cursor per call, so concurrent sessions don't share one; closed
+            # on the way out, or they pile up on the shared connection
+            with self._conn.cursor() as cursor:
+                return cursor.execute(to_duckdb(sql)).df()
+        except duckdb.Error as e:
+            raise BackendError(str(e)) from e
+
+    def profile(self, sql, explain=False):
+        """Run ``sql``, returning the frame and its ``QueryStats``."""
+        started = time.perf_counter()
+        try:
+            with self._conn.cursor() as cursor:
+                acquired = time.perf_counter()
+                frame = cursor.execute(to_duckdb(sql)).df()
+                finished = time.perf_counter()
+                plan = None
+                if explain:
+                    plan = cursor.execute("EXPLAIN ANALYZE " + to_duckdb(sql)).fetchall()[0][-1]
+        except duckdb.Error as e:
+            raise BackendError(str(e)) from e
+        return frame, QueryStats(finished - started, acquired - started, len(frame), result_bytes(frame), plan)
+
+    def stream(self, sql, batch_size=config.FETCH_BATCH, on_start=None):
+        """Yield the result of ``sql`` in frames of at most ``batch_size`` rows.
+
+        ``on_start`` is called with a function that interrupts the statement.
+        """
+        try:
+            # Also closed when the consumer stops early and the generator is closed
+            with self._conn.cursor() as cursor:
+                if on_start:
+                    on_start(cursor.interrupt)
+                cursor.execute(to_duckdb(sql))
+                columns = [d[0] for d in cursor.description]
+                while True:
+                    rows = cursor.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    yield pd.DataFrame(rows, columns=columns)
+        except duckdb.Error as e:
+            raise BackendError(str(e)) from e
+
+
+def open_backend(name=config.BACKEND, path=config.CSV_PATH, pool=None, frame=None):
+    if name == 'mysql':
+        return MySQLBackend(pool)
+    if name == 'duckdb':
+        return DuckDBBackend.from_source(path, frame)
+    raise ValueError(f"unknown backend {name!r}, expected one of {BACKENDS}")
+
+
+def time_queries(backend, repeat=3):
+    """Best wall time in seconds and row count for each catalog query."""
+    results = {}
+    for _, name, sql in iter_queries():
+        sql = backend.route(name, sql)
+        best = None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            rows = len(backend.run(sql))
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        results[name] = (best, rows)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time every catalog query on each backend.")
+    parser.add_argument('path', nargs='?', default=config.CSV_PATH)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args(argv)
+
+    candidates = [('mysql', lambda: MySQLBackend(use_rollups=False)),
+                  ('mysql+rollups', lambda: MySQLBackend()),
+                  ('duckdb', lambda: DuckDBBackend.from_source(args.path))]
+    timings = {}
+    for label, make in candidates:
+        try:
+            started = time.perf_counter()
+            backend = make()
+            opened = time.perf_counter() - started
+            timings[label] = time_queries(backend, args.repeat)
+        except BackendError as e:
+            print(f"{label}: skipped ({e})")
+            continue
+        if label == 'duckdb':
+            print(f"duckdb: loaded in {opened:.2f}s")
+
+    if not timings:
+        return
+    labels = list(timings)
+    print(f"{'query':<60}" + ''.join(f"{label:>16}" for label in labels))
+    for _, name, _ in iter_queries():
+        cells = ''.join(f"{timings[label][name][0] * 1000:>13.1f} ms" for label in labels)
+        print(f"{name[:58]:<60}{cells}")
+    totals = ''.join(f"{sum(t for t, _ in timings[label].values()) * 1000:>13.1f} ms" for label in labels)
+    print(f"{'total':<60}{totals}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,228 @@
+"""Benchmarks for the load, clean, ingest and query paths on synthetic data.
+
+    python -m securecheck.benchmark --size 10k 1m --out bench.json
+    python -m securecheck.benchmark --size 10k --compare bench.json
+
+Every stage records wall time, rows/sec and the process's peak resident
+memory while it ran, sampled every few milliseconds (``tracemalloc`` would
+miss Arrow buffers and slows pandas several times over). The MySQL stages
+load into a separate benchmark database and are replaced by the in-process
+DuckDB backend when no server is reachable.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+from pymysql.err import Error
+
+from securecheck import backends, config, db, frame_cache, loader
+from securecheck.catalog import iter_queries
+from securecheck.data import CLEAN_VERSION, READ_DTYPES, clean_stops
+from securecheck.filters import FILTER_COLUMNS, FilterIndex
+from securecheck.predict import OutcomeIndex
+from securecheck.synthetic import write_csv
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+SIZES = {'10k': 10_000, '1m': 1_000_000, '10m': 10_000_000}
+
+# Random widget changes / form submits timed per run
+FILTER_SELECTIONS = 200
+PREDICTIONS = 1000
+
+
+def rss_bytes():
+    """Resident memory of this process, or None where it can't be read."""
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        return None
+
+
+class Stage:
+    """Times one stage and samples its peak resident memory."""
+
+    def __init__(self, results, name, rows, interval=0.005):
+        self.results = results
+        self.name = name
+        self.rows = rows
+        self.interval = interval
+
+    def _sample(self):
+        while not self._done.wait(self.interval):
+            self._peak = max(self._peak, rss_bytes())
+
+    def __enter__(self):
+        self._start = self._peak = rss_bytes()
+        self._done = threading.Event()
+        if self._peak is not None:
+            self._sampler = threading.Thread(target=self._sample, daemon=True)
+            self._sampler.start()
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        seconds = time.perf_counter() - self._started
+        self._done.set()
+        if self._peak is None:
+            peak = None
+        else:
+            self._sampler.join()
+            peak = max(self._peak, rss_bytes())
+        if exc_type is not None:
+            return False
+        self.results.append({
+            'stage': self.name,
+            'rows': self.rows,
+            'seconds': round(seconds, 4),
+            'rows_per_sec': round(self.rows / seconds, 1) if seconds else None,
+            'peak_rss_bytes': peak,
+            # How far the stage pushed memory above where it started
+            'rss_growth_bytes': None if peak is None else peak - self._start,
+        })
+        return False
+
+
+def _git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(__file__), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _mysql_backend(database):
+    """A backend on a freshly emptied ``database``, or None without a server."""
+    try:
+        conn = db.connect(database=None)
+    except Error:
+        return None
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(f"DROP DATABASE IF EXISTS `{database}`")
+            cursor.execute(f"CREATE DATABASE `{database}`")
+        conn.commit()
+    finally:
+        conn.close()
+    return backends.MySQLBackend(db.ConnectionPool(database=database))
+
+
+def run_size(rows, workdir, database, seed=0):
+    stages = []
+    path = os.path.join(workdir, f"stops-{rows}-{seed}.csv")
+    if not os.path.exists(path):
+        with Stage(stages, 'generate', rows):
+            write_csv(path, rows, seed)
+
+    with Stage(stages, 'parse', rows):
+        raw = pd.read_csv(path, dtype=READ_DTYPES)
+    with Stage(stages, 'clean', rows):
+        df = clean_stops(raw)
+    del raw
+
+    cache_dir = os.path.join(workdir, 'cache')
+    with Stage(stages, 'cache_build', rows):
+        frame_cache.build(path, cache_dir)
+    with Stage(stages, 'cache_load', rows):
+        frame_cache.load_stops(path, cache_dir)
+
+    backend = _mysql_backend(database)
+    if backend is not None:
+        conn = db.connect(database=database)
+        try:
+            with Stage(stages, 'ingest_mysql', rows):
+                loader.bulk_load(conn, path)
+        finally:
+            conn.close()
+    else:
+        with Stage(stages, 'ingest_duckdb', rows):
+            backend = backends.DuckDBBackend(df, 'benchmark')
+
+    # rows/sec here counts every query as one pass over the table
+    with Stage(stages, f'catalog_{backend.name}', rows * len(list(iter_queries()))):
+        timings = backends.time_queries(backend, repeat=1)
+    queries = {name: round(seconds, 4) for name, (seconds, _) in timings.items()}
+
+    rng = np.random.default_rng(seed)
+    with Stage(stages, 'filter_index', rows):
+        index = FilterIndex(df)
+    options = {col: index.options(col) for col in FILTER_COLUMNS}
+    with Stage(stages, 'filter_select', rows * FILTER_SELECTIONS):
+        for _ in range(FILTER_SELECTIONS):
+            selection = {col: [v for v in values if rng.random() < 0.5] for col, values in options.items()}
+            index.summarize(index.select(**selection))
+
+    with Stage(stages, 'prediction_index', rows):
+        outcomes = OutcomeIndex(df)
+    with Stage(stages, 'prediction_lookup', PREDICTIONS):
+        for _ in range(PREDICTIONS):
+            outcomes.predict(int(rng.integers(0, 2)), int(rng.integers(16, 90)), int(rng.integers(0, 2)),
+                             int(rng.integers(1, 4)), int(rng.integers(0, 2)))
+
+    return {'rows': rows, 'stages': stages, 'queries': queries}
+
+
+def compare(old, new):
+    """Print each stage's time change between two result files."""
+    before = {(run['rows'], s['stage']): s['seconds'] for run in old['runs'] for s in run['stages']}
+    for run in new['runs']:
+        for s in run['stages']:
+            previous = before.get((run['rows'], s['stage']))
+            if previous:
+                change = (s['seconds'] - previous) / previous
+                print(f"{run['rows']:>12,} {s['stage']:<20} {previous:>10.3f}s -> {s['seconds']:>10.3f}s "
+                      f"({change:+.0%})")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the SecureCheck data paths on synthetic stops.")
+    parser.add_argument('--size', nargs='+', choices=SIZES, default=['10k', '1m'])
+    parser.add_argument('--out', default='benchmark-results.json')
+    parser.add_argument('--workdir', help="keep generated CSVs here for reuse (default: temporary)")
+    parser.add_argument('--database', default=f"{config.DB_SETTINGS['database']}_bench")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--compare', help="earlier results file to compare against")
+    args = parser.parse_args(argv)
+
+    results = {
+        'revision': _git_revision(),
+        'clean_version': CLEAN_VERSION,
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'started': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'runs': [],
+    }
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = args.workdir or tmp
+        os.makedirs(workdir, exist_ok=True)
+        for size in args.size:
+            run = run_size(SIZES[size], workdir, args.database, args.seed)
+            results['runs'].append(run)
+            for s in run['stages']:
+                peak = f"+{s['rss_growth_bytes'] / 2**20:.1f} MiB" if s['peak_rss_bytes'] else ''
+                print(f"{size:>4} {s['stage']:<20} {s['seconds']:>10.3f}s "
+                      f"{s['rows_per_sec'] or 0:>14,.0f} rows/s {peak}")
+
+    with open(args.out, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.out}")
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), results)
+
+
+if __name__ == '__main__':
+    main()
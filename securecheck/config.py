@@ -0,0 +1,72 @@
+"""Deployment settings, read from SECURECHECK_* environment variables.
+
+The defaults match the original single-machine setup.
+"""
+import os
+import re
+import socket
+
+CSV_PATH = os.environ.get(
+    'SECURECHECK_CSV', 'C:/Users/vikiy/Downloads/traffic_stops - traffic_stops_with_vehicle_number (1).csv'
+)
+
+DB_SETTINGS = {
+    'host': os.environ.get('SECURECHECK_DB_HOST', 'localhost'),
+    'port': int(os.environ.get('SECURECHECK_DB_PORT', '3306')),
+    'database': os.environ.get('SECURECHECK_DB_NAME', 'police_logs'),
+    'user': os.environ.get('SECURECHECK_DB_USER', 'root'),
+    'password': os.environ.get('SECURECHECK_DB_PASSWORD', 'admin'),
+    'charset': 'utf8mb4',
+    'connect_timeout': int(os.environ.get('SECURECHECK_DB_CONNECT_TIMEOUT', '5')),
+    'read_timeout': int(os.environ.get('SECURECHECK_DB_READ_TIMEOUT', '300')),
+}
+
+# Shared connection pool
+POOL_SIZE = int(os.environ.get('SECURECHECK_POOL_SIZE', '8'))
+# Seconds to wait for a free connection before giving up
+POOL_TIMEOUT = float(os.environ.get('SECURECHECK_POOL_TIMEOUT', '10'))
+# Idle connections older than this are pinged before being handed out
+POOL_PING_INTERVAL = float(os.environ.get('SECURECHECK_POOL_PING_INTERVAL', '5'))
+
+# Catalog query result cache
+RESULT_CACHE_SIZE = int(os.environ.get('SECURECHECK_RESULT_CACHE_SIZE', '128'))
+RESULT_CACHE_TTL = float(os.environ.get('SECURECHECK_RESULT_CACHE_TTL', '3600'))
+
+# Columnar cache of the cleaned DataFrame
+CACHE_DIR = os.environ.get('SECURECHECK_CACHE_DIR', os.path.join(os.path.dirname(os.path.dirname(__file__)), '.cache'))
+
+# Rows per chunk for streaming ingestion; bounds peak memory while loading
+CHUNK_SIZE = int(os.environ.get('SECURECHECK_CHUNK_SIZE', '50000'))
+
+# Where catalog queries run: 'mysql' (server, rollup tables) or 'duckdb'
+# (in-process over the cleaned frame, no server needed)
+BACKEND = os.environ.get('SECURECHECK_BACKEND', 'mysql')
+
+# Query profiling: runs kept per catalog query for the p50/p95 diagnostics,
+# and the wall time in seconds above which a run is logged as slow
+QUERY_HISTORY = int(os.environ.get('SECURECHECK_QUERY_HISTORY', '50'))
+SLOW_QUERY_SECONDS = float(os.environ.get('SECURECHECK_SLOW_QUERY_SECONDS', '1.0'))
+
+# Background execution on the Queries page: worker threads, rows fetched per
+# batch from the server-side cursor, and seconds before a query is cancelled
+QUERY_WORKERS = int(os.environ.get('SECURECHECK_QUERY_WORKERS', '4'))
+FETCH_BATCH = int(os.environ.get('SECURECHECK_FETCH_BATCH', '1000'))
+QUERY_TIMEOUT = float(os.environ.get('SECURECHECK_QUERY_TIMEOUT', '120'))
+
+# Logs saved from the Prediction form: the journal directory, the live source
+# name (per host by default; every process locks its own journal, and a
+# process that finds the name taken writes ``<name>-2``, ``<name>-3``, ...),
+# the most records group-committed at once, and seconds between retries while
+# MySQL is unreachable
+LOG_DIR = os.environ.get('SECURECHECK_LOG_DIR', os.path.join(os.path.dirname(os.path.dirname(__file__)), 'logs'))
+LOG_SOURCE = os.environ.get('SECURECHECK_LOG_SOURCE') or 'checkpost-' + re.sub(r'[^\w.-]+', '_', socket.gethostname())
+LOG_BATCH = int(os.environ.get('SECURECHECK_LOG_BATCH', '1000'))
+LOG_RETRY_SECONDS = float(os.environ.get('SECURECHECK_LOG_RETRY_SECONDS', '5'))
+
+# Hive-style Parquet layout of the cleaned stops, one directory per year/month
+# of stop_date (``python -m securecheck.partitions``)
+PARTITION_DIR = os.environ.get('SECURECHECK_PARTITION_DIR', os.path.join(CACHE_DIR, 'partitions'))
+
+# Approximate mode: rows kept in the stratified sample the dashboards
+# estimate from when exact aggregation is switched off
+SAMPLE_SIZE = int(os.environ.get('SECURECHECK_SAMPLE_SIZE', '50000'))
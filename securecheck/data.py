@@ -0,0 +1,152 @@
+"""Reading and cleaning of the raw traffic stops CSV."""
+import argparse
+import hashlib
+
+import pandas as pd
+
+from securecheck.config import CSV_PATH
+
+# Column order of the traffic_stops table
+STOP_COLUMNS = [
+    'stop_date', 'stop_time', 'country_name', 'driver_gender',
+    'driver_age_raw', 'driver_age', 'driver_race', 'violation_raw',
+    'violation', 'search_conducted', 'search_type', 'stop_outcome',
+    'is_arrested', 'stop_duration', 'drugs_related_stop', 'vehicle_number'
+]
+
+CATEGORY_COLUMNS = ['country_name', 'driver_race', 'violation_raw', 'violation', 'stop_outcome', 'search_type']
+BOOL_COLUMNS = ['search_conducted', 'is_arrested', 'drugs_related_stop']
+AGE_COLUMNS = ['driver_age_raw', 'driver_age']
+DURATION_MAP = {'0-15 Min': 1, '16-30 Min': 2, '30+ Min': 3}
+
+# Parse low-cardinality text straight into categories and keep stop_time as
+# text so hour-only values like "14" are not read as integers
+READ_DTYPES = dict.fromkeys(CATEGORY_COLUMNS + ['driver_gender', 'stop_duration'], 'category')
+READ_DTYPES.update(stop_date='string', stop_time='string', vehicle_number='string')
+
+# Bump whenever clean_stops changes its output, to invalidate cached frames
+CLEAN_VERSION = 2
+
+
+def _strip_category(s):
+    """Strip whitespace from a categorical by touching only its categories."""
+    s = s.astype('category')
+    stripped = s.cat.categories.astype(str).str.strip()
+    categories = stripped.unique()
+    codes = categories.get_indexer(stripped)
+    # Keep -1 (missing) as -1 while remapping the others
+    new_codes = pd.Series(codes, dtype='int32').reindex(s.cat.codes, fill_value=-1).to_numpy()
+    return pd.Series(pd.Categorical.from_codes(new_codes, categories), index=s.index, name=s.name)
+
+
+def parse_stop_time(s):
+    """Parse "HH:MM:SS" or hour-only "H"/"HH" values to timedelta64."""
+    s = s.astype('string').str.strip()
+    hour_only = s.str.len() <= 2
+    s = s.where(~hour_only.fillna(False), s + ':00:00')
+    return pd.to_timedelta(s, errors='coerce')
+
+
+def clean_stops(df):
+    """Vectorized cleaning into compact dtypes.
+
+    Dates are datetime64, times timedelta64 since midnight, low-cardinality
+    text is categorical, flags/gender/duration are nullable Int8 and ages
+    nullable Int16.  Missing values stay missing (no 'nan' strings).
+    """
+    df['stop_date'] = pd.to_datetime(df['stop_date'])
+    df['stop_time'] = parse_stop_time(df['stop_time'])
+
+    for col in CATEGORY_COLUMNS:
+        df[col] = _strip_category(df[col])
+    if 'Unknown' not in df['search_type'].cat.categories:
+        df['search_type'] = df['search_type'].cat.add_categories('Unknown')
+    df['search_type'] = df['search_type'].fillna('Unknown')
+    df['vehicle_number'] = df['vehicle_number'].astype('string').str.strip()
+
+    gender = _strip_category(df['driver_gender'])
+    df['driver_gender'] = gender.map({'M': 1, 'F': 0}).astype('Int8')
+    for col in BOOL_COLUMNS:
+        df[col] = df[col].astype('boolean').astype('Int8')
+    for col in AGE_COLUMNS:
+        df[col] = pd.to_numeric(df[col], errors='coerce').round().astype('Int16')
+    df['stop_duration'] = _strip_category(df['stop_duration']).map(DURATION_MAP).astype('Int8')
+    return df
+
+
+def read_stops(path):
+    return clean_stops(pd.read_csv(path, dtype=READ_DTYPES))
+
+
+def format_stop_time(s):
+    """timedelta64 stop times as "HH:MM:SS" strings (missing stays missing)."""
+    seconds = s.dt.total_seconds()
+    text = ((seconds // 3600).astype('Int64').astype('string').str.zfill(2) + ':' +
+            (seconds % 3600 // 60).astype('Int64').astype('string').str.zfill(2) + ':' +
+            (seconds % 60).astype('Int64').astype('string').str.zfill(2))
+    return text
+
+
+def to_db_frame(frame):
+    """Object-dtype copy of ``frame`` with values pymysql can send as-is."""
+    out = frame.copy()
+    out['stop_date'] = out['stop_date'].dt.date
+    out['stop_time'] = format_stop_time(out['stop_time'])
+    out = out.astype(object)
+    return out.where(frame.notna(), None)
+
+
+def memory_report(path):
+    """Bytes per row of the raw parse versus the cleaned frame."""
+    raw = pd.read_csv(path)
+    rows = len(raw)
+    raw_bytes = int(raw.memory_usage(deep=True).sum())
+    clean = read_stops(path)
+    clean_bytes = int(clean.memory_usage(deep=True).sum())
+    return {
+        'rows': rows,
+        'raw_bytes_per_row': raw_bytes / rows if rows else 0.0,
+        'clean_bytes_per_row': clean_bytes / rows if rows else 0.0,
+        'columns': {col: int(clean[col].memory_usage(deep=True, index=False)) for col in clean.columns},
+    }
+
+
+def iter_stops(path, chunk_size):
+    """Yield cleaned frames of at most ``chunk_size`` rows, in file order.
+
+    ``path`` may also be an open file object.
+    """
+    for chunk in pd.read_csv(path, chunksize=chunk_size, dtype=READ_DTYPES):
+        yield clean_stops(chunk.reset_index(drop=True))
+
+
+def file_fingerprint(path, length=None, block_size=1 << 20):
+    """sha256 of the file contents, optionally of only the first ``length`` bytes."""
+    digest = hashlib.sha256()
+    remaining = length
+    with open(path, 'rb') as f:
+        while remaining is None or remaining > 0:
+            size = block_size if remaining is None else min(block_size, remaining)
+            block = f.read(size)
+            if not block:
+                break
+            digest.update(block)
+            if remaining is not None:
+                remaining -= len(block)
+    return digest.hexdigest()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Report memory per row before and after cleaning.")
+    parser.add_argument('path', nargs='?', default=CSV_PATH)
+    args = parser.parse_args(argv)
+
+    report = memory_report(args.path)
+    print(f"{report['rows']:,} rows: {report['raw_bytes_per_row']:.1f} bytes/row raw, "
+          f"{report['clean_bytes_per_row']:.1f} bytes/row cleaned")
+    for col, size in report['columns'].items():
+        print(f"  {col:<20} {size / max(report['rows'], 1):8.1f} bytes/row")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""MySQL connection helpers and a process-wide connection pool."""
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+import pandas as pd
+import pymysql
+from pymysql.err import Error
+
+from securecheck import config
+
+
+class PoolTimeout(Exception):
+    """No connection became free within the pool timeout."""
+
+
+def connect(**overrides):
+    settings = dict(config.DB_SETTINGS, cursorclass=pymysql.cursors.DictCursor)
+    settings.update(overrides)
+    return pymysql.connect(**settings)
+
+
+def fetch_frame(conn, sql):
+    with conn.cursor() as cursor:
+        cursor.execute(sql)
+        return pd.DataFrame(cursor.fetchall())
+
+
+class ConnectionPool:
+    """A bounded pool of pymysql connections shared between threads.
+
+    At most ``size`` connections are open at once; callers block for up to
+    ``timeout`` seconds waiting for one.  Connections that sat idle longer
+    than ``ping_interval`` are pinged (and reconnected if needed) on checkout.
+    """
+
+    def __init__(self, size=config.POOL_SIZE, timeout=config.POOL_TIMEOUT,
+                 ping_interval=config.POOL_PING_INTERVAL, **connect_args):
+        self.size = size
+        self.timeout = timeout
+        self.ping_interval = ping_interval
+        self._connect_args = connect_args
+        self._slots = threading.BoundedSemaphore(size)
+        self._idle = queue.LifoQueue()
+
+    def _checkout(self):
+        try:
+            conn, last_used = self._idle.get_nowait()
+        except queue.Empty:
+            return connect(**self._connect_args)
+        if time.monotonic() - last_used > self.ping_interval:
+            try:
+                conn.ping(reconnect=True)
+            except Error:
+                self._discard(conn)
+                return connect(**self._connect_args)
+        return conn
+
+    def _discard(self, conn):
+        try:
+            conn.close()
+        except Error:
+            pass
+
+    @contextmanager
+    def connection(self):
+        if not self._slots.acquire(timeout=self.timeout):
+            raise PoolTimeout(f"no free database connection after {self.timeout}s")
+        try:
+            conn = self._checkout()
+            try:
+                yield conn
+                # End the read snapshot so the next borrower sees fresh data
+                conn.rollback()
+            except BaseException:
+                self._discard(conn)
+                raise
+            self._idle.put((conn, time.monotonic()))
+        finally:
+            self._slots.release()
+
+    def close(self):
+        while True:
+            try:
+                conn, _ = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            self._discard(conn)
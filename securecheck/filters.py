@@ -0,0 +1,165 @@
+"""Sidebar filtering for app.py without copying the dataset.
+
+``FilterIndex`` is built once per loaded frame.  For every low-cardinality
+filter column it keeps the sorted row positions of each value, so a
+selection is a union of the chosen values' positions per column and an
+intersection across columns.  The metrics, preview and chart aggregates are
+then computed from those positions alone with ``np.bincount``, so the cost
+of a widget change follows the size of the selection, not the table.
+
+``approximate_summary`` estimates the same from the stratified sample of an
+``approx.ApproxIndex``, so its cost does not grow with the log at all.
+"""
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from securecheck.approx import estimate_total, weighted_counts
+
+FILTER_COLUMNS = ('country_name', 'driver_gender', 'violation')
+
+# ``margins``: half-widths of the 95% intervals of the totals, None when exact
+FilterSummary = namedtuple(
+    'FilterSummary', 'total_stops total_arrests drug_stops preview arrests_by_gender '
+                     'stops_by_violation avg_age_by_gender margins',
+    defaults=[None]
+)
+
+
+def _codes(series):
+    series = series.astype('category')
+    return series.cat.codes.to_numpy(), series.cat.categories
+
+
+def _positions_by_code(codes, n_values):
+    order = np.argsort(codes, kind='stable')
+    bounds = np.searchsorted(codes[order], np.arange(-1, n_values + 1))
+    # bounds[0] is where the missing (-1) rows end
+    return [order[bounds[i + 1]:bounds[i + 2]] for i in range(n_values)]
+
+
+def _flag(series):
+    return pd.to_numeric(series, errors='coerce').fillna(0).to_numpy(np.int64)
+
+
+class FilterIndex:
+
+    def __init__(self, df, columns=FILTER_COLUMNS, preview_rows=20):
+        self.df = df
+        self.preview_rows = preview_rows
+        self.categories = {}
+        self.codes = {}
+        self._positions = {}
+        for col in columns:
+            codes, categories = _codes(df[col])
+            positions = _positions_by_code(codes, len(categories))
+            self.codes[col] = codes
+            self.categories[col] = categories
+            self._positions[col] = dict(zip(categories, positions))
+
+        self._arrested = _flag(df['is_arrested'])
+        self._drugs = _flag(df['drugs_related_stop'])
+        age = pd.to_numeric(df['driver_age'], errors='coerce').to_numpy(np.float64, na_value=np.nan)
+        self._age_known = ~np.isnan(age)
+        self._age = np.where(self._age_known, age, 0.0)
+        self._everything = self._summarize(slice(None))
+
+    def options(self, col):
+        """Values of ``col`` that occur at least once."""
+        return [value for value, rows in self._positions[col].items() if len(rows)]
+
+    def select(self, within=None, **selections):
+        """Row positions matching every non-empty selection, or None for all rows.
+
+        ``within`` (sorted row positions, e.g. a date range's) narrows the result further.
+        """
+        per_column = [] if within is None else [within]
+        for col, chosen in selections.items():
+            if chosen:
+                positions = self._positions[col]
+                rows = np.concatenate([positions.get(value, np.empty(0, np.int64)) for value in chosen])
+                rows.sort()
+                per_column.append(rows)
+        if not per_column:
+            return None
+        per_column.sort(key=len)
+        rows = per_column[0]
+        for other in per_column[1:]:
+            rows = np.intersect1d(rows, other, assume_unique=True)
+        return rows
+
+    def _per_value(self, col, rows, weights=None):
+        codes = self.codes[col][rows]
+        known = codes >= 0
+        if weights is not None:
+            weights = weights[known]
+        counts = np.bincount(codes[known], weights=weights, minlength=len(self.categories[col]))
+        return pd.Series(counts, index=self.categories[col])
+
+    def _summarize(self, rows):
+        stops_by_gender = self._per_value('driver_gender', rows)
+        present = stops_by_gender > 0
+
+        age_sum = self._per_value('driver_gender', rows, self._age[rows])
+        age_n = self._per_value('driver_gender', rows, self._age_known[rows].astype(np.float64))
+        avg_age = (age_sum / age_n.where(age_n > 0))[present]
+
+        arrests_by_gender = self._per_value('driver_gender', rows, self._arrested[rows].astype(np.float64))
+        stops_by_violation = self._per_value('violation', rows).astype(np.int64)
+        stops_by_violation = stops_by_violation[stops_by_violation > 0].sort_values(ascending=False)
+
+        # Only the all-rows summary, built once, passes a slice; a selection
+        # already is the row positions
+        if isinstance(rows, slice):
+            total_stops, preview = len(self.df), self.df.iloc[:self.preview_rows]
+        else:
+            total_stops, preview = len(rows), self.df.iloc[rows[:self.preview_rows]]
+        return FilterSummary(
+            total_stops=total_stops,
+            total_arrests=int(self._arrested[rows].sum()),
+            drug_stops=int(self._drugs[rows].sum()),
+            preview=preview,
+            arrests_by_gender=arrests_by_gender[present].astype(np.int64),
+            stops_by_violation=stops_by_violation,
+            avg_age_by_gender=avg_age,
+        )
+
+    def summarize(self, rows=None):
+        """Metrics, preview and chart aggregates for ``rows`` (None = all)."""
+        if rows is None:
+            return self._everything
+        return self._summarize(rows)
+
+
+def approximate_summary(sample, date_range=None, preview_rows=20, **selections):
+    """``FilterIndex.summarize`` estimated from an ``approx.Sample``, with 95% margins on the totals."""
+    rows = sample.rows
+    keep = np.ones(len(rows), bool) if date_range is None else date_range.mask(rows['stop_date'])
+    for col, chosen in selections.items():
+        if chosen:
+            keep &= rows[col].isin(chosen).to_numpy()
+    inside = keep.astype(np.float64)
+    arrested = _flag(rows['is_arrested']) * inside
+    drugs = _flag(rows['drugs_related_stop']) * inside
+    total, arrests, drug_stops = (estimate_total(sample, values) for values in (inside, arrested, drugs))
+
+    stops_by_gender = weighted_counts(sample, 'driver_gender', inside)
+    present = stops_by_gender > 0
+    age = pd.to_numeric(rows['driver_age'], errors='coerce').to_numpy(np.float64, na_value=np.nan)
+    age_known = ~np.isnan(age) * inside
+    age_sum = weighted_counts(sample, 'driver_gender', np.where(age_known > 0, age, 0.0))
+    age_n = weighted_counts(sample, 'driver_gender', age_known)
+    stops_by_violation = weighted_counts(sample, 'violation', inside).round().astype(np.int64)
+
+    return FilterSummary(
+        total_stops=int(round(total.value)),
+        total_arrests=int(round(arrests.value)),
+        drug_stops=int(round(drug_stops.value)),
+        preview=rows[keep].head(preview_rows),
+        arrests_by_gender=weighted_counts(sample, 'driver_gender', arrested)[present].round().astype(np.int64),
+        stops_by_violation=stops_by_violation[stops_by_violation > 0].sort_values(ascending=False),
+        avg_age_by_gender=(age_sum / age_n.where(age_n > 0))[present],
+        margins={'total_stops': int(round(total.margin)), 'total_arrests': int(round(arrests.margin)),
+                 'drug_stops': int(round(drug_stops.margin))},
+    )
@@ -0,0 +1,112 @@
+"""On-disk columnar cache of the cleaned traffic stops frame.
+
+The cleaned frame is written as an uncompressed Feather (Arrow IPC) file
+named after the sha256 of the source CSV, and memory-mapped on later cold
+starts instead of re-parsing and re-cleaning the CSV.  The file is built by
+streaming the CSV chunk by chunk, so building it never needs the whole raw
+CSV in memory.  Hashing a large CSV
+is itself not free, so the hash is remembered per (path, size, mtime) in a
+small JSON index next to the cache files.
+
+Needs pyarrow; without it ``load_stops`` falls back to parsing the CSV.
+"""
+import glob
+import json
+import os
+
+from securecheck import config
+from securecheck.data import CLEAN_VERSION, CSV_PATH, file_fingerprint, read_stops
+from securecheck.stream import FeatherSink, read_feather_frame, stream_csv
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+INDEX_FILE = 'fingerprints.json'
+
+
+def _read_index(cache_dir):
+    try:
+        with open(os.path.join(cache_dir, INDEX_FILE)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _atomic_write(path, write):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def source_fingerprint(path, cache_dir=config.CACHE_DIR):
+    """sha256 of ``path``, re-hashed only when its size or mtime changed."""
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    index = _read_index(cache_dir)
+    entry = index.get(path)
+    if entry and entry['size'] == stat.st_size and entry['mtime'] == stat.st_mtime:
+        return entry['sha256']
+
+    sha256 = file_fingerprint(path)
+    index[path] = {'size': stat.st_size, 'mtime': stat.st_mtime, 'sha256': sha256}
+    os.makedirs(cache_dir, exist_ok=True)
+
+    def write(tmp_path):
+        with open(tmp_path, 'w') as f:
+            json.dump(index, f)
+    _atomic_write(os.path.join(cache_dir, INDEX_FILE), write)
+    return sha256
+
+
+def cache_path(fingerprint, cache_dir=config.CACHE_DIR):
+    return os.path.join(cache_dir, f"stops-{fingerprint[:16]}-v{CLEAN_VERSION}.feather")
+
+
+def is_cached(path=CSV_PATH, cache_dir=config.CACHE_DIR):
+    return pa is not None and os.path.exists(cache_path(source_fingerprint(path, cache_dir), cache_dir))
+
+
+def cache_sink(path=CSV_PATH, cache_dir=config.CACHE_DIR):
+    """A ``FeatherSink`` writing the cache file for ``path``."""
+    return FeatherSink(cache_path(source_fingerprint(path, cache_dir), cache_dir))
+
+
+def prune(keep, cache_dir=config.CACHE_DIR):
+    """Remove cached frames other than ``keep``."""
+    for old in glob.glob(os.path.join(cache_dir, 'stops-*.feather')):
+        if old != keep:
+            try:
+                os.remove(old)
+            except OSError:
+                # Still mapped by another process (Windows); try again next time
+                pass
+
+
+def build(path=CSV_PATH, cache_dir=config.CACHE_DIR, chunk_size=config.CHUNK_SIZE, progress=None):
+    """Stream ``path`` into its cache file; returns the final ``IngestProgress``."""
+    sink = cache_sink(path, cache_dir)
+    try:
+        result = stream_csv(path, [sink], chunk_size, progress)
+    except BaseException:
+        sink.abort()
+        raise
+    # Only the newest frame per cleaning version is worth keeping
+    prune(sink.path, cache_dir)
+    return result
+
+
+def load_stops(path=CSV_PATH, cache_dir=config.CACHE_DIR):
+    """The cleaned frame for ``path``, from the columnar cache when possible."""
+    if pa is None:
+        return read_stops(path)
+
+    cached = cache_path(source_fingerprint(path, cache_dir), cache_dir)
+    if not os.path.exists(cached):
+        build(path, cache_dir)
+    return read_feather_frame(cached)
@@ -0,0 +1,146 @@
+"""Background execution of catalog queries.
+
+``QueryRunner.submit`` starts a query on a worker thread and returns a
+``QueryJob`` right away.  The job collects the streamed batches as they
+arrive, so the page can show the first rows while the rest is still being
+fetched, and it can be cancelled (by the user or by its timeout) at any
+point, which stops the statement on the server.
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from securecheck import config
+from securecheck.backends import BackendError
+from securecheck.profiling import QueryStats, result_bytes
+
+FINISHED = ('done', 'failed', 'cancelled', 'timed out')
+
+
+class QueryJob:
+
+    def __init__(self, name, sql, timeout=None, on_done=None):
+        self.name = name
+        self.sql = sql
+        self.timeout = timeout
+        self.on_done = on_done
+        self.status = 'queued'
+        self.error = None
+        self.rows = 0
+        self.submitted = time.perf_counter()
+        self.started = None
+        self.statement_started = None
+        self.finished = None
+        self._frames = []
+        self._lock = threading.Lock()
+        self._cancelled = threading.Event()
+        self._cancel_reason = None
+        self._cancel_statement = None
+
+    @property
+    def done(self):
+        return self.status in FINISHED
+
+    @property
+    def elapsed(self):
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.perf_counter()) - self.started
+
+    def _on_start(self, cancel_statement):
+        self.statement_started = time.perf_counter()
+        self._cancel_statement = cancel_statement
+        # Cancelled while it was still waiting for a connection
+        if self._cancelled.is_set():
+            cancel_statement()
+
+    def run(self, backend, batch_size=config.FETCH_BATCH):
+        self.started = time.perf_counter()
+        self.status = 'running'
+        timer = None
+        if self.timeout:
+            timer = threading.Timer(self.timeout, self.cancel, args=('timed out',))
+            timer.daemon = True
+            timer.start()
+        status = 'done'
+        stream = backend.stream(self.sql, batch_size, self._on_start)
+        try:
+            for frame in stream:
+                with self._lock:
+                    self._frames.append(frame)
+                    self.rows += len(frame)
+                if self._cancelled.is_set():
+                    break
+        except Exception as e:
+            # Anything escaping here would leave the job 'running' forever
+            status, self.error = 'failed', str(e)
+        finally:
+            if timer:
+                timer.cancel()
+            try:
+                stream.close()
+            except Exception:
+                pass
+        # An interrupted statement surfaces as an error; report why it stopped
+        if self._cancelled.is_set():
+            status, self.error = self._cancel_reason, None
+        self.finished = time.perf_counter()
+        self.status = status
+        if self.on_done:
+            self.on_done(self)
+
+    def cancel(self, reason='cancelled'):
+        if self.done or self._cancelled.is_set():
+            return
+        self._cancel_reason = reason
+        self._cancelled.set()
+        if self._cancel_statement:
+            try:
+                self._cancel_statement()
+            except BackendError:
+                pass
+
+    def head(self, n):
+        """The first ``n`` rows received so far."""
+        with self._lock:
+            frames = list(self._frames)
+        taken, total = [], 0
+        for frame in frames:
+            if total >= n:
+                break
+            taken.append(frame.head(n - total))
+            total += len(taken[-1])
+        return pd.concat(taken, ignore_index=True) if taken else pd.DataFrame()
+
+    def result(self):
+        with self._lock:
+            frames = list(self._frames)
+        return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+    def stats(self):
+        """``QueryStats`` of a finished job, for the profiler."""
+        result = self.result()
+        acquire = (self.statement_started or self.started) - self.started
+        return QueryStats(self.elapsed, acquire, len(result), result_bytes(result), None)
+
+
+class QueryRunner:
+    """A fixed set of worker threads running ``QueryJob``s on one backend."""
+
+    def __init__(self, backend, workers=config.QUERY_WORKERS, batch_size=config.FETCH_BATCH,
+                 timeout=config.QUERY_TIMEOUT):
+        self.backend = backend
+        self.batch_size = batch_size
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(workers, thread_name_prefix='securecheck-query')
+
+    def submit(self, name, sql, timeout=None, on_done=None):
+        """Start ``sql``; ``on_done(job)`` is called on the worker once it finishes."""
+        job = QueryJob(name, sql, timeout or self.timeout, on_done)
+        self._executor.submit(job.run, self.backend, self.batch_size)
+        return job
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,583 @@
+"""Incremental, idempotent loader for the traffic_stops table.
+
+Every source file gets a row in ``ingest_sources`` holding its content
+fingerprint and a high-water mark (the number of CSV rows loaded).  A sync
+skips the file entirely when the fingerprint is unchanged, only inserts the
+rows past the high-water mark when the file was appended to, and otherwise
+upserts just the rows whose content hash changed.
+
+Stops dropped with their partitions (``partitions drop --mysql``) set each
+source's ``retained_from``, and no load writes rows dated before it again.
+Once the table is partitioned by month ``stop_date`` is NOT NULL, so undated
+rows are skipped as well.
+
+New sources are loaded through the bulk path instead: the CSV is streamed in
+bounded chunks and written with multi-row INSERTs or ``LOAD DATA LOCAL
+INFILE``, one short transaction per chunk, with the secondary indexes built
+once at the end.
+
+Run it once after dropping a new CSV in place:
+
+    python -m securecheck.loader [path/to/traffic_stops.csv] [--mode values|infile|upsert]
+"""
+import argparse
+import csv
+import hashlib
+import os
+import sys
+import tempfile
+import time
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from securecheck import config, db, frame_cache, partitions, rollups
+from securecheck.data import CSV_PATH, STOP_COLUMNS, file_fingerprint, read_stops, to_db_frame
+from securecheck.stream import stream_csv
+
+SOURCES_DDL = """
+    CREATE TABLE IF NOT EXISTS ingest_sources (
+        source_id INT AUTO_INCREMENT PRIMARY KEY,
+        source_path VARCHAR(512) NOT NULL,
+        fingerprint CHAR(64) NOT NULL,
+        byte_size BIGINT NOT NULL,
+        mtime DOUBLE NOT NULL,
+        row_count INT NOT NULL,
+        retained_from DATE NULL,
+        loaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+        UNIQUE KEY uq_source_path (source_path)
+    )
+"""
+
+STOPS_DDL = """
+    CREATE TABLE IF NOT EXISTS traffic_stops (
+        stop_date DATE,
+        stop_time TIME,
+        country_name VARCHAR(100),
+        driver_gender TINYINT(1),
+        driver_age_raw INT,
+        driver_age INT,
+        driver_race VARCHAR(100),
+        violation_raw VARCHAR(100),
+        violation VARCHAR(100),
+        search_conducted TINYINT(1),
+        search_type VARCHAR(100),
+        stop_outcome VARCHAR(100),
+        is_arrested TINYINT(1),
+        stop_duration TINYINT(1),
+        drugs_related_stop TINYINT(1),
+        vehicle_number VARCHAR(50),
+        source_id INT NOT NULL,
+        source_row INT NOT NULL,
+        row_hash BIGINT UNSIGNED NOT NULL,
+        {generated},
+        PRIMARY KEY (source_id, source_row)
+    )
+"""
+
+# Virtual columns for the expressions the catalog groups by, so they can be
+# indexed; computed by MySQL and never written by the loader
+GENERATED_COLUMNS = {
+    'stop_year': 'SMALLINT AS (YEAR(stop_date)) VIRTUAL',
+    'stop_month': 'TINYINT AS (MONTH(stop_date)) VIRTUAL',
+    'stop_hour': 'TINYINT AS (HOUR(stop_time)) VIRTUAL',
+    'age_bucket': 'SMALLINT AS (driver_age DIV 10 * 10) VIRTUAL',
+}
+
+STOPS_DDL = STOPS_DDL.format(generated=',\n        '.join(f"{c} {d}" for c, d in GENERATED_COLUMNS.items()))
+
+# Built after bulk loads rather than maintained row by row during them.  The
+# composite ones cover the catalog's filters and groupings plus the flags it
+# sums, so those queries and the rollup refreshes read only the index.
+SECONDARY_INDEXES = {
+    'idx_vehicle': '(vehicle_number)',
+    'idx_date': '(stop_date)',
+    'idx_time': '(stop_time)',
+    'idx_drugs_vehicle': '(drugs_related_stop, vehicle_number)',
+    'idx_search_vehicle': '(search_conducted, vehicle_number)',
+    'idx_profile': '(country_name, violation, driver_race, driver_gender, driver_age, stop_duration, '
+                   'is_arrested, search_conducted, drugs_related_stop)',
+    'idx_calendar': '(country_name, stop_year, stop_month, stop_hour, '
+                    'is_arrested, search_conducted, drugs_related_stop)',
+    'idx_age_bucket': '(age_bucket, is_arrested)',
+}
+
+LOAD_COLUMNS = STOP_COLUMNS + ['source_id', 'source_row', 'row_hash']
+
+UPSERT_SQL = "INSERT INTO traffic_stops ({}) VALUES ({}) ON DUPLICATE KEY UPDATE {}".format(
+    ', '.join(LOAD_COLUMNS),
+    ', '.join(['%s'] * len(LOAD_COLUMNS)),
+    ', '.join(f"{c} = VALUES({c})" for c in STOP_COLUMNS + ['row_hash'])
+)
+
+INSERT_SQL = "INSERT INTO traffic_stops ({}) VALUES ({})".format(
+    ', '.join(LOAD_COLUMNS), ', '.join(['%s'] * len(LOAD_COLUMNS))
+)
+
+LOAD_DATA_SQL = """
+    LOAD DATA LOCAL INFILE %s INTO TABLE traffic_stops
+    FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '"' ESCAPED BY ''
+    LINES TERMINATED BY '\\n'
+    ({})
+""".format(', '.join(LOAD_COLUMNS))
+
+BATCH_SIZE = 5000
+
+# What traffic_stops holds of one source: aligned arrays of source_row and row_hash
+StoredRows = namedtuple('StoredRows', 'source_row row_hash')
+
+
+def ensure_schema(conn, indexes=True):
+    """Create or migrate the tables; ``indexes=False`` leaves the secondary indexes to the caller."""
+    with conn.cursor() as cursor:
+        cursor.execute("""
+            SELECT COUNT(*) AS n FROM information_schema.columns
+            WHERE table_schema = DATABASE() AND table_name = 'traffic_stops'
+              AND column_name = 'row_hash'
+        """)
+        has_row_hash = cursor.fetchone()['n'] > 0
+        cursor.execute("SHOW TABLES LIKE 'traffic_stops'")
+        if cursor.fetchone() and not has_row_hash:
+            # The old table was truncated and reloaded on every run, so it
+            # holds nothing that cannot be rebuilt from the CSV.
+            cursor.execute("DROP TABLE traffic_stops")
+            cursor.execute("DROP TABLE IF EXISTS ingest_sources")
+        cursor.execute(SOURCES_DDL)
+        cursor.execute(STOPS_DDL)
+        cursor.execute("""
+            SELECT COUNT(*) AS n FROM information_schema.columns
+            WHERE table_schema = DATABASE() AND table_name = 'ingest_sources'
+              AND column_name = 'retained_from'
+        """)
+        if not cursor.fetchone()['n']:
+            cursor.execute("ALTER TABLE ingest_sources ADD COLUMN retained_from DATE NULL AFTER row_count")
+    conn.commit()
+    add_generated_columns(conn)
+    if indexes:
+        create_indexes(conn)
+    rollups.ensure_schema(conn)
+
+
+def add_generated_columns(conn):
+    """Migrate a traffic_stops table created before GENERATED_COLUMNS existed."""
+    with conn.cursor() as cursor:
+        cursor.execute("""
+            SELECT column_name AS name FROM information_schema.columns
+            WHERE table_schema = DATABASE() AND table_name = 'traffic_stops'
+        """)
+        present = {r['name'] for r in cursor.fetchall()}
+        missing = [c for c in GENERATED_COLUMNS if c not in present]
+        if missing:
+            cursor.execute("ALTER TABLE traffic_stops " + ', '.join(
+                f"ADD COLUMN {c} {GENERATED_COLUMNS[c]}" for c in missing))
+    conn.commit()
+
+
+def _existing_indexes(cursor):
+    cursor.execute("""
+        SELECT DISTINCT index_name FROM information_schema.statistics
+        WHERE table_schema = DATABASE() AND table_name = 'traffic_stops'
+    """)
+    return {r['index_name'] for r in cursor.fetchall()}
+
+
+def drop_indexes(conn):
+    with conn.cursor() as cursor:
+        present = [name for name in SECONDARY_INDEXES if name in _existing_indexes(cursor)]
+        if present:
+            cursor.execute("ALTER TABLE traffic_stops " + ', '.join(f"DROP INDEX {n}" for n in present))
+    conn.commit()
+
+
+def create_indexes(conn):
+    with conn.cursor() as cursor:
+        missing = [name for name in SECONDARY_INDEXES if name not in _existing_indexes(cursor)]
+        if missing:
+            # One ALTER builds all missing indexes in a single table pass
+            cursor.execute("ALTER TABLE traffic_stops " + ', '.join(
+                f"ADD INDEX {n} {SECONDARY_INDEXES[n]}" for n in missing))
+    conn.commit()
+
+
+def row_hashes(frame):
+    return pd.util.hash_pandas_object(frame[STOP_COLUMNS], index=False).to_numpy()
+
+
+def _records(frame, source_id, positions, hashes, offset=0):
+    values = to_db_frame(frame[STOP_COLUMNS].iloc[positions])
+    for pos, row in zip(positions, values.itertuples(index=False, name=None)):
+        yield row + (source_id, offset + int(pos), int(hashes[pos]))
+
+
+def _delete_rows(cursor, source_id, rows):
+    deleted = 0
+    for start in range(0, len(rows), BATCH_SIZE):
+        batch = rows[start:start + BATCH_SIZE]
+        deleted += cursor.execute(
+            "DELETE FROM traffic_stops WHERE source_id = %s AND source_row IN ({})".format(
+                ', '.join(['%s'] * len(batch))),
+            (source_id, *batch)
+        )
+    return deleted
+
+
+def _delete_source(conn, source_id, batch_size=config.CHUNK_SIZE):
+    """Delete every row of ``source_id``, ``batch_size`` source rows per transaction."""
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT MAX(source_row) AS last FROM traffic_stops WHERE source_id = %s", (source_id,))
+        last = cursor.fetchone()['last']
+        if last is None:
+            return 0
+        deleted = 0
+        for start in range(0, last + 1, batch_size):
+            # A primary key range, so each batch locks only the rows it deletes
+            deleted += cursor.execute(
+                "DELETE FROM traffic_stops WHERE source_id = %s AND source_row BETWEEN %s AND %s",
+                (source_id, start, start + batch_size - 1)
+            )
+            conn.commit()
+    return deleted
+
+
+def _upsert(cursor, frame, source_id, positions, hashes, stored_rows=()):
+    known = np.isin(positions, stored_rows)
+    for start in range(0, len(positions), BATCH_SIZE):
+        batch = positions[start:start + BATCH_SIZE]
+        # On a partitioned table stop_date is part of the key, so a changed
+        # row whose date moved would be inserted next to the old one
+        _delete_rows(cursor, source_id, [pos for pos, k in zip(batch, known[start:start + BATCH_SIZE]) if k])
+        cursor.executemany(UPSERT_SQL, list(_records(frame, source_id, batch, hashes)))
+
+
+def diff_rows(hashes, stored, start=0, storable=None):
+    """``(upsert, delete)``: the source rows that bring the stored ones in line with a file.
+
+    ``hashes`` are the file's row hashes and ``stored`` the ``StoredRows``
+    loaded from ``start`` on.  Rows ``storable`` masks out are deleted, not
+    written.
+    """
+    keep = np.ones(len(hashes), bool) if storable is None else storable
+    inside = stored.source_row < len(hashes)
+    rows = stored.source_row[inside]
+    current = np.zeros(len(hashes), bool)
+    current[rows] = stored.row_hash[inside] == hashes[rows]
+    changed = keep & ~current
+    changed[:start] = False
+    delete = np.union1d(stored.source_row[~inside], rows[~keep[rows]])
+    return np.flatnonzero(changed).tolist(), delete.tolist()
+
+
+def _retention(cursor, source_id):
+    """``(retained_from, dated_only)``: which rows of ``source_id`` traffic_stops still takes."""
+    cursor.execute("SELECT retained_from FROM ingest_sources WHERE source_id = %s", (source_id,))
+    source = cursor.fetchone()
+    cursor.execute("""
+        SELECT is_nullable AS nullable FROM information_schema.columns
+        WHERE table_schema = DATABASE() AND table_name = 'traffic_stops' AND column_name = 'stop_date'
+    """)
+    return None if source is None else source['retained_from'], cursor.fetchone()['nullable'] == 'NO'
+
+
+def _storable(frame, retained_from, dated_only):
+    """Mask of the rows of ``frame`` to store under ``_retention``."""
+    dates = frame['stop_date']
+    keep = dates.notna().to_numpy() if dated_only else np.ones(len(frame), bool)
+    if retained_from is not None:
+        keep = keep & ~(dates < pd.Timestamp(retained_from)).to_numpy()
+    return keep
+
+
+def _table_retention(cursor):
+    # A new source starts where the dropped partitions end
+    cursor.execute("SELECT MAX(retained_from) AS retained_from FROM ingest_sources")
+    return cursor.fetchone()['retained_from']
+
+
+def _stored_hashes(cursor, source_id, from_row=0):
+    cursor.execute(
+        "SELECT source_row, row_hash FROM traffic_stops WHERE source_id = %s AND source_row >= %s",
+        (source_id, from_row)
+    )
+    rows = cursor.fetchall()
+    return StoredRows(np.fromiter((r['source_row'] for r in rows), np.int64, len(rows)),
+                      np.fromiter((r['row_hash'] for r in rows), np.uint64, len(rows)))
+
+
+def _get_source(cursor, source_path):
+    cursor.execute("SELECT * FROM ingest_sources WHERE source_path = %s", (source_path,))
+    return cursor.fetchone()
+
+
+def _write_values(cursor, chunk, source_id, offset, hashes, positions):
+    # pymysql folds executemany INSERTs into multi-row VALUES statements
+    cursor.executemany(INSERT_SQL, list(_records(chunk, source_id, positions, hashes, offset)))
+
+
+def _write_infile(cursor, chunk, source_id, offset, hashes, positions):
+    # With ESCAPED BY '' MySQL reads an unquoted NULL field as SQL NULL
+    frame = to_db_frame(chunk[STOP_COLUMNS])
+    frame['source_id'] = source_id
+    frame['source_row'] = range(offset, offset + len(frame))
+    frame['row_hash'] = hashes
+    frame = frame.iloc[positions]
+    if not len(frame):
+        return
+    fd, tmp_path = tempfile.mkstemp(suffix='.csv')
+    try:
+        with os.fdopen(fd, 'w', newline='', encoding='utf-8') as f:
+            frame.to_csv(f, header=False, index=False, na_rep='NULL', lineterminator='\n',
+                         quoting=csv.QUOTE_MINIMAL)
+        cursor.execute(LOAD_DATA_SQL, (tmp_path,))
+    finally:
+        os.remove(tmp_path)
+
+
+class BulkSink:
+    """``stream_csv`` sink that replaces the rows of one source in traffic_stops.
+
+    ``mode`` is ``'values'`` (multi-row INSERT batches) or ``'infile'``
+    (``LOAD DATA LOCAL INFILE``, needs a connection opened with
+    ``local_infile=True``).  The old rows of a known source are deleted in
+    ``CHUNK_SIZE`` ranges of ``source_row`` and each chunk is committed on
+    its own; the secondary indexes are dropped on open and rebuilt on close.  Rows the
+    table no longer takes (see ``_retention``) are counted in ``skipped``.
+    """
+
+    def __init__(self, conn, path, mode='values'):
+        self.conn = conn
+        self.source_path = os.path.abspath(path)
+        self.mode = mode
+        self._write = {'values': _write_values, 'infile': _write_infile}[mode]
+        self.rows = 0
+        self.skipped = 0
+
+    def open(self):
+        # The indexes go before the old rows do, so neither the delete nor
+        # the load maintains them
+        ensure_schema(self.conn, indexes=False)
+        drop_indexes(self.conn)
+        self._stat = os.stat(self.source_path)
+        self._fingerprint = file_fingerprint(self.source_path)
+        with self.conn.cursor() as cursor:
+            self._source = _get_source(cursor, self.source_path)
+            if self._source is None:
+                cursor.execute(
+                    "INSERT INTO ingest_sources (source_path, fingerprint, byte_size, mtime, row_count, retained_from) "
+                    "VALUES (%s, %s, %s, %s, 0, %s)",
+                    (self.source_path, '', 0, 0, _table_retention(cursor))
+                )
+                self.source_id = cursor.lastrowid
+            else:
+                self.source_id = self._source['source_id']
+                # Forget the old file first, so a sync after an interrupted
+                # reload diffs every row instead of finding it unchanged
+                cursor.execute(
+                    "UPDATE ingest_sources SET fingerprint = '', byte_size = 0, mtime = 0, row_count = 0 "
+                    "WHERE source_id = %s",
+                    (self.source_id,)
+                )
+            self._retention = _retention(cursor, self.source_id)
+        self.conn.commit()
+        if self._source is not None:
+            _delete_source(self.conn, self.source_id)
+
+    def write(self, chunk, offset):
+        positions = np.flatnonzero(_storable(chunk, *self._retention))
+        with self.conn.cursor() as cursor:
+            self._write(cursor, chunk, self.source_id, offset, row_hashes(chunk), positions)
+        self.conn.commit()
+        self.rows = offset + len(chunk)
+        self.skipped += len(chunk) - len(positions)
+
+    def close(self):
+        create_indexes(self.conn)
+        partitions.extend_mysql(self.conn)
+        # A brand-new source only adds rows; a reload may have removed some
+        if self._source is None:
+            rollups.refresh(self.conn, self.source_id, 0)
+        else:
+            rollups.refresh(self.conn)
+
+        # Updated last, so the data version only moves once the rollups match
+        with self.conn.cursor() as cursor:
+            cursor.execute(
+                "UPDATE ingest_sources SET fingerprint = %s, byte_size = %s, mtime = %s, row_count = %s "
+                "WHERE source_id = %s",
+                (self._fingerprint, self._stat.st_size, self._stat.st_mtime, self.rows, self.source_id)
+            )
+        self.conn.commit()
+
+
+def bulk_load(conn, path=CSV_PATH, mode='values', chunk_size=config.CHUNK_SIZE, progress=None):
+    """Replace the rows of ``path`` by streaming it in chunks of ``chunk_size``.
+
+    ``progress`` is called with an ``IngestProgress`` after every committed chunk.
+    """
+    sink = BulkSink(conn, path, mode)
+    result = stream_csv(sink.source_path, [sink], chunk_size, progress)
+    return {'source': sink.source_path, 'status': 'loaded', 'mode': mode, 'upserted': result.rows - sink.skipped,
+            'deleted': 0, 'skipped': sink.skipped, 'seconds': result.seconds, 'rows_per_sec': result.rows_per_sec}
+
+
+def bulk_load_with_cache(conn, path=CSV_PATH, mode='values', chunk_size=config.CHUNK_SIZE, progress=None):
+    """``bulk_load`` that also writes the columnar frame cache from the same chunks."""
+    sink = BulkSink(conn, path, mode)
+    cache = frame_cache.cache_sink(path)
+    try:
+        result = stream_csv(sink.source_path, [sink, cache], chunk_size, progress)
+    except BaseException:
+        cache.abort()
+        raise
+    frame_cache.prune(cache.path)
+    return {'source': sink.source_path, 'status': 'loaded', 'mode': mode, 'upserted': result.rows - sink.skipped,
+            'deleted': 0, 'skipped': sink.skipped, 'seconds': result.seconds, 'rows_per_sec': result.rows_per_sec}
+
+
+def sync_source(conn, path=CSV_PATH):
+    """Bring traffic_stops in line with ``path``; returns a summary dict."""
+    # The indexes wait until it is clear this is not a first load, which drops them
+    ensure_schema(conn, indexes=False)
+    source_path = os.path.abspath(path)
+    stat = os.stat(source_path)
+    summary = {'source': source_path, 'status': 'unchanged', 'upserted': 0, 'deleted': 0, 'skipped': 0}
+    started = time.perf_counter()
+
+    with conn.cursor() as cursor:
+        source = _get_source(cursor, source_path)
+        if source is None:
+            # Nothing to diff against, so take the bulk path
+            return bulk_load(conn, source_path)
+        create_indexes(conn)
+        if source['byte_size'] == stat.st_size and source['mtime'] == stat.st_mtime:
+            return summary
+
+        fingerprint = file_fingerprint(source_path)
+        if source['fingerprint'] == fingerprint:
+            # Touched but not modified
+            cursor.execute("UPDATE ingest_sources SET mtime = %s WHERE source_id = %s",
+                           (stat.st_mtime, source['source_id']))
+            conn.commit()
+            return summary
+
+        frame = read_stops(source_path)
+        hashes = row_hashes(frame)
+
+        source_id = source['source_id']
+        appended = (stat.st_size > source['byte_size'] and
+                    file_fingerprint(source_path, source['byte_size']) == source['fingerprint'])
+        # On append only the rows past the high-water mark can be new; the
+        # last loaded row is re-checked in case its line had no newline yet.
+        start = max(source['row_count'] - 1, 0) if appended else 0
+        stored = _stored_hashes(cursor, source_id, start)
+        summary['status'] = 'appended' if appended else 'upserted'
+
+        # Rows before the retention cutoff are not missing, they were dropped;
+        # a stored row edited to a date the table no longer takes goes too
+        storable = _storable(frame, *_retention(cursor, source_id))
+        positions, removed = diff_rows(hashes, stored, start, storable)
+        _upsert(cursor, frame, source_id, positions, hashes, stored.source_row)
+        summary['upserted'] = len(positions)
+        summary['skipped'] = int((~storable[start:]).sum())
+        summary['deleted'] = _delete_rows(cursor, source_id, removed)
+        conn.commit()
+        partitions.extend_mysql(conn)
+
+        if positions and positions[0] >= source['row_count'] and not summary['deleted']:
+            # Pure append: fold just the new rows into the rollups
+            rollups.refresh(conn, source_id, source['row_count'])
+        elif positions or summary['deleted']:
+            rollups.refresh(conn)
+
+        # Updated last, so the data version only moves once the rollups match
+        cursor.execute(
+            "UPDATE ingest_sources SET fingerprint = %s, byte_size = %s, mtime = %s, row_count = %s "
+            "WHERE source_id = %s",
+            (fingerprint, stat.st_size, stat.st_mtime, len(frame), source_id)
+        )
+    conn.commit()
+    summary['seconds'] = time.perf_counter() - started
+    summary['rows_per_sec'] = summary['upserted'] / summary['seconds'] if summary['seconds'] else 0.0
+    return summary
+
+
+def live_source(conn, source_path):
+    """``(source_id, row_count)`` of a live (journal-fed) source, registering it if new."""
+    ensure_schema(conn)
+    with conn.cursor() as cursor:
+        source = _get_source(cursor, source_path)
+        if source is None:
+            cursor.execute(
+                "INSERT INTO ingest_sources (source_path, fingerprint, byte_size, mtime, row_count, retained_from) "
+                "VALUES (%s, %s, 0, 0, 0, %s)",
+                (source_path, 'live', _table_retention(cursor))
+            )
+            source = {'source_id': cursor.lastrowid, 'row_count': 0}
+    conn.commit()
+    return source['source_id'], source['row_count']
+
+
+def append_live(conn, source_id, frame, first_row, row_count):
+    """Write the rows of a live source past its high-water mark ``first_row`` in one transaction.
+
+    ``frame`` is indexed by ``source_row``, with gaps where the writer
+    rejected a record, and ``row_count`` is the new high-water mark.  The
+    rows, their rollup fold-in and the mark commit together, so a batch
+    replayed after a crash is never counted twice.  Returns how many rows
+    were skipped as undated or older than ``retained_from``.
+    """
+    with conn.cursor() as cursor:
+        storable = _storable(frame, *_retention(cursor, source_id))
+        frame = frame[storable]
+        if len(frame):
+            values = to_db_frame(frame[STOP_COLUMNS]).itertuples(index=False, name=None)
+            cursor.executemany(UPSERT_SQL, [row + (source_id, int(source_row), int(row_hash)) for row, source_row,
+                                            row_hash in zip(values, frame.index, row_hashes(frame))])
+        cursor.execute("UPDATE ingest_sources SET row_count = %s WHERE source_id = %s", (row_count, source_id))
+    # Commits the whole batch
+    rollups.refresh(conn, source_id, first_row)
+    return int((~storable).sum())
+
+
+def data_version(conn):
+    """A short token that changes whenever any loaded source changes."""
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT source_id, fingerprint, row_count FROM ingest_sources ORDER BY source_id")
+        sources = [(r['source_id'], r['fingerprint'], r['row_count']) for r in cursor.fetchall()]
+        # Dropping old partitions moves the first date; an index lookup
+        cursor.execute("SELECT MIN(stop_date) AS first FROM traffic_stops")
+        first = cursor.fetchone()['first']
+    return hashlib.sha1(repr((sources, first)).encode()).hexdigest()[:16]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sync a traffic stops CSV into MySQL.")
+    parser.add_argument('path', nargs='?', default=CSV_PATH)
+    parser.add_argument('--mode', choices=['upsert', 'values', 'infile'], default='upsert',
+                        help="upsert: incremental sync (default); values/infile: full bulk reload")
+    parser.add_argument('--chunk-size', type=int, default=config.CHUNK_SIZE)
+    parser.add_argument('--with-cache', action='store_true',
+                        help="bulk modes: also write the columnar frame cache in the same pass")
+    args = parser.parse_args(argv)
+
+    def progress(p):
+        print(f"\r{p.describe()}", end='', file=sys.stderr, flush=True)
+
+    conn = db.connect(local_infile=args.mode == 'infile')
+    try:
+        if args.mode == 'upsert':
+            summary = sync_source(conn, args.path)
+        elif args.with_cache:
+            summary = bulk_load_with_cache(conn, args.path, args.mode, args.chunk_size, progress)
+        else:
+            summary = bulk_load(conn, args.path, args.mode, args.chunk_size, progress)
+    finally:
+        conn.close()
+    print(file=sys.stderr)
+    print(f"{summary['source']}: {summary['status']} "
+          f"({summary['upserted']} rows written, {summary['deleted']} deleted, {summary['skipped']} skipped, "
+          f"{summary.get('rows_per_sec', 0.0):,.0f} rows/sec)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,435 @@
+"""Append-only write path for police post logs entered in the app.
+
+``LogWriter.append`` hands one stop record (the raw CSV fields, see
+``record``) to a single writer thread, which group-commits whatever has
+queued up while it was busy:
+
+1. the batch is appended to the journal ``<LOG_DIR>/<source>.jsonl`` with one
+   write and one fsync; ``append`` returns once its record is durable there
+2. the batch is cleaned with ``clean_stops`` and passed to every subscriber
+   (the Prediction index, the Overview cube, the shared scan, the DuckDB
+   backend), so they grow in place instead of being rebuilt
+3. the journal records MySQL has not seen yet are written to traffic_stops as
+   the live source ``live:<source>``, in one transaction that also folds them
+   into the rollups and moves the source's high-water mark
+
+The journal is the live source itself: it is only ever appended to, and each
+record's line number is its ``source_row``.  On start-up the journal is
+replayed to new subscribers and everything past MySQL's high-water mark is
+sent again, so a crash between the fsync and the commit loses nothing and
+counts nothing twice.  While MySQL is unreachable the records wait in the
+journal and the commit is retried.
+
+Row numbers are only unique within one journal, so each writer holds an
+exclusive lock on its own; a process that finds the source taken (another
+server process of the same app) writes ``<source>-2``, ``<source>-3``, ...
+instead.  A record that cannot be cleaned is logged to
+``<source>.rejected.jsonl`` and skipped rather than stopping the writer.
+
+Load test (journal and subscribers only unless ``--mysql``):
+
+    python -m securecheck.logbook --records 20000 --clients 8 [--mysql]
+"""
+import argparse
+import itertools
+import json
+import logging
+import os
+import queue
+import tempfile
+import threading
+import time
+import weakref
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import pandas as pd
+from pymysql.err import Error
+
+from securecheck import config, db, loader, rollups
+from securecheck.data import BOOL_COLUMNS, CATEGORY_COLUMNS, READ_DTYPES, STOP_COLUMNS, clean_stops
+from securecheck.predict import OutcomeIndex
+
+try:
+    import fcntl
+except ImportError:
+    # Windows
+    fcntl = None
+    import msvcrt
+
+log = logging.getLogger('securecheck.logbook')
+
+_FLUSH = object()
+_CLOSE = object()
+
+
+def _text(value):
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value or None
+
+
+def record(stop_date, stop_time, country_name=None, driver_gender=None, driver_age=None, driver_race=None,
+           violation=None, search_conducted=None, search_type=None, stop_outcome=None, is_arrested=None,
+           stop_duration=None, drugs_related_stop=None, vehicle_number=None):
+    """One stop as a row of the source CSV would hold it; fields left out stay missing.
+
+    ``driver_gender`` is 'M'/'F', ``stop_duration`` a label such as '0-15 Min'
+    and the flags are booleans.
+    """
+    return {
+        'stop_date': str(stop_date),
+        'stop_time': str(stop_time),
+        'country_name': _text(country_name),
+        'driver_gender': _text(driver_gender),
+        'driver_age_raw': driver_age,
+        'driver_age': driver_age,
+        'driver_race': _text(driver_race),
+        'violation_raw': _text(violation),
+        'violation': _text(violation),
+        'search_conducted': None if search_conducted is None else bool(search_conducted),
+        'search_type': _text(search_type),
+        'stop_outcome': _text(stop_outcome),
+        'is_arrested': None if is_arrested is None else bool(is_arrested),
+        'stop_duration': _text(stop_duration),
+        'drugs_related_stop': None if drugs_related_stop is None else bool(drugs_related_stop),
+        'vehicle_number': _text(vehicle_number),
+    }
+
+
+def records_frame(records, first_row=0):
+    """Clean raw records exactly like CSV rows; the index is their ``source_row``."""
+    frame = pd.DataFrame.from_records(records, columns=STOP_COLUMNS)
+    frame = clean_stops(frame.astype({col: dtype for col, dtype in READ_DTYPES.items() if col in frame}))
+    frame.index = pd.RangeIndex(first_row, first_row + len(frame))
+    return frame
+
+
+def _read_journal(path):
+    """Records in ``path``, after cutting off a line torn by a crash mid-write."""
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+    except FileNotFoundError:
+        return []
+    complete = data[:data.rfind(b'\n') + 1]
+    if len(complete) < len(data):
+        with open(path, 'r+b') as f:
+            f.truncate(len(complete))
+    return [json.loads(line) for line in complete.splitlines()]
+
+
+def _try_lock(f):
+    """Lock ``f`` exclusively without waiting; OSError if another process holds it."""
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    else:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+
+
+def _claim(log_dir, source):
+    """``(name, lock file)`` of the first of ``source``, ``source-2``, ... no other writer holds.
+
+    The lock lasts until the file is closed, or the process exits.
+    """
+    for n in itertools.count(1):
+        name = source if n == 1 else f"{source}-{n}"
+        lock = open(os.path.join(log_dir, f"{name}.lock"), 'a+b')
+        try:
+            _try_lock(lock)
+        except OSError:
+            lock.close()
+            continue
+        return name, lock
+
+
+def _weak(fn):
+    # Subscribers are usually bound methods of cached objects; let them go when evicted
+    if hasattr(fn, '__self__'):
+        return weakref.WeakMethod(fn)
+    return lambda: fn
+
+
+class LogWriter:
+    """Journal, in-memory subscribers and MySQL for one live source.
+
+    Two threads: one journals and acknowledges records, the other cleans
+    everything journaled since its last pass and applies it to the
+    subscribers and MySQL.  Acknowledging never waits for pandas or the
+    server, and the slower stage works on larger batches as load grows.
+    """
+
+    def __init__(self, source=config.LOG_SOURCE, pool=None, log_dir=config.LOG_DIR,
+                 batch_size=config.LOG_BATCH, retry_seconds=config.LOG_RETRY_SECONDS):
+        os.makedirs(log_dir, exist_ok=True)
+        self.source, self._owner = _claim(log_dir, source)
+        self.source_path = f"live:{self.source}"
+        self.pool = pool
+        self.batch_size = batch_size
+        self.retry_seconds = retry_seconds
+        self.path = os.path.join(log_dir, f"{self.source}.jsonl")
+        self.rejected_path = os.path.join(log_dir, f"{self.source}.rejected.jsonl")
+        self._rejected = {r['source_row'] for r in _read_journal(self.rejected_path)}
+
+        records = _read_journal(self.path)
+        frame = self._clean(records, 0)
+        self._frames = [frame] if len(frame) else []
+        # Records in the journal; of those, the first ``rows`` were cleaned
+        # (the rejected ones included) and the first ``committed`` are in MySQL
+        self.journaled = len(records)
+        self.rows = len(records)
+        self.committed = 0
+        self.batches = 0
+        self.error = None
+        # Set when a failed journal write could not be rolled back; no row is accepted after it
+        self.broken = None
+        self._source_id = None
+        self._subscribers = []
+        self._lock = threading.Lock()
+        self._incoming = queue.Queue()
+        self._journaled = queue.Queue()
+        # Unbuffered, so a failed write leaves nothing behind to be flushed later
+        self._journal = open(self.path, 'ab', buffering=0)
+        self._threads = [
+            threading.Thread(target=self._journal_loop, name=f'securecheck-journal-{self.source}', daemon=True),
+            threading.Thread(target=self._apply_loop, name=f'securecheck-apply-{self.source}', daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def subscribe(self, fn, replay=True):
+        """Call ``fn(rows)`` with every batch from now on, and first with the rows so far."""
+        with self._lock:
+            if replay and self._frames:
+                fn(pd.concat(self._frames))
+            self._subscribers.append(_weak(fn))
+
+    def append(self, entry, wait=True, timeout=None):
+        """Queue one ``record``; returns its row number once journaled, or a Future if not ``wait``.
+
+        Raises ValueError for a record the writer could not clean later, and
+        ``broken`` once the journal could not be repaired after a failed write.
+        """
+        if self.broken is not None:
+            raise self.broken
+        unknown = set(entry) - set(STOP_COLUMNS)
+        if unknown:
+            raise ValueError(f"unknown fields {sorted(unknown)}")
+        if any(entry.get(col) not in (None, True, False) for col in BOOL_COLUMNS):
+            raise ValueError(f"{', '.join(BOOL_COLUMNS)} must be True, False or None")
+        pd.Timestamp(entry.get('stop_date'))
+        line = json.dumps(entry).encode() + b'\n'
+        future = Future()
+        self._incoming.put((entry, line, future))
+        return future.result(timeout) if wait else future
+
+    def flush(self, timeout=None):
+        """Wait until everything appended so far is applied and, if possible, in MySQL."""
+        future = Future()
+        self._incoming.put((_FLUSH, None, future))
+        future.result(timeout)
+
+    def close(self):
+        self._incoming.put((_CLOSE, None, None))
+        for thread in self._threads:
+            thread.join()
+        self._journal.close()
+        self._owner.close()
+
+    @property
+    def pending(self):
+        """Applied rows not in MySQL yet."""
+        return max(self.rows - self.committed, 0) if self.pool is not None else 0
+
+    def _journal_loop(self):
+        while True:
+            # Block for the first item, then group-commit whatever queued up behind it
+            items = [self._incoming.get()]
+            while len(items) < self.batch_size and items[-1][0] not in (_FLUSH, _CLOSE):
+                try:
+                    items.append(self._incoming.get_nowait())
+                except queue.Empty:
+                    break
+            entries = [item for item in items if item[0] not in (_FLUSH, _CLOSE)]
+            if entries:
+                self._write(entries)
+            if items[-1][0] in (_FLUSH, _CLOSE):
+                self._journaled.put(items[-1])
+                if items[-1][0] is _CLOSE:
+                    return
+
+    def _write(self, entries):
+        if self.broken is not None:
+            for _, _, future in entries:
+                future.set_exception(self.broken)
+            return
+        data = memoryview(b''.join(line for _, line, _ in entries))
+        offset = self._journal.tell()
+        try:
+            while data:
+                data = data[self._journal.write(data):]
+            os.fsync(self._journal.fileno())
+        except OSError as e:
+            self._rollback(offset, e)
+            for _, _, future in entries:
+                future.set_exception(e)
+            return
+        first = self.journaled
+        self.journaled += len(entries)
+        self._journaled.put(([entry for entry, _, _ in entries], first))
+        for offset, (_, _, future) in enumerate(entries):
+            future.set_result(first + offset)
+
+    def _rollback(self, offset, error):
+        """Cut a batch that failed partway out of the journal, so line numbers stay row numbers."""
+        try:
+            os.ftruncate(self._journal.fileno(), offset)
+            os.fsync(self._journal.fileno())
+        except OSError as e:
+            log.critical("journal %s could not be rolled back to %d bytes after %s: %s; not accepting rows",
+                         self.path, offset, error, e)
+            self.broken = OSError(f"journal {self.path} holds a partly written batch: {e}")
+
+    def _apply_loop(self):
+        while True:
+            try:
+                items = [self._journaled.get(timeout=self.retry_seconds if self.pending else None)]
+            except queue.Empty:
+                items = []
+            while items and items[-1][0] not in (_FLUSH, _CLOSE):
+                try:
+                    items.append(self._journaled.get_nowait())
+                except queue.Empty:
+                    break
+            batches = [item for item in items if item[0] not in (_FLUSH, _CLOSE)]
+            if batches:
+                try:
+                    self._apply([entry for entries, _ in batches for entry in entries], batches[0][1])
+                except Exception:
+                    # Keep the thread alive, or flush() would wait forever
+                    log.exception("applying journal rows from %d failed", batches[0][1])
+            self._commit()
+            if items and items[-1][0] is _FLUSH:
+                items[-1][2].set_result(None)
+            if items and items[-1][0] is _CLOSE:
+                return
+
+    def _clean(self, entries, first):
+        """``records_frame`` of journal rows ``first...``, without the records that do not clean."""
+        try:
+            return records_frame(entries, first)
+        except Exception:
+            log.exception("journal rows %d-%d did not clean as one batch; retrying them one by one",
+                          first, first + len(entries) - 1)
+        frames = []
+        for row, entry in enumerate(entries, first):
+            try:
+                frames.append(records_frame([entry], row))
+            except Exception as e:
+                self._reject(row, entry, e)
+        if not frames:
+            return records_frame([], first)
+        # Single rows each get their own categories
+        return pd.concat(frames).astype(dict.fromkeys(CATEGORY_COLUMNS, 'category'))
+
+    def _reject(self, row, entry, error):
+        log.error("journal row %d of %s rejected: %s", row, self.source, error)
+        if row in self._rejected:
+            return
+        line = json.dumps({'source_row': row, 'error': str(error), 'record': entry}, default=str)
+        with open(self.rejected_path, 'a', encoding='utf-8') as f:
+            f.write(line + '\n')
+        self._rejected.add(row)
+
+    def _apply(self, entries, first):
+        frame = self._clean(entries, first)
+        with self._lock:
+            self.rows += len(entries)
+            self.batches += 1
+            if not len(frame):
+                return
+            self._frames.append(frame)
+            for ref in list(self._subscribers):
+                fn = ref()
+                if fn is None:
+                    self._subscribers.remove(ref)
+                    continue
+                try:
+                    fn(frame)
+                except Exception:
+                    log.exception("log subscriber %r failed", fn)
+
+    def _commit(self):
+        if self.pool is None or not self.pending:
+            return
+        try:
+            with self.pool.connection() as conn:
+                if self._source_id is None:
+                    self._source_id, self.committed = loader.live_source(conn, self.source_path)
+                    if not self.pending:
+                        return
+                with self._lock:
+                    rows = self.rows
+                    unsent = [f for f in self._frames if f.index[-1] >= self.committed]
+                # Rejected records leave gaps in the row numbers, and may be all that is left
+                unsent = pd.concat(unsent).loc[self.committed:] if unsent else records_frame([], self.committed)
+                skipped = loader.append_live(conn, self._source_id, unsent, self.committed, rows)
+            if skipped:
+                log.warning("%d logged rows are undated or before the retention cutoff; only the journal keeps them",
+                            skipped)
+            self.committed = rows
+            self.error = None
+        except (Error, db.PoolTimeout) as e:
+            self.error = str(e)
+            log.warning("%d logged rows wait for MySQL: %s", self.pending, e)
+        except Exception as e:
+            self.error = str(e)
+            log.exception("%d logged rows could not be written to MySQL", self.pending)
+
+
+def main(argv=None):
+    from securecheck.synthetic import synthetic_stops
+
+    parser = argparse.ArgumentParser(description="Load-test the log write path and report inserts/sec.")
+    parser.add_argument('--records', type=int, default=20000)
+    parser.add_argument('--clients', type=int, default=8, help="threads appending concurrently")
+    parser.add_argument('--batch-size', type=int, default=config.LOG_BATCH)
+    parser.add_argument('--mysql', action='store_true', help="also group-commit to MySQL (SECURECHECK_DB_*)")
+    parser.add_argument('--log-dir', help="journal directory (default: a temporary one)")
+    args = parser.parse_args(argv)
+
+    raw = synthetic_stops(args.records, seed=7)
+    entries = raw.astype(object).where(raw.notna(), None).to_dict('records')
+    for entry in entries:
+        # The CSV's "True"/"False" flags
+        for col in ('search_conducted', 'is_arrested', 'drugs_related_stop'):
+            entry[col] = None if entry[col] is None else bool(entry[col])
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pool = db.ConnectionPool() if args.mysql else None
+        writer = LogWriter(f"loadtest-{os.getpid()}", pool, args.log_dir or tmp, args.batch_size)
+        index = OutcomeIndex()
+        cube = rollups.Cube(records_frame([]))
+        writer.subscribe(index.update)
+        writer.subscribe(cube.update)
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(args.clients) as executor:
+            list(executor.map(writer.append, entries))
+        durable = time.perf_counter() - started
+        writer.flush()
+        applied = time.perf_counter() - started
+        writer.close()
+
+    print(f"{args.records:,} records from {args.clients} clients, applied in {writer.batches:,} batches "
+          f"(avg {args.records / max(writer.batches, 1):,.1f} rows)")
+    print(f"journaled (acknowledged): {args.records / durable:,.0f} inserts/sec")
+    applied_to = "subscribers and MySQL" if args.mysql else "subscribers"
+    print(f"applied to {applied_to}: {args.records / applied:,.0f} inserts/sec")
+    if args.mysql:
+        print(f"MySQL: {writer.error or f'{writer.committed:,} rows committed'}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,151 @@
+"""Everything the Overview page shows, computed once per data version.
+
+``summarize`` reduces the cleaned frame and its cube to the preview rows,
+the key metrics and the chart tables; ``summarize_sample`` estimates the
+same from an ``approx.ApproxIndex``, with a 95% margin per metric.
+``build_figure`` turns one chart table into its Plotly figure.  The app
+memoizes both by data version, so a rerun only deserializes what it is
+about to draw.
+"""
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+
+from securecheck.approx import estimate_ratio, estimate_total, weighted_counts
+from securecheck.data import format_stop_time
+from securecheck.rollups import cube_mean
+
+PREVIEW_COLUMNS = ['stop_date', 'stop_time', 'country_name', 'driver_gender', 'driver_age', 'driver_race',
+                   'violation', 'stop_outcome']
+
+GENDER_LABELS = {1: 'Male', 0: 'Female'}
+
+TABS = ["Geographical Distribution", "Violation Breakdown", "Demographic Insights", "Most Stopped Vehicles"]
+
+# ``margins`` maps metric names to the half-width of their 95% interval;
+# None for exact figures
+OverviewSummary = namedtuple(
+    'OverviewSummary', 'preview total_stops arrest_rate search_rate avg_age distinct_vehicles by_country '
+                       'by_violation by_demographic top_vehicles margins',
+    defaults=[None]
+)
+
+
+def _preview(df, preview_rows):
+    preview = df[PREVIEW_COLUMNS].head(preview_rows).copy()
+    preview['stop_date'] = preview['stop_date'].dt.date
+    preview['stop_time'] = format_stop_time(preview['stop_time'])
+    preview['driver_gender'] = preview['driver_gender'].map(GENDER_LABELS)
+    return preview
+
+
+def _top_vehicles(pairs):
+    return pd.DataFrame(pairs, columns=['Vehicle', 'Stops'])
+
+
+def summarize(df, cube, preview_rows=10, vehicles=None):
+    """Exact figures for ``df``; ``vehicles`` (a ``VehicleIndex`` of it) saves counting plates again."""
+    if vehicles is not None:
+        distinct_vehicles, top_vehicles = len(vehicles), vehicles.top('stops')
+    else:
+        counts = df['vehicle_number'].value_counts()
+        counts = counts[counts > 0]
+        distinct_vehicles = len(counts)
+        # Ties in the same order as the VehicleIndex
+        top_vehicles = list(counts.sort_index().sort_values(ascending=False, kind='stable').head(10).items())
+
+    by_country = cube.groupby('country_name', observed=True)['stops'].sum().sort_values(ascending=False).reset_index()
+    by_country.columns = ['Country', 'Count']
+    by_violation = cube.groupby('violation', observed=True)['stops'].sum().sort_values(ascending=False).reset_index()
+    by_violation.columns = ['Violation', 'Count']
+    by_demographic = cube.groupby(['driver_gender', 'driver_race'], observed=True)['stops'].sum() \
+        .reset_index(name='Count')
+    by_demographic['driver_gender'] = by_demographic['driver_gender'].map(GENDER_LABELS)
+
+    return OverviewSummary(
+        preview=_preview(df, preview_rows),
+        total_stops=int(cube['stops'].sum()),
+        arrest_rate=round(100 * cube_mean(cube, 'is_arrested'), 2),
+        search_rate=round(100 * cube_mean(cube, 'search_conducted'), 2),
+        avg_age=round(cube_mean(cube, 'driver_age'), 1),
+        distinct_vehicles=distinct_vehicles,
+        by_country=by_country,
+        by_violation=by_violation,
+        by_demographic=by_demographic,
+        top_vehicles=_top_vehicles(top_vehicles),
+    )
+
+
+def _mean(sample, col, inside):
+    values = pd.to_numeric(sample.rows[col], errors='coerce').to_numpy(np.float64, na_value=np.nan)
+    known = ~np.isnan(values) * inside
+    return estimate_ratio(sample, np.where(known > 0, values, 0.0), known)
+
+
+def _counts(sample, by, inside, names):
+    counts = weighted_counts(sample, by, inside)
+    counts = counts[counts > 0].round().astype(np.int64)
+    return counts.sort_values(ascending=False).reset_index().set_axis(names, axis=1)
+
+
+def summarize_sample(index, date_range=None, preview_rows=10):
+    """``summarize`` estimated from an ``ApproxIndex``; the stops in ``date_range`` only, if given.
+
+    The most stopped vehicles are counted over all dates.
+    """
+    sample = index.sample()
+    inside = np.ones(len(sample.rows)) if date_range is None else \
+        date_range.mask(sample.rows['stop_date']).astype(np.float64)
+    total = estimate_total(sample, inside)
+    arrest_rate = _mean(sample, 'is_arrested', inside)
+    search_rate = _mean(sample, 'search_conducted', inside)
+    avg_age = _mean(sample, 'driver_age', inside)
+    distinct = index.distinct_vehicles(date_range)
+
+    by_demographic = weighted_counts(sample, ['driver_gender', 'driver_race'], inside)
+    by_demographic = by_demographic[by_demographic > 0].round().astype(np.int64) \
+        .rename_axis(['driver_gender', 'driver_race']).reset_index(name='Count')
+    by_demographic['driver_gender'] = by_demographic['driver_gender'].map(GENDER_LABELS)
+
+    return OverviewSummary(
+        preview=_preview(sample.rows[inside > 0], preview_rows),
+        total_stops=int(round(total.value)),
+        arrest_rate=round(100 * arrest_rate.value, 2),
+        search_rate=round(100 * search_rate.value, 2),
+        avg_age=round(avg_age.value, 1),
+        distinct_vehicles=int(round(distinct.value)),
+        by_country=_counts(sample, 'country_name', inside, ['Country', 'Count']),
+        by_violation=_counts(sample, 'violation', inside, ['Violation', 'Count']),
+        by_demographic=by_demographic,
+        top_vehicles=_top_vehicles(index.top_vehicles()),
+        margins={
+            'total_stops': int(round(total.margin)),
+            'arrest_rate': round(100 * arrest_rate.margin, 2),
+            'search_rate': round(100 * search_rate.margin, 2),
+            'avg_age': round(avg_age.margin, 1),
+            'distinct_vehicles': int(round(distinct.margin)),
+        },
+    )
+
+
+def build_figure(tab, summary):
+    """The Plotly figure for ``tab``, or None when it has no data."""
+    if tab == TABS[0]:
+        if summary.by_country.empty:
+            return None
+        return px.bar(summary.by_country, x='Country', y='Count', title="Stops by Country", color="Country",
+                      text='Count')
+    if tab == TABS[1]:
+        if summary.by_violation.empty:
+            return None
+        return px.pie(summary.by_violation, names='Violation', values='Count', title="Violation Breakdown")
+    if tab == TABS[2]:
+        if summary.by_demographic.empty:
+            return None
+        return px.bar(summary.by_demographic, x='driver_race', y='Count', color='driver_gender', barmode='group',
+                      title="Stops by Gender and Race", text='Count')
+    if summary.top_vehicles.empty:
+        return None
+    return px.bar(summary.top_vehicles, x='Vehicle', y='Stops', title="Most Stopped Vehicles", text='Stops')
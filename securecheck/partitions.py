@@ -0,0 +1,574 @@
+"""Year/month partitions of the stops, and date-range views over them.
+
+A ``DateRange`` selects stops by ``stop_date``, and every view that can be
+narrowed to one only reads the months it overlaps:
+
+- ``MonthIndex`` keeps the row offsets of each month of the loaded frame, so
+  a range is the offsets of its whole months plus a date check on the two
+  edge months (the Overview aggregates, the app.py filters)
+- ``restrict`` narrows the catalog SQL to the range; on MySQL that is an
+  ``idx_date`` range scan, or only the matching partitions once the table is
+  partitioned with ``mysql-partition``
+- ``PartitionSink`` writes the cleaned frame as Hive-style Parquet,
+  ``stop_year=YYYY/stop_month=M/part-*.parquet``, and ``read`` loads a range
+  from the matching directories only (``report --since``)
+
+Old months are compacted (the part files of a month merged into one; on
+MySQL the monthly partitions of a year merged into one) and dropped (a month
+directory removed; ``ALTER TABLE ... DROP PARTITION``) without rewriting
+anything newer.  The Parquet layout needs pyarrow.
+
+    python -m securecheck.partitions build [path/to/traffic_stops.csv]
+    python -m securecheck.partitions list [--mysql]
+    python -m securecheck.partitions compact --before 2021-01 [--mysql]
+    python -m securecheck.partitions drop --before 2020-01 [--mysql]
+    python -m securecheck.partitions mysql-partition
+"""
+import argparse
+import glob
+import os
+import re
+import shutil
+import threading
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from securecheck import config, db, rollups
+from securecheck.data import CATEGORY_COLUMNS, CSV_PATH
+from securecheck.stream import FEATHER_TYPES, stream_csv
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pc = ds = pq = None
+
+# Sidebar presets; the last N days end at the newest stop on record
+PRESETS = {'All time': None, 'Last 30 days': 30, 'Last 90 days': 90, 'Last 365 days': 365}
+
+# Monthly MySQL partitions created past the newest stop, so new logs land in
+# their own month rather than in the catch-all partition
+MONTHS_AHEAD = 12
+
+UNDATED = '__HIVE_DEFAULT_PARTITION__'
+
+
+class DateRange(namedtuple('DateRange', 'start end')):
+    """Stops dated ``start`` through ``end``, inclusive; None leaves that side open."""
+
+    def __new__(cls, start=None, end=None):
+        start = None if start is None else pd.Timestamp(start).normalize()
+        end = None if end is None else pd.Timestamp(end).normalize()
+        return super().__new__(cls, start, end)
+
+    @classmethod
+    def last_days(cls, days, until):
+        until = pd.Timestamp(until).normalize()
+        return cls(until - pd.Timedelta(days=days - 1), until)
+
+    def mask(self, dates):
+        """Which of ``dates`` (datetime64 values) fall in the range; NaT never does."""
+        dates = np.asarray(dates, 'datetime64[D]')
+        keep = ~np.isnat(dates)
+        if self.start is not None:
+            keep &= dates >= self.start.to_datetime64().astype('datetime64[D]')
+        if self.end is not None:
+            keep &= dates <= self.end.to_datetime64().astype('datetime64[D]')
+        return keep
+
+    def months(self):
+        """First and last month touched, as ``month_codes``; None where open."""
+        return (None if self.start is None else _month_code(self.start.year, self.start.month),
+                None if self.end is None else _month_code(self.end.year, self.end.month))
+
+    def describe(self):
+        start = 'the first stop' if self.start is None else f"{self.start:%Y-%m-%d}"
+        end = 'the last stop' if self.end is None else f"{self.end:%Y-%m-%d}"
+        return f"{start} to {end}"
+
+
+def preset(label, last_date):
+    """The ``DateRange`` for a ``PRESETS`` label, or None for all time."""
+    days = PRESETS[label]
+    if days is None or last_date is None:
+        return None
+    return DateRange.last_days(days, last_date)
+
+
+def _month_code(year, month):
+    return (year - 1970) * 12 + month - 1
+
+
+def _year_month(code):
+    return 1970 + int(code) // 12, int(code) % 12 + 1
+
+
+def month_codes(dates):
+    """Months since 1970-01 of datetime64 ``dates``; -1 where missing."""
+    dates = np.asarray(dates, 'datetime64[D]')
+    return np.where(np.isnat(dates), -1, dates.astype('datetime64[M]').astype(np.int64))
+
+
+def _before_code(before):
+    """The month code of ``before`` ('2021-01', a date, ...); months below it are old."""
+    before = pd.Timestamp(before)
+    return _month_code(before.year, before.month)
+
+
+# ---- In-memory partitions of the loaded frame ----
+
+class MonthIndex:
+    """Row offsets of the loaded frame per month of ``stop_date``.
+
+    Rows logged after the load are folded in with ``update`` (a ``LogWriter``
+    subscriber) and come back from ``frame`` after the loaded ones.
+    """
+
+    def __init__(self, df):
+        self.df = df
+        self._lock = threading.Lock()
+        self._dates = df['stop_date'].to_numpy('datetime64[D]')
+        months = month_codes(self._dates)
+        known = np.flatnonzero(months >= 0)
+        order = known[np.argsort(months[known], kind='stable')]
+        self.months, starts = np.unique(months[order], return_index=True)
+        ends = np.append(starts[1:], len(order))
+        self._positions = {int(m): order[s:e] for m, s, e in zip(self.months, starts, ends)}
+        self._appended = []
+        self._first = self._dates[known].min() if len(known) else None
+        self._last = self._dates[known].max() if len(known) else None
+
+    def update(self, rows):
+        """Fold newly ingested ``rows`` (cleaned stops) into the index."""
+        dates = rows['stop_date'].to_numpy('datetime64[D]')
+        dates = dates[~np.isnat(dates)]
+        with self._lock:
+            self._appended.append(rows.reset_index(drop=True))
+            if len(dates):
+                self._first = dates.min() if self._first is None else min(self._first, dates.min())
+                self._last = dates.max() if self._last is None else max(self._last, dates.max())
+
+    def bounds(self):
+        """Dates of the first and the last stop, or ``(None, None)`` without any."""
+        with self._lock:
+            first, last = self._first, self._last
+        return (None if first is None else pd.Timestamp(first).date(),
+                None if last is None else pd.Timestamp(last).date())
+
+    def select(self, date_range):
+        """Sorted offsets into ``df`` of the rows in ``date_range``, or None for all rows."""
+        if date_range is None or date_range.start is None and date_range.end is None:
+            return None
+        first, last = date_range.months()
+        lo = 0 if first is None else np.searchsorted(self.months, first)
+        hi = len(self.months) if last is None else np.searchsorted(self.months, last, side='right')
+        parts = []
+        for month in self.months[lo:hi]:
+            rows = self._positions[int(month)]
+            # Only the edge months need a look at the dates
+            if month == first or month == last:
+                rows = rows[date_range.mask(self._dates[rows])]
+            parts.append(rows)
+        rows = np.concatenate(parts) if parts else np.empty(0, np.int64)
+        rows.sort()
+        return rows
+
+    def frame(self, date_range):
+        """The stops in ``date_range``, loaded rows first, then logged ones."""
+        rows = self.select(date_range)
+        parts = [self.df if rows is None else self.df.take(rows)]
+        with self._lock:
+            appended = list(self._appended)
+        for logged in appended:
+            parts.append(logged if date_range is None else logged[date_range.mask(logged['stop_date'])])
+        parts = [part for part in parts if len(part)] or parts[:1]
+        return pd.concat(parts, ignore_index=True) if len(parts) > 1 else parts[0].reset_index(drop=True)
+
+
+# ---- Hive-style Parquet layout ----
+
+def _month_dir(root, code):
+    if code < 0:
+        return os.path.join(root, f"stop_year={UNDATED}", f"stop_month={UNDATED}")
+    year, month = _year_month(code)
+    return os.path.join(root, f"stop_year={year}", f"stop_month={month}")
+
+
+def _swap_dir(tmp, target):
+    # A directory can't be replaced over a non-empty one; move the old one aside first
+    old = f"{target}.{os.getpid()}.old"
+    if os.path.exists(target):
+        os.replace(target, old)
+    os.replace(tmp, target)
+    shutil.rmtree(old, ignore_errors=True)
+
+
+class PartitionSink:
+    """``stream_csv`` sink writing each chunk into its month directories under ``root``.
+
+    Every chunk adds one Parquet file to each month it has rows for.
+    Categorical columns are stored as plain strings, as in ``FeatherSink``,
+    and ``read`` turns them back into categories.  The layout is written
+    next to ``root`` and replaces it on close.
+    """
+
+    def __init__(self, root=config.PARTITION_DIR):
+        self.root = root
+        self._tmp_root = f"{root}.{os.getpid()}.tmp"
+        self._schema = None
+        self.files = 0
+
+    def open(self):
+        shutil.rmtree(self._tmp_root, ignore_errors=True)
+        os.makedirs(self._tmp_root)
+
+    def _table(self, chunk):
+        table = pa.Table.from_pandas(chunk, preserve_index=False)
+        for col in CATEGORY_COLUMNS:
+            i = table.schema.get_field_index(col)
+            table = table.set_column(i, col, table.column(col).cast(pa.string()))
+        table = table.replace_schema_metadata(None)
+        if self._schema is None:
+            self._schema = table.schema
+        return table.cast(self._schema)
+
+    def write(self, chunk, offset):
+        months = month_codes(chunk['stop_date'])
+        table = self._table(chunk)
+        for code in np.unique(months):
+            directory = _month_dir(self._tmp_root, code)
+            os.makedirs(directory, exist_ok=True)
+            # Named by source offset, so a month's files list in row order
+            pq.write_table(table.filter(pa.array(months == code)),
+                           os.path.join(directory, f"part-{offset:012d}.parquet"))
+            self.files += 1
+
+    def close(self):
+        _swap_dir(self._tmp_root, self.root)
+
+    def abort(self):
+        shutil.rmtree(self._tmp_root, ignore_errors=True)
+
+
+def build(path=CSV_PATH, root=config.PARTITION_DIR, chunk_size=config.CHUNK_SIZE, progress=None):
+    """Stream ``path`` into the partitioned layout under ``root``; returns the final ``IngestProgress``."""
+    sink = PartitionSink(root)
+    try:
+        return stream_csv(path, [sink], chunk_size, progress)
+    except BaseException:
+        sink.abort()
+        raise
+
+
+def _layout_months(root):
+    """``{month code: directory}`` of the month directories under ``root``."""
+    months = {}
+    for directory in glob.glob(os.path.join(root, 'stop_year=*', 'stop_month=*')):
+        year = os.path.basename(os.path.dirname(directory)).split('=', 1)[1]
+        month = os.path.basename(directory).split('=', 1)[1]
+        if year.isdigit() and month.isdigit():
+            months[_month_code(int(year), int(month))] = directory
+        elif year == UNDATED:
+            months[-1] = directory
+    return dict(sorted(months.items()))
+
+
+def _parts(directory):
+    return sorted(glob.glob(os.path.join(directory, 'part-*.parquet')))
+
+
+def read(root=config.PARTITION_DIR, date_range=None):
+    """The cleaned stops under ``root``, reading only the months ``date_range`` touches.
+
+    Rows come month by month, oldest first, and in source order within a month.
+    """
+    months = _layout_months(root)
+    if date_range is not None:
+        first, last = date_range.months()
+        months = {code: directory for code, directory in months.items()
+                  if code >= 0 and (first is None or code >= first) and (last is None or code <= last)}
+    files = [part for directory in months.values() for part in _parts(directory)]
+    if not files:
+        raise FileNotFoundError(f"no partitions under {root} for {date_range.describe() if date_range else 'any date'}")
+    table = ds.dataset(files, format='parquet').to_table()
+    for col in CATEGORY_COLUMNS:
+        i = table.schema.get_field_index(col)
+        table = table.set_column(i, col, pc.dictionary_encode(table.column(col)))
+    frame = table.to_pandas(types_mapper=FEATHER_TYPES.get)
+    if date_range is not None:
+        # Only the edge months can hold rows outside the range
+        frame = frame[date_range.mask(frame['stop_date'])].reset_index(drop=True)
+    return frame
+
+
+def list_layout(root=config.PARTITION_DIR):
+    """One row per month directory: its files and rows (from the Parquet footers)."""
+    rows = []
+    for code, directory in _layout_months(root).items():
+        parts = _parts(directory)
+        rows.append({
+            'partition': os.path.relpath(directory, root),
+            'files': len(parts),
+            'rows': sum(pq.ParquetFile(part).metadata.num_rows for part in parts),
+        })
+    return pd.DataFrame(rows, columns=['partition', 'files', 'rows'])
+
+
+def compact(root=config.PARTITION_DIR, before=None):
+    """Merge the part files of each month before ``before`` (all months if None) into one.
+
+    Each month is rewritten next to its directory and swapped in, so readers
+    see either the old files or the merged one.  Returns the months merged.
+    """
+    limit = None if before is None else _before_code(before)
+    merged = []
+    for code, directory in _layout_months(root).items():
+        parts = _parts(directory)
+        if len(parts) < 2 or (limit is not None and code >= limit):
+            continue
+        table = pa.concat_tables([pq.read_table(part) for part in parts])
+        tmp = f"{directory}.{os.getpid()}.tmp"
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+        pq.write_table(table, os.path.join(tmp, os.path.basename(parts[0])))
+        _swap_dir(tmp, directory)
+        merged.append(os.path.relpath(directory, root))
+    return merged
+
+
+def drop(root=config.PARTITION_DIR, before=None):
+    """Remove the month directories before ``before``; returns the months removed."""
+    limit = _before_code(before)
+    removed = []
+    for code, directory in _layout_months(root).items():
+        if 0 <= code < limit:
+            shutil.rmtree(directory)
+            removed.append(os.path.relpath(directory, root))
+            year_dir = os.path.dirname(directory)
+            if not os.listdir(year_dir):
+                os.rmdir(year_dir)
+    return removed
+
+
+# ---- Date-range SQL ----
+
+_FROM_STOPS = re.compile(r'\bFROM\s+traffic_stops\b', re.IGNORECASE)
+
+
+def restrict(sql, date_range):
+    """``sql`` reading only the traffic_stops rows in ``date_range``.
+
+    Every ``FROM traffic_stops`` becomes a derived table with the date
+    condition.  MySQL merges it into the outer query, so the condition drives
+    the ``idx_date`` range or partition pruning; DuckDB pushes it down too.
+    """
+    if date_range is None:
+        return sql
+    conditions = []
+    if date_range.start is not None:
+        conditions.append(f"stop_date >= DATE '{date_range.start:%Y-%m-%d}'")
+    if date_range.end is not None:
+        conditions.append(f"stop_date <= DATE '{date_range.end:%Y-%m-%d}'")
+    if not conditions:
+        return sql
+    derived = f"FROM (SELECT * FROM traffic_stops WHERE {' AND '.join(conditions)}) AS stops_in_range"
+    return _FROM_STOPS.sub(derived, sql)
+
+
+# ---- MySQL RANGE COLUMNS partitions ----
+
+def _partition_name(code):
+    year, month = _year_month(code)
+    return f"p{year:04d}{month:02d}"
+
+
+def _month_start(code):
+    year, month = _year_month(code)
+    return f"{year:04d}-{month:02d}-01"
+
+
+def _monthly(first, last):
+    """Partition definitions for months ``first..last``, each bounded by the next month."""
+    return [f"PARTITION {_partition_name(code)} VALUES LESS THAN ('{_month_start(code + 1)}')"
+            for code in range(first, last + 1)]
+
+
+def mysql_partitions(conn):
+    """``(name, upper bound)`` of traffic_stops' partitions in order; empty if unpartitioned.
+
+    The bound is a 'YYYY-MM-DD' string, or None for the MAXVALUE partition.
+    """
+    with conn.cursor() as cursor:
+        cursor.execute("""
+            SELECT partition_name AS name, partition_description AS bound FROM information_schema.partitions
+            WHERE table_schema = DATABASE() AND table_name = 'traffic_stops' AND partition_name IS NOT NULL
+            ORDER BY partition_ordinal_position
+        """)
+        return [(r['name'], None if r['bound'] == 'MAXVALUE' else r['bound'].strip("'"))
+                for r in cursor.fetchall()]
+
+
+def _stop_months(cursor):
+    cursor.execute("SELECT MIN(stop_date) AS first, MAX(stop_date) AS last FROM traffic_stops")
+    row = cursor.fetchone()
+    today = pd.Timestamp.today()
+    first = pd.Timestamp(row['first']) if row['first'] else today
+    last = max(pd.Timestamp(row['last']), today) if row['last'] else today
+    return _month_code(first.year, first.month), _month_code(last.year, last.month)
+
+
+def mysql_partition(conn):
+    """Partition traffic_stops by month of ``stop_date``, or add the months it is missing.
+
+    The first run rebuilds the table once: ``stop_date`` joins the primary
+    key (MySQL wants the partitioning column in every unique key) and so
+    becomes NOT NULL; from then on the loader skips undated rows.  Later
+    runs split only the catch-all ``p_future`` partition, up to
+    ``MONTHS_AHEAD`` months past the newest stop or today.  Returns the
+    partitions added.
+    """
+    partitions = mysql_partitions(conn)
+    with conn.cursor() as cursor:
+        first, last = _stop_months(cursor)
+        last += MONTHS_AHEAD
+        if not partitions:
+            cursor.execute("SELECT COUNT(*) AS n FROM traffic_stops WHERE stop_date IS NULL")
+            undated = cursor.fetchone()['n']
+            if undated:
+                raise ValueError(f"{undated:,} rows have no stop_date; they cannot be partitioned by it")
+            definitions = [f"PARTITION p_start VALUES LESS THAN ('{_month_start(first)}')",
+                           *_monthly(first, last),
+                           "PARTITION p_future VALUES LESS THAN (MAXVALUE)"]
+            cursor.execute(
+                "ALTER TABLE traffic_stops MODIFY stop_date DATE NOT NULL, "
+                "DROP PRIMARY KEY, ADD PRIMARY KEY (source_id, source_row, stop_date) "
+                "PARTITION BY RANGE COLUMNS (stop_date) (" + ', '.join(definitions) + ")"
+            )
+            conn.commit()
+            return [_partition_name(code) for code in range(first, last + 1)]
+
+        bounds = [pd.Timestamp(bound) for _, bound in partitions if bound]
+        # The month starting at the current highest bound is the first one missing
+        start = _month_code(bounds[-1].year, bounds[-1].month) if bounds else first
+        if start > last:
+            return []
+        cursor.execute(
+            "ALTER TABLE traffic_stops REORGANIZE PARTITION p_future INTO (" +
+            ', '.join(_monthly(start, last) + ["PARTITION p_future VALUES LESS THAN (MAXVALUE)"]) + ")"
+        )
+    conn.commit()
+    return [_partition_name(code) for code in range(start, last + 1)]
+
+
+def extend_mysql(conn):
+    """Add missing monthly partitions if traffic_stops is partitioned; a no-op otherwise."""
+    if mysql_partitions(conn):
+        mysql_partition(conn)
+
+
+def compact_mysql(conn, before):
+    """Merge the monthly partitions of every year that ends before ``before`` into one.
+
+    Only the merged partitions are rewritten.  Returns the new yearly partitions.
+    """
+    limit = _before_code(before)
+    years = {}
+    for name, _ in mysql_partitions(conn):
+        match = re.fullmatch(r'p(\d{4})(\d{2})', name)
+        if match:
+            year, month = int(match.group(1)), int(match.group(2))
+            if _month_code(year + 1, 1) <= limit:
+                years.setdefault(year, []).append(name)
+    merged = []
+    with conn.cursor() as cursor:
+        for year, names in sorted(years.items()):
+            if len(names) < 2:
+                continue
+            # Monthly partitions are adjacent, so a year's months merge into one range
+            cursor.execute(f"ALTER TABLE traffic_stops REORGANIZE PARTITION {', '.join(names)} INTO "
+                           f"(PARTITION p{year} VALUES LESS THAN ('{year + 1}-01-01'))")
+            merged.append(f"p{year}")
+    conn.commit()
+    return merged
+
+
+def drop_mysql(conn, before):
+    """Drop every partition holding only stops before ``before``, then rebuild the rollups.
+
+    Every source's ``retained_from`` moves up to the first date kept, so the
+    loader does not write the dropped stops back on the next sync of their
+    CSV.  Returns the partitions dropped.
+    """
+    from securecheck import loader  # loader imports this module
+
+    cutoff = pd.Timestamp(before).to_period('M').start_time
+    dropped = [(name, bound) for name, bound in mysql_partitions(conn) if bound and pd.Timestamp(bound) <= cutoff]
+    names = [name for name, _ in dropped]
+    if names:
+        # ingest_sources may predate retained_from
+        loader.ensure_schema(conn, indexes=False)
+        kept_from = dropped[-1][1]
+        with conn.cursor() as cursor:
+            # Set before the drop: a load in between skips rows that are about to go anyway
+            cursor.execute("UPDATE ingest_sources SET retained_from = %s "
+                           "WHERE retained_from IS NULL OR retained_from < %s", (kept_from, kept_from))
+            conn.commit()
+            cursor.execute(f"ALTER TABLE traffic_stops DROP PARTITION {', '.join(names)}")
+        conn.commit()
+        # The rollups still count the dropped stops
+        rollups.refresh(conn)
+    return names
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build and maintain the year/month partitions of the stops.")
+    parser.add_argument('command', choices=['build', 'list', 'compact', 'drop', 'mysql-partition'])
+    parser.add_argument('path', nargs='?', default=CSV_PATH, help="source CSV for build")
+    parser.add_argument('--root', default=config.PARTITION_DIR, help="Parquet layout directory")
+    parser.add_argument('--before', help="compact/drop the months before this one (YYYY-MM)")
+    parser.add_argument('--mysql', action='store_true', help="work on the traffic_stops partitions instead")
+    parser.add_argument('--chunk-size', type=int, default=config.CHUNK_SIZE)
+    args = parser.parse_args(argv)
+    if args.command == 'drop' and not args.before:
+        parser.error("drop needs --before")
+
+    if args.command == 'mysql-partition' or args.mysql:
+        conn = db.connect()
+        try:
+            if args.command == 'mysql-partition':
+                added = mysql_partition(conn)
+                print(f"{len(added)} monthly partitions added" + (f" ({added[0]}..{added[-1]})" if added else ''))
+            elif args.command == 'list':
+                for name, bound in mysql_partitions(conn):
+                    print(f"{name:<12} < {bound or 'MAXVALUE'}")
+            elif args.command == 'compact':
+                if not args.before:
+                    parser.error("compact --mysql needs --before")
+                print(f"merged into {', '.join(compact_mysql(conn, args.before)) or 'nothing'}")
+            elif args.command == 'drop':
+                print(f"dropped {', '.join(drop_mysql(conn, args.before)) or 'nothing'}")
+            else:
+                parser.error("build writes the Parquet layout; use mysql-partition for MySQL")
+        finally:
+            conn.close()
+        return
+
+    if args.command == 'build':
+        result = build(args.path, args.root, args.chunk_size)
+        print(f"{result.rows:,} rows written to {args.root} in {result.seconds:.1f}s")
+    elif args.command == 'list':
+        print(list_layout(args.root).to_string(index=False))
+    elif args.command == 'compact':
+        merged = compact(args.root, args.before)
+        print(f"compacted {len(merged)} months")
+    else:
+        removed = drop(args.root, args.before)
+        print(f"dropped {len(removed)} months")
+
+
+if __name__ == '__main__':
+    main()
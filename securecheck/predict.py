@@ -0,0 +1,104 @@
+"""Lookup index behind the Prediction page.
+
+For every combination of driver gender, age, search, stop duration and drug
+flag the index keeps the stop_outcome and violation counts, plus the modal
+value of each, so a prediction is a dictionary lookup instead of a mask over
+the whole frame.  When the exact combination was never seen, it backs off to
+coarser keys (age bucket, then no age, then only the search/drug flags, then
+everything) and reports which level answered.
+
+New rows are folded in with ``update``; only the touched keys recompute their
+mode.  Updates and lookups may come from different threads.
+"""
+import threading
+from collections import namedtuple
+
+import pandas as pd
+
+# Most specific first; every level is a subset of the previous one
+LEVELS = [
+    ('exact match', ['driver_gender', 'driver_age', 'search_conducted', 'stop_duration', 'drugs_related_stop']),
+    ('age group', ['driver_gender', 'age_group', 'search_conducted', 'stop_duration', 'drugs_related_stop']),
+    ('without age', ['driver_gender', 'search_conducted', 'stop_duration', 'drugs_related_stop']),
+    ('search and drugs only', ['search_conducted', 'drugs_related_stop']),
+    ('all stops', []),
+]
+
+TARGETS = ['stop_outcome', 'violation']
+
+Prediction = namedtuple('Prediction', 'outcome outcome_count violation violation_count support level')
+
+
+def _age_group(frame):
+    # A grouping key next to the frame's columns, so the frame is not copied to add it
+    return (pd.to_numeric(frame['driver_age'], errors='coerce') // 10 * 10).rename('age_group')
+
+
+def _key(values):
+    return tuple(None if pd.isna(v) else int(v) for v in values)
+
+
+def _modal(counts):
+    # Ties go to the smallest value, like Series.mode()[0]
+    return min(counts.items(), key=lambda item: (-item[1], item[0]))
+
+
+class OutcomeIndex:
+
+    def __init__(self, df=None):
+        # level -> key -> {'n': stops, target: {value: count}, target + '_best': (value, count)}
+        self._levels = [{} for _ in LEVELS]
+        self._lock = threading.Lock()
+        if df is not None:
+            self.update(df)
+
+    def update(self, rows):
+        """Fold ``rows`` (cleaned stops) into the counts."""
+        age_group = _age_group(rows)
+        with self._lock:
+            self._fold(rows, age_group)
+
+    def _fold(self, frame, age_group):
+        for (name, cols), entries in zip(LEVELS, self._levels):
+            keys = [age_group if col == 'age_group' else col for col in cols]
+            touched = set()
+            for target in TARGETS:
+                counts = frame.groupby(keys + [target], observed=True, dropna=True).size() if cols else \
+                    frame.groupby(target, observed=True).size()
+                for idx, count in counts.items():
+                    if not count:
+                        continue
+                    idx = idx if isinstance(idx, tuple) else (idx,)
+                    key, value = _key(idx[:-1]), str(idx[-1])
+                    entry = entries.setdefault(key, {'n': 0, 'stop_outcome': {}, 'violation': {}})
+                    entry[target][value] = entry[target].get(value, 0) + int(count)
+                    touched.add(key)
+            sizes = frame.groupby(keys, observed=True, dropna=True).size() if cols else pd.Series([len(frame)])
+            for idx, count in sizes.items():
+                key = _key(idx if isinstance(idx, tuple) else (idx,)) if cols else ()
+                if key in entries:
+                    entries[key]['n'] += int(count)
+            for key in touched:
+                entry = entries[key]
+                for target in TARGETS:
+                    if entry[target]:
+                        entry[target + '_best'] = _modal(entry[target])
+
+    def predict(self, driver_gender, driver_age, search_conducted, stop_duration, drugs_related_stop):
+        """The modal outcome and violation at the most specific level with data."""
+        values = {
+            'driver_gender': driver_gender,
+            'driver_age': driver_age,
+            'age_group': None if driver_age is None else int(driver_age) // 10 * 10,
+            'search_conducted': search_conducted,
+            'stop_duration': stop_duration,
+            'drugs_related_stop': drugs_related_stop,
+        }
+        with self._lock:
+            for (name, cols), entries in zip(LEVELS, self._levels):
+                entry = entries.get(_key(values[c] for c in cols))
+                if entry and 'stop_outcome_best' in entry and 'violation_best' in entry:
+                    outcome, outcome_count = entry['stop_outcome_best']
+                    violation, violation_count = entry['violation_best']
+                    return Prediction(outcome, outcome_count, violation, violation_count, entry['n'], name)
+        return None
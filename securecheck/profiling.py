@@ -0,0 +1,84 @@
+"""Per-query timings for the Queries page diagnostics.
+
+Backends return a ``QueryStats`` with every profiled run.  ``QueryProfiler``
+keeps the last ``history`` runs of each catalog query, reports p50/p95
+latency over them and logs runs slower than ``slow_seconds`` to the
+``securecheck.slow_queries`` logger.
+"""
+import logging
+import threading
+import time
+from collections import defaultdict, deque, namedtuple
+
+import numpy as np
+import pandas as pd
+
+from securecheck import config
+
+# seconds includes acquire_seconds; plan is EXPLAIN ANALYZE text when asked for
+QueryStats = namedtuple('QueryStats', 'seconds acquire_seconds rows bytes plan')
+
+QueryRun = namedtuple('QueryRun', 'name backend finished seconds acquire_seconds rows bytes plan')
+
+slow_log = logging.getLogger('securecheck.slow_queries')
+
+
+def result_bytes(frame):
+    """Size of a result as pandas holds it, standing in for bytes transferred."""
+    return int(frame.memory_usage(deep=True, index=False).sum()) if len(frame.columns) else 0
+
+
+class QueryProfiler:
+
+    def __init__(self, history=config.QUERY_HISTORY, slow_seconds=config.SLOW_QUERY_SECONDS):
+        self.slow_seconds = slow_seconds
+        self._runs = defaultdict(lambda: deque(maxlen=history))
+        self._lock = threading.Lock()
+
+    def record(self, name, backend, stats):
+        run = QueryRun(name, backend, time.time(), *stats)
+        with self._lock:
+            self._runs[name].append(run)
+        if stats.seconds >= self.slow_seconds:
+            slow_log.warning("slow query %r on %s: %.2fs (%.2fs waiting for a connection), %d rows",
+                             name, backend, stats.seconds, stats.acquire_seconds, stats.rows)
+        return run
+
+    def run(self, backend, name, sql, explain=False):
+        """Run ``sql`` on ``backend``, record it and return the result frame."""
+        frame, stats = backend.profile(sql, explain)
+        self.record(name, backend.name, stats)
+        return frame
+
+    def history(self, name):
+        with self._lock:
+            return list(self._runs.get(name, ()))
+
+    def last(self, name):
+        runs = self.history(name)
+        return runs[-1] if runs else None
+
+    def summary(self):
+        """One row per query: run count, p50/p95 latency and the latest run's size."""
+        with self._lock:
+            runs = {name: list(history) for name, history in self._runs.items() if history}
+        rows = []
+        for name, history in runs.items():
+            seconds = np.array([run.seconds for run in history])
+            rows.append({
+                'query': name,
+                'runs': len(history),
+                'p50_ms': round(float(np.percentile(seconds, 50)) * 1000, 1),
+                'p95_ms': round(float(np.percentile(seconds, 95)) * 1000, 1),
+                'acquire_ms': round(history[-1].acquire_seconds * 1000, 1),
+                'rows': history[-1].rows,
+                'bytes': history[-1].bytes,
+                'slow_runs': int((seconds >= self.slow_seconds).sum()),
+            })
+        frame = pd.DataFrame(rows, columns=['query', 'runs', 'p50_ms', 'p95_ms', 'acquire_ms', 'rows', 'bytes',
+                                            'slow_runs'])
+        return frame.sort_values('p95_ms', ascending=False, ignore_index=True)
+
+    def clear(self):
+        with self._lock:
+            self._runs.clear()
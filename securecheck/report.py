@@ -0,0 +1,205 @@
+"""Run the whole query catalog at once and write the results as one report.
+
+The queries run concurrently on a bounded set of workers (each holding one
+pooled connection at a time), so the report takes about as long as the
+slowest query rather than the sum of all of them.  Given a ``SharedScan``,
+the queries in ``scan.SCAN_QUERIES`` are answered together in one pass over
+the cleaned frame instead.
+
+    python -m securecheck.report catalog.xlsx      # or .html, or a directory for Parquet
+    python -m securecheck.report catalog.html --shared-scan
+    python -m securecheck.report last_quarter.html --since 2022-10-01 --partitions .cache/partitions
+"""
+import argparse
+import html
+import importlib.util
+import os
+import re
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import pandas as pd
+
+from securecheck import backends, config, frame_cache, partitions
+from securecheck.catalog import iter_queries
+from securecheck.scan import SCAN_QUERIES, SharedScan, answer
+
+ReportEntry = namedtuple('ReportEntry', 'category name result seconds error')
+
+
+def run_catalog(run, workers=config.POOL_SIZE, progress=None, scan=None):
+    """Call ``run(name, sql)`` for every catalog query, ``workers`` at a time.
+
+    Returns one ``ReportEntry`` per query in catalog order; a failing query
+    gets an ``error`` instead of a result.  ``progress`` is called with each
+    entry as it completes, on the calling thread.  With a ``SharedScan``,
+    the ``SCAN_QUERIES`` are computed by it in a single task; each of their
+    entries carries the time of that whole pass.  If the pass fails, they
+    are answered one by one and only the failing ones get an ``error``.
+    """
+    queries = list(iter_queries())
+    shared = [q for q in queries if scan is not None and q[1] in SCAN_QUERIES]
+    separate = [q for q in queries if q not in shared]
+
+    def one(query):
+        category, name, sql = query
+        started = time.perf_counter()
+        try:
+            result, error = run(name, sql), None
+        except backends.BackendError as e:
+            result, error = None, str(e)
+        return [ReportEntry(category, name, result, time.perf_counter() - started, error)]
+
+    def scanned(query):
+        category, name, _ = query
+        started = time.perf_counter()
+        try:
+            result, error = answer(scan, [name])[0][name], None
+        except Exception as e:
+            result, error = None, f"shared scan failed: {e}"
+        return [ReportEntry(category, name, result, time.perf_counter() - started, error)]
+
+    def shared_pass():
+        try:
+            results, seconds = answer(scan, [name for _, name, _ in shared])
+        except Exception:
+            # Answer them one at a time, so only the failing ones lose their result
+            return [entry for query in shared for entry in scanned(query)]
+        return [ReportEntry(category, name, results[name], seconds, None) for category, name, _ in shared]
+
+    entries = {}
+    with ThreadPoolExecutor(max(1, min(workers, len(queries)))) as executor:
+        futures = [executor.submit(one, query) for query in separate]
+        if shared:
+            futures.append(executor.submit(shared_pass))
+        for future in as_completed(futures):
+            for entry in future.result():
+                entries[entry.name] = entry
+                if progress:
+                    progress(entry)
+    return [entries[name] for _, name, _ in queries]
+
+
+def summary(entries):
+    return pd.DataFrame({
+        'category': [e.category for e in entries],
+        'query': [e.name for e in entries],
+        'rows': [None if e.result is None else len(e.result) for e in entries],
+        'seconds': [round(e.seconds, 3) for e in entries],
+        'error': [e.error or '' for e in entries],
+    })
+
+
+def _slug(name, used, limit):
+    slug = re.sub(r'[^A-Za-z0-9]+', '_', name).strip('_')[:limit] or 'query'
+    candidate, n = slug, 2
+    while candidate in used:
+        suffix = f"_{n}"
+        candidate, n = slug[:limit - len(suffix)] + suffix, n + 1
+    used.add(candidate)
+    return candidate
+
+
+def excel_available():
+    return any(importlib.util.find_spec(engine) for engine in ('openpyxl', 'xlsxwriter'))
+
+
+def write_excel(entries, target):
+    """One sheet per query after a summary sheet; ``target`` is a path or binary file."""
+    used = {'summary'}
+    with pd.ExcelWriter(target) as writer:
+        summary(entries).to_excel(writer, sheet_name='summary', index=False)
+        for e in entries:
+            if e.result is not None:
+                # Excel caps sheet names at 31 characters
+                e.result.to_excel(writer, sheet_name=_slug(e.name, used, 31), index=False)
+
+
+def write_html(entries):
+    """The report as a standalone HTML page."""
+    parts = ["<html><head><meta charset='utf-8'><title>SecureCheck catalog report</title></head><body>",
+             "<h1>SecureCheck catalog report</h1>", summary(entries).to_html(index=False)]
+    for e in entries:
+        parts.append(f"<h2>{html.escape(e.category)}: {html.escape(e.name)}</h2>")
+        if e.error:
+            parts.append(f"<p>Error: {html.escape(e.error)}</p>")
+        else:
+            parts.append(e.result.to_html(index=False))
+    parts.append("</body></html>")
+    return '\n'.join(parts)
+
+
+def write_parquet(entries, directory):
+    """One Parquet file per query plus ``summary.parquet`` in ``directory``."""
+    os.makedirs(directory, exist_ok=True)
+    summary(entries).to_parquet(os.path.join(directory, 'summary.parquet'), index=False)
+    used = {'summary'}
+    for e in entries:
+        if e.result is not None:
+            e.result.to_parquet(os.path.join(directory, _slug(e.name, used, 80) + '.parquet'), index=False)
+
+
+def write_report(entries, path):
+    """Write by extension: .xlsx, .html, anything else is a Parquet directory."""
+    ext = os.path.splitext(path)[1].lower()
+    if ext == '.xlsx':
+        write_excel(entries, path)
+    elif ext in ('.html', '.htm'):
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(write_html(entries))
+    else:
+        write_parquet(entries, path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run every catalog query and write one report.")
+    parser.add_argument('out', help="report.xlsx, report.html, or a directory for Parquet files")
+    parser.add_argument('--backend', choices=backends.BACKENDS, default=config.BACKEND)
+    parser.add_argument('--csv', default=config.CSV_PATH, help="source for the duckdb backend")
+    parser.add_argument('--workers', type=int, default=config.POOL_SIZE)
+    parser.add_argument('--shared-scan', action='store_true',
+                        help="answer the queries that share a GROUP BY key in one pass over the cached frame")
+    parser.add_argument('--since', help="only stops on or after this date")
+    parser.add_argument('--until', help="only stops on or before this date")
+    parser.add_argument('--partitions', metavar='DIR',
+                        help="load the duckdb backend or the shared scan from this year/month Parquet layout, "
+                             "reading only the months in range, instead of the CSV")
+    args = parser.parse_args(argv)
+    if args.partitions and args.backend != 'duckdb' and not args.shared_scan:
+        # Only the duckdb backend and the shared scan read a frame
+        parser.error("--partitions needs --backend duckdb or --shared-scan")
+
+    date_range = partitions.DateRange(args.since, args.until) if args.since or args.until else None
+    frame = None
+    if args.shared_scan or args.backend == 'duckdb':
+        if args.partitions:
+            frame = partitions.read(args.partitions, date_range)
+        else:
+            frame = frame_cache.load_stops(args.csv)
+            if date_range is not None:
+                frame = frame[date_range.mask(frame['stop_date'])].reset_index(drop=True)
+    if args.partitions and args.backend == 'duckdb':
+        backend = backends.DuckDBBackend(frame, f"partitions:{date_range}")
+    else:
+        backend = backends.open_backend(args.backend, path=args.csv, frame=frame)
+    scan = SharedScan(frame) if args.shared_scan else None
+
+    def run(name, sql):
+        # The rollups cover the whole history
+        return backend.run(backend.route(name, sql) if date_range is None else partitions.restrict(sql, date_range))
+
+    started = time.perf_counter()
+    entries = run_catalog(run, args.workers,
+                          progress=lambda e: print(f"{e.seconds:8.3f}s  {e.name}" +
+                                                   (f"  ERROR {e.error}" if e.error else '')),
+                          scan=scan)
+    wall = time.perf_counter() - started
+    write_report(entries, args.out)
+    slowest = max(e.seconds for e in entries)
+    print(f"{len(entries)} queries in {wall:.2f}s (slowest {slowest:.2f}s, "
+          f"sum {sum(e.seconds for e in entries):.2f}s); report written to {args.out}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""LRU + TTL cache for catalog query results, keyed by data version."""
+import threading
+import time
+from collections import OrderedDict
+
+from securecheck import config
+
+
+class ResultCache:
+    """Results keyed by ``(query name, data version)``.
+
+    A reload changes the data version, so stale entries are simply never hit
+    again and age out through LRU eviction or ``ttl``.
+    """
+
+    def __init__(self, maxsize=config.RESULT_CACHE_SIZE, ttl=config.RESULT_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, name, version):
+        key = (name, version)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[0] <= self.ttl:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, name, version, result):
+        key = (name, version)
+        with self._lock:
+            self._entries[key] = (time.monotonic(), result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_run(self, name, version, run):
+        result = self.get(name, version)
+        if result is None:
+            # Errors propagate and are not cached
+            result = run()
+            self.put(name, version, result)
+        return result
+
+    def warm(self, queries, version, run_sql):
+        """Run every ``(name, sql)`` pair not already cached for ``version``.
+
+        ``run_sql`` is called with the name and the SQL.
+        """
+        for name, sql in queries:
+            with self._lock:
+                cached = (name, version) in self._entries
+            if not cached:
+                self.put(name, version, run_sql(name, sql))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'hits': self.hits,
+                    'misses': self.misses, 'evictions': self.evictions}
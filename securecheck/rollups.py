@@ -0,0 +1,365 @@
+"""Pre-aggregated rollups of traffic_stops.
+
+Two summary tables hold stop counts and flag sums over the dimensions the
+catalog queries group by:
+
+* ``rollup_profile``: country, violation, race, gender, age, stop_duration
+* ``rollup_time``: country, year, month, hour
+
+They are refreshed by the loader: appended rows are folded in with an
+``INSERT ... SELECT ... ON DUPLICATE KEY UPDATE`` over just the new rows, and
+anything else triggers a full rebuild.  Dimension columns are part of the
+primary key, so NULLs are stored as '' / -1 and mapped back with NULLIF.
+
+``build_cube`` is the in-memory counterpart used by the Overview page.
+"""
+import pandas as pd
+
+PROFILE_DDL = """
+    CREATE TABLE IF NOT EXISTS rollup_profile (
+        country_name VARCHAR(100) NOT NULL,
+        violation VARCHAR(100) NOT NULL,
+        driver_race VARCHAR(100) NOT NULL,
+        driver_gender TINYINT NOT NULL,
+        driver_age INT NOT NULL,
+        stop_duration TINYINT NOT NULL,
+        stops BIGINT NOT NULL,
+        arrests BIGINT NOT NULL,
+        searches BIGINT NOT NULL,
+        drug_stops BIGINT NOT NULL,
+        search_or_arrest BIGINT NOT NULL,
+        PRIMARY KEY (country_name, violation, driver_race, driver_gender, driver_age, stop_duration)
+    )
+"""
+
+TIME_DDL = """
+    CREATE TABLE IF NOT EXISTS rollup_time (
+        country_name VARCHAR(100) NOT NULL,
+        stop_year SMALLINT NOT NULL,
+        stop_month TINYINT NOT NULL,
+        stop_hour TINYINT NOT NULL,
+        stops BIGINT NOT NULL,
+        arrests BIGINT NOT NULL,
+        searches BIGINT NOT NULL,
+        drug_stops BIGINT NOT NULL,
+        search_or_arrest BIGINT NOT NULL,
+        PRIMARY KEY (country_name, stop_year, stop_month, stop_hour)
+    )
+"""
+
+MEASURES = """
+    COUNT(*),
+    COALESCE(SUM(is_arrested), 0),
+    COALESCE(SUM(search_conducted), 0),
+    COALESCE(SUM(drugs_related_stop), 0),
+    COALESCE(SUM(search_conducted OR is_arrested), 0)
+"""
+
+ON_DUPLICATE = """
+    ON DUPLICATE KEY UPDATE
+        stops = stops + VALUES(stops),
+        arrests = arrests + VALUES(arrests),
+        searches = searches + VALUES(searches),
+        drug_stops = drug_stops + VALUES(drug_stops),
+        search_or_arrest = search_or_arrest + VALUES(search_or_arrest)
+"""
+
+ROLLUPS = {
+    'rollup_profile': (
+        PROFILE_DDL,
+        ['country_name', 'violation', 'driver_race', 'driver_gender', 'driver_age', 'stop_duration'],
+        ["COALESCE(country_name, '')", "COALESCE(violation, '')", "COALESCE(driver_race, '')",
+         "COALESCE(driver_gender, -1)", "COALESCE(driver_age, -1)", "COALESCE(stop_duration, -1)"],
+    ),
+    'rollup_time': (
+        TIME_DDL,
+        ['country_name', 'stop_year', 'stop_month', 'stop_hour'],
+        # Generated columns of traffic_stops, covered by idx_calendar
+        ["COALESCE(country_name, '')", "COALESCE(stop_year, -1)",
+         "COALESCE(stop_month, -1)", "COALESCE(stop_hour, -1)"],
+    ),
+}
+
+
+def _refresh_sql(table, where=""):
+    _, columns, expressions = ROLLUPS[table]
+    return """
+        INSERT INTO {table} ({columns}, stops, arrests, searches, drug_stops, search_or_arrest)
+        SELECT {expressions}, {measures}
+        FROM traffic_stops {where}
+        GROUP BY {positions}
+        {on_duplicate}
+    """.format(
+        table=table, columns=', '.join(columns), expressions=', '.join(expressions),
+        measures=MEASURES, where=where, on_duplicate=ON_DUPLICATE,
+        positions=', '.join(str(i + 1) for i in range(len(columns)))
+    )
+
+
+def ensure_schema(conn):
+    """Create the rollup tables, building them from traffic_stops if new."""
+    created = False
+    with conn.cursor() as cursor:
+        for table, (ddl, _, _) in ROLLUPS.items():
+            cursor.execute("SHOW TABLES LIKE %s", (table,))
+            if not cursor.fetchone():
+                cursor.execute(ddl)
+                created = True
+    conn.commit()
+    if created:
+        refresh(conn)
+
+
+def refresh(conn, source_id=None, from_row=None):
+    """Fold rows ``source_row >= from_row`` of ``source_id`` into the rollups.
+
+    Without a source the rollups are rebuilt from scratch.
+    """
+    with conn.cursor() as cursor:
+        for table in ROLLUPS:
+            if source_id is None:
+                cursor.execute(f"DELETE FROM {table}")
+                cursor.execute(_refresh_sql(table))
+            else:
+                cursor.execute(_refresh_sql(table, "WHERE source_id = %s AND source_row >= %s"),
+                               (source_id, from_row or 0))
+    conn.commit()
+
+
+AGE_GROUP_SQL = """
+    CASE
+        WHEN age < 20 THEN 'Under 20'
+        WHEN age BETWEEN 20 AND 29 THEN '20-29'
+        WHEN age BETWEEN 30 AND 39 THEN '30-39'
+        WHEN age BETWEEN 40 AND 49 THEN '40-49'
+        WHEN age BETWEEN 50 AND 59 THEN '50-59'
+        WHEN age BETWEEN 60 AND 69 THEN '60-69'
+        WHEN age >= 70 THEN '70+'
+        ELSE 'Unknown'
+    END
+"""
+
+GENDER_SQL = """
+    CASE
+        WHEN driver_gender = 0 THEN 'female'
+        WHEN driver_gender = 1 THEN 'male'
+        ELSE 'unknown'
+    END
+"""
+
+DEMOGRAPHICS_SQL = f"""
+    SELECT
+        NULLIF(country_name, '') AS country_name,
+        {GENDER_SQL} AS driver_gender,
+        NULLIF(driver_race, '') AS driver_race,
+        ROUND(SUM(CASE WHEN driver_age >= 0 THEN driver_age * stops END)
+              / SUM(CASE WHEN driver_age >= 0 THEN stops END), 1) AS avg_age,
+        SUM(stops) AS total_stops
+    FROM rollup_profile
+    GROUP BY country_name, driver_race, driver_gender
+    ORDER BY country_name, total_stops DESC
+"""
+
+# Rollup-backed equivalents of the catalog queries, keyed by catalog name.
+# Queries that need per-row detail (the vehicle ones) are not listed and keep
+# running against traffic_stops.
+ROLLUP_QUERIES = {
+    "Driver age group with highest arrest rate": f"""
+        SELECT {AGE_GROUP_SQL} AS age_group,
+               ROUND(100.0 * SUM(arrests) / SUM(stops), 2) AS arrest_rate
+        FROM (SELECT NULLIF(driver_age, -1) AS age, arrests, stops FROM rollup_profile) AS p
+        GROUP BY age_group
+        ORDER BY arrest_rate DESC
+        LIMIT 1
+    """,
+    "Gender distribution of drivers stopped in each country": DEMOGRAPHICS_SQL,
+    "Race and gender combination with highest search rate": f"""
+        SELECT NULLIF(driver_race, '') AS driver_race,
+               {GENDER_SQL} AS driver_gender,
+               ROUND(100.0 * SUM(searches) / SUM(stops), 2) AS search_rate
+        FROM rollup_profile
+        GROUP BY driver_race, driver_gender
+        ORDER BY search_rate DESC
+        LIMIT 1
+    """,
+    "Time of day with most traffic stops": """
+        SELECT NULLIF(stop_hour, -1) AS hour, SUM(stops) AS count
+        FROM rollup_time
+        GROUP BY hour
+        ORDER BY count DESC
+        LIMIT 1
+    """,
+    "Average stop duration for different violations": """
+        SELECT NULLIF(violation, '') AS violation,
+               SUM(CASE
+                       WHEN stop_duration = 1 THEN 7.5
+                       WHEN stop_duration = 2 THEN 23
+                       WHEN stop_duration = 3 THEN 45
+                       ELSE 0
+                   END * stops) / SUM(stops) AS avg_duration
+        FROM rollup_profile
+        GROUP BY violation
+        ORDER BY avg_duration DESC
+    """,
+    "Stops more likely to lead to arrests": """
+        SELECT CASE
+                   WHEN stop_hour BETWEEN 20 AND 23 OR stop_hour BETWEEN 0 AND 5 THEN 'Night'
+                   ELSE 'Day'
+               END AS period,
+               ROUND(100.0 * SUM(arrests) / SUM(stops), 2) AS arrest_rate
+        FROM rollup_time
+        GROUP BY period
+    """,
+    "Violations most associated with searches or arrests": """
+        SELECT NULLIF(violation, '') AS violation,
+               ROUND(100.0 * SUM(search_or_arrest) / SUM(stops), 2) AS association_rate
+        FROM rollup_profile
+        GROUP BY violation
+        ORDER BY association_rate DESC
+    """,
+    "Violations most common among younger drivers (<25)": """
+        SELECT NULLIF(violation, '') AS violation, SUM(stops) AS count
+        FROM rollup_profile
+        WHERE driver_age BETWEEN 0 AND 24
+        GROUP BY violation
+        ORDER BY count DESC
+    """,
+    "Violation that rarely results in search or arrest": """
+        SELECT NULLIF(violation, '') AS violation,
+               ROUND(100.0 * SUM(search_or_arrest) / SUM(stops), 2) AS rate
+        FROM rollup_profile
+        GROUP BY violation
+        ORDER BY rate ASC
+        LIMIT 1
+    """,
+    "Countries with highest rate of drug-related stops": """
+        SELECT NULLIF(country_name, '') AS country_name,
+               ROUND(100.0 * SUM(drug_stops) / SUM(stops), 2) AS drug_rate
+        FROM rollup_profile
+        GROUP BY country_name
+        ORDER BY drug_rate DESC
+    """,
+    "Arrest rate by country and violation": """
+        SELECT NULLIF(country_name, '') AS country_name, NULLIF(violation, '') AS violation,
+               ROUND(100.0 * SUM(arrests) / SUM(stops), 2) AS arrest_rate
+        FROM rollup_profile
+        GROUP BY country_name, violation
+        ORDER BY country_name, arrest_rate DESC
+    """,
+    "Country with most stops with search conducted": """
+        SELECT NULLIF(country_name, '') AS country_name, SUM(searches) AS search_count
+        FROM rollup_profile
+        GROUP BY country_name
+        ORDER BY search_count DESC
+        LIMIT 1
+    """,
+    "Yearly Breakdown of Stops and Arrests by Country": """
+        SELECT
+            country_name,
+            year,
+            total_stops,
+            total_arrests,
+            arrest_rate,
+            RANK() OVER (PARTITION BY year ORDER BY total_stops DESC) AS rank_by_stops
+        FROM (
+            SELECT
+                NULLIF(country_name, '') AS country_name,
+                NULLIF(stop_year, -1) AS year,
+                SUM(stops) AS total_stops,
+                SUM(arrests) AS total_arrests,
+                ROUND(SUM(arrests) * 100.0 / SUM(stops), 2) AS arrest_rate
+            FROM rollup_time
+            GROUP BY country_name, stop_year
+        ) AS yearly_data
+        ORDER BY year, total_stops DESC
+    """,
+    "Driver Violation Trends Based on Age and Race": """
+        SELECT driver_race, driver_age_group, violation, SUM(stops) AS total_cases
+        FROM (
+            SELECT driver_race,
+                   CASE
+                       WHEN NULLIF(driver_age, -1) < 25 THEN '<25'
+                       WHEN NULLIF(driver_age, -1) BETWEEN 25 AND 40 THEN '25-40'
+                       WHEN NULLIF(driver_age, -1) BETWEEN 41 AND 60 THEN '41-60'
+                       ELSE '>60'
+                   END AS driver_age_group,
+                   NULLIF(violation, '') AS violation,
+                   stops
+            FROM rollup_profile
+            -- The catalog query joins on driver_race, which drops unknown
+            -- races; the rollup stores those as ''
+            WHERE driver_race <> ''
+        ) AS p
+        GROUP BY driver_race, driver_age_group, violation
+        ORDER BY total_cases DESC
+    """,
+    "Time Period Analysis of Stops": """
+        SELECT NULLIF(stop_year, -1) AS year,
+               NULLIF(stop_month, -1) AS month,
+               NULLIF(stop_hour, -1) AS hour,
+               SUM(stops) AS count
+        FROM rollup_time
+        GROUP BY year, month, hour
+        ORDER BY year, month, hour
+    """,
+    "Violations with High Search and Arrest Rates": """
+        SELECT NULLIF(violation, '') AS violation,
+               ROUND(SUM(searches) * 100.0 / SUM(stops), 2) AS search_rate,
+               ROUND(SUM(arrests) * 100.0 / SUM(stops), 2) AS arrest_rate,
+               RANK() OVER (ORDER BY SUM(arrests) DESC) AS rank_by_arrests
+        FROM rollup_profile
+        GROUP BY violation
+        HAVING search_rate > 10 OR arrest_rate > 10
+        ORDER BY rank_by_arrests
+    """,
+    "Driver Demographics by Country": DEMOGRAPHICS_SQL,
+    "Top 5 Violations with Highest Arrest Rates": """
+        SELECT NULLIF(violation, '') AS violation,
+               ROUND(SUM(arrests) * 100.0 / SUM(stops), 2) AS arrest_rate
+        FROM rollup_profile
+        GROUP BY violation
+        ORDER BY arrest_rate DESC
+        LIMIT 5
+    """,
+}
+
+
+def route(name, sql):
+    """The SQL to run for catalog query ``name``: its rollup form if it has one."""
+    return ROLLUP_QUERIES.get(name, sql)
+
+
+# In-memory cube for the Overview page
+CUBE_DIMENSIONS = ['country_name', 'violation', 'driver_gender', 'driver_race']
+
+
+def build_cube(df):
+    frame = df[CUBE_DIMENSIONS].copy()
+    frame['stops'] = 1
+    for col in ['is_arrested', 'search_conducted', 'driver_age']:
+        values = pd.to_numeric(df[col], errors='coerce')
+        frame[col + '_sum'] = values.fillna(0)
+        frame[col + '_n'] = values.notna().astype('int64')
+    return frame.groupby(CUBE_DIMENSIONS, dropna=False, observed=True, as_index=False).sum()
+
+
+def update_cube(cube, new_rows):
+    """Fold freshly loaded rows into an existing cube."""
+    combined = pd.concat([cube, build_cube(new_rows)], ignore_index=True)
+    return combined.groupby(CUBE_DIMENSIONS, dropna=False, observed=True, as_index=False).sum()
+
+
+class Cube:
+    """A ``build_cube`` result that new rows are folded into in place."""
+
+    def __init__(self, df):
+        self.frame = build_cube(df)
+
+    def update(self, new_rows):
+        # Readers keep whichever frame they already took
+        self.frame = update_cube(self.frame, new_rows)
+
+
+def cube_mean(cube, col):
+    n = cube[col + '_n'].sum()
+    return cube[col + '_sum'].sum() / n if n else float('nan')
@@ -0,0 +1,172 @@
+"""Read-only cleaned frame shared by every app process on the machine.
+
+``frame_cache`` rebuilds the cleaned frame from its Feather file.  That is
+cheap, but ``to_pandas`` still copies every column into the process heap, so
+N Streamlit processes (and ``app.py`` next to the dashboard) hold N copies.
+
+``publish`` writes the frame once more, this time as an Arrow IPC file laid
+out the way pandas keeps it in memory:
+
+- categorical columns are their integer codes, with the categories in the
+  schema metadata
+- nullable Int8/Int16 columns are their values plus a uint8 mask column
+- dates and times are the raw int64 ticks
+- strings stay Arrow strings, which pandas' ``str`` dtype wraps as-is
+
+``attach`` memory-maps that file and builds each column as a view of the
+mapping, so the data lives once in the OS page cache, however many
+processes attach to it.  The frame is read-only: derive new columns on a
+shallow copy (``frame.assign``), never in place.
+
+Every publish writes a new file named after the data version, then swaps a
+small pointer file with ``os.replace``.  A process sees the new version on
+its next ``current_version`` call; readers still using the old file keep
+their mapping until they let go of it.
+
+Needs pyarrow; without it nothing is published and ``attach`` parses the CSV.
+"""
+import glob
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from securecheck import config, frame_cache
+from securecheck.data import CLEAN_VERSION, CSV_PATH, read_stops
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+POINTER_FILE = 'datasets.json'
+MASK_PREFIX = '__mask__'
+
+
+def dataset_version(path=CSV_PATH, cache_dir=config.CACHE_DIR):
+    """Changes whenever the source file or the cleaning code does."""
+    return f"{frame_cache.source_fingerprint(path, cache_dir)[:16]}-v{CLEAN_VERSION}"
+
+
+def dataset_path(version, cache_dir=config.CACHE_DIR):
+    return os.path.join(cache_dir, f"dataset-{version}.arrow")
+
+
+def _read_pointers(cache_dir):
+    try:
+        with open(os.path.join(cache_dir, POINTER_FILE)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def current_version(path=CSV_PATH, cache_dir=config.CACHE_DIR):
+    """The published version for ``path``, or None if nothing is published."""
+    return _read_pointers(cache_dir).get(os.path.abspath(path))
+
+
+def _columns(frame):
+    """Arrow arrays holding ``frame``'s pandas buffers, plus what ``attach`` needs to rebuild it."""
+    arrays, layout = {}, {}
+    for col in frame.columns:
+        s = frame[col]
+        if isinstance(s.dtype, pd.CategoricalDtype):
+            arrays[col] = pa.array(s.cat.codes.to_numpy())
+            layout[col] = {'kind': 'category', 'categories': [str(c) for c in s.cat.categories]}
+        elif isinstance(s.dtype, pd.StringDtype):
+            arrays[col] = pa.chunked_array(pa.array(s.array, type=pa.large_string())).combine_chunks()
+            layout[col] = {'kind': 'string'}
+        elif isinstance(s.dtype, pd.core.dtypes.dtypes.BaseMaskedDtype):
+            masked = s.array
+            arrays[col] = pa.array(masked._data)
+            arrays[MASK_PREFIX + col] = pa.array(masked._mask.view(np.uint8))
+            layout[col] = {'kind': 'masked'}
+        elif s.dtype.kind in 'mM':
+            arrays[col] = pa.array(s.to_numpy().view(np.int64))
+            layout[col] = {'kind': 'ticks', 'dtype': str(s.dtype)}
+        else:
+            arrays[col] = pa.array(s.to_numpy())
+            layout[col] = {'kind': 'numpy'}
+    return arrays, layout
+
+
+def publish(path=CSV_PATH, cache_dir=config.CACHE_DIR, frame=None):
+    """Write the shared file for ``path`` and point readers at it; returns its version.
+
+    ``frame`` defaults to the cleaned frame from the columnar cache.
+    """
+    version = dataset_version(path, cache_dir)
+    target = dataset_path(version, cache_dir)
+    if not os.path.exists(target):
+        if frame is None:
+            frame = frame_cache.load_stops(path, cache_dir)
+        arrays, layout = _columns(frame)
+        # One record batch, so every column maps as one contiguous buffer
+        batch = pa.RecordBatch.from_pydict(arrays)
+        batch = batch.replace_schema_metadata({'securecheck': json.dumps({'columns': layout})})
+
+        def write(tmp_path):
+            with pa.OSFile(tmp_path, 'wb') as sink, pa.ipc.new_file(sink, batch.schema) as writer:
+                writer.write_batch(batch)
+        frame_cache._atomic_write(target, write)
+
+    pointers = _read_pointers(cache_dir)
+    pointers[os.path.abspath(path)] = version
+
+    def write_pointers(tmp_path):
+        with open(tmp_path, 'w') as f:
+            json.dump(pointers, f)
+    frame_cache._atomic_write(os.path.join(cache_dir, POINTER_FILE), write_pointers)
+    prune(set(pointers.values()), cache_dir)
+    return version
+
+
+def prune(keep, cache_dir=config.CACHE_DIR):
+    """Remove shared files whose version is not in ``keep``."""
+    for old in glob.glob(os.path.join(cache_dir, 'dataset-*.arrow')):
+        if os.path.basename(old)[len('dataset-'):-len('.arrow')] not in keep:
+            try:
+                # Mappings that are still open stay valid on POSIX
+                os.remove(old)
+            except OSError:
+                pass
+
+
+def _numpy(column):
+    return column.chunk(0).to_numpy(zero_copy_only=True)
+
+
+def attach(version, path=CSV_PATH, cache_dir=config.CACHE_DIR):
+    """The published frame ``version`` as read-only views of the mapped file."""
+    if pa is None:
+        return read_stops(path)
+    source = pa.memory_map(dataset_path(version, cache_dir))
+    batch = pa.ipc.open_file(source).get_batch(0)
+    table = pa.Table.from_batches([batch])
+    layout = json.loads(batch.schema.metadata[b'securecheck'])['columns']
+    columns = {}
+    for col, spec in layout.items():
+        kind = spec['kind']
+        if kind == 'category':
+            columns[col] = pd.Categorical.from_codes(_numpy(table[col]), spec['categories'], validate=False)
+        elif kind == 'string':
+            columns[col] = pd.array(table[col], dtype=pd.StringDtype('pyarrow'))
+        elif kind == 'masked':
+            mask = _numpy(table[MASK_PREFIX + col]).view(np.bool_)
+            columns[col] = pd.arrays.IntegerArray(_numpy(table[col]), mask, copy=False)
+        elif kind == 'ticks':
+            columns[col] = _numpy(table[col]).view(spec['dtype'])
+        else:
+            columns[col] = _numpy(table[col])
+    return pd.DataFrame(columns, copy=False)
+
+
+def ensure(path=CSV_PATH, cache_dir=config.CACHE_DIR):
+    """Publish ``path`` if its current data isn't published yet; returns the version to attach."""
+    version = dataset_version(path, cache_dir)
+    if pa is None:
+        return version
+    if current_version(path, cache_dir) != version or not os.path.exists(dataset_path(version, cache_dir)):
+        version = publish(path, cache_dir)
+    return version
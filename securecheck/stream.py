@@ -0,0 +1,124 @@
+"""Chunked ingestion of CSVs that do not fit in memory.
+
+``stream_csv`` reads the source in fixed-size chunks, cleans each chunk with
+the same ``clean_stops`` used everywhere else, and hands it to one or more
+sinks (MySQL via ``loader.BulkSink``, the columnar file via ``FeatherSink``)
+before reading the next one, so peak memory follows the chunk size rather
+than the file size.
+"""
+import os
+import time
+from collections import namedtuple
+
+import pandas as pd
+
+from securecheck import config
+from securecheck.data import CATEGORY_COLUMNS, iter_stops
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+except ImportError:
+    pa = pc = None
+
+
+class IngestProgress(namedtuple('IngestProgress', 'rows bytes_read total_bytes seconds')):
+
+    @property
+    def fraction(self):
+        return min(self.bytes_read / self.total_bytes, 1.0) if self.total_bytes else 1.0
+
+    @property
+    def rows_per_sec(self):
+        return self.rows / self.seconds if self.seconds else 0.0
+
+    def describe(self):
+        return (f"{self.rows:,} rows ({self.fraction:.0%} of file), "
+                f"{self.rows_per_sec:,.0f} rows/sec")
+
+
+def stream_csv(path, sinks, chunk_size=config.CHUNK_SIZE, progress=None):
+    """Feed cleaned chunks of ``path`` to every sink; returns the final progress.
+
+    Each sink has ``open()``, ``write(chunk, offset)`` and ``close()``.
+    ``progress`` is called with an ``IngestProgress`` after every chunk.
+    """
+    total_bytes = os.path.getsize(path)
+    started = time.perf_counter()
+    rows = 0
+    for sink in sinks:
+        sink.open()
+    with open(path, 'rb') as f:
+        for chunk in iter_stops(f, chunk_size):
+            for sink in sinks:
+                sink.write(chunk, rows)
+            rows += len(chunk)
+            if progress:
+                progress(IngestProgress(rows, f.tell(), total_bytes, time.perf_counter() - started))
+    for sink in sinks:
+        sink.close()
+    return IngestProgress(rows, total_bytes, total_bytes, time.perf_counter() - started)
+
+
+# Arrow types the Feather file is read back with, restoring the nullable dtypes
+FEATHER_TYPES = {}
+if pa is not None:
+    FEATHER_TYPES = {pa.int8(): pd.Int8Dtype(), pa.int16(): pd.Int16Dtype(),
+                     pa.string(): pd.StringDtype(), pa.large_string(): pd.StringDtype()}
+
+
+class FeatherSink:
+    """Appends chunks to an uncompressed Arrow IPC (Feather v2) file.
+
+    Categorical columns are stored as plain strings, since each chunk has its
+    own categories and the IPC file format allows only one dictionary per
+    column; ``read_feather_frame`` turns them back into categories.  The file
+    only appears under ``path`` once it is complete.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._tmp_path = f"{path}.{os.getpid()}.tmp"
+        self._writer = None
+        self._schema = None
+
+    def open(self):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+
+    def _table(self, chunk):
+        table = pa.Table.from_pandas(chunk, preserve_index=False)
+        for col in CATEGORY_COLUMNS:
+            i = table.schema.get_field_index(col)
+            table = table.set_column(i, col, table.column(col).cast(pa.string()))
+        table = table.replace_schema_metadata(None)
+        if self._schema is None:
+            self._schema = table.schema
+        return table.cast(self._schema)
+
+    def write(self, chunk, offset):
+        table = self._table(chunk)
+        if self._writer is None:
+            self._writer = pa.ipc.new_file(self._tmp_path, self._schema)
+        self._writer.write_table(table)
+
+    def close(self):
+        if self._writer is None:
+            return
+        self._writer.close()
+        os.replace(self._tmp_path, self.path)
+
+    def abort(self):
+        if self._writer is not None:
+            self._writer.close()
+        if os.path.exists(self._tmp_path):
+            os.remove(self._tmp_path)
+
+
+def read_feather_frame(path):
+    """Memory-map a file written by ``FeatherSink`` back into a cleaned frame."""
+    with pa.memory_map(path) as source:
+        table = pa.ipc.open_file(source).read_all()
+    for col in CATEGORY_COLUMNS:
+        i = table.schema.get_field_index(col)
+        table = table.set_column(i, col, pc.dictionary_encode(table.column(col)))
+    return table.to_pandas(types_mapper=FEATHER_TYPES.get)
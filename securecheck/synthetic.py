@@ -0,0 +1,102 @@
+"""Synthetic traffic stop CSVs with the same columns and value formats as the
+real export, for benchmarks and load tests.
+
+Values are drawn independently per column, except that searches, drug stops
+and arrests are correlated and ``stop_outcome`` agrees with ``is_arrested``,
+so the prediction and rate queries have something to find.  ``stop_time``
+mixes "HH:MM:SS" with hour-only values, and a few ages and genders are
+missing, as in the source file.
+"""
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from securecheck.data import DURATION_MAP, STOP_COLUMNS
+
+COUNTRIES = ['India', 'USA', 'Canada']
+RACES = ['White', 'Black', 'Hispanic', 'Asian', 'Other']
+VIOLATIONS = ['Speeding', 'Signal', 'Seatbelt', 'DUI', 'Other']
+OUTCOMES = ['Ticket', 'Warning', 'Citation']
+SEARCH_TYPES = ['Frisk', 'Vehicle Search']
+
+START_DATE = np.datetime64('2020-01-01')
+DAYS = 3 * 365
+
+
+def synthetic_stops(rows, seed=0, vehicles=None, start=START_DATE):
+    """A raw (uncleaned) frame of ``rows`` stops, dated from ``start`` on."""
+    rng = np.random.default_rng(seed)
+    vehicles = vehicles or max(rows // 4, 1)
+
+    dates = start + np.sort(rng.integers(0, DAYS, rows)).astype('timedelta64[D]')
+    hours = rng.integers(0, 24, rows)
+    minutes = rng.integers(0, 60, rows)
+    hour_text = pd.Series(hours).astype(str)
+    times = hour_text.str.zfill(2) + ':' + pd.Series(minutes).astype(str).str.zfill(2) + ':00'
+    times = times.where(rng.random(rows) >= 0.2, hour_text)
+
+    age = rng.integers(16, 80, rows).astype(float)
+    age[rng.random(rows) < 0.03] = np.nan
+    gender = np.where(rng.random(rows) < 0.7, 'M', 'F').astype(object)
+    gender[rng.random(rows) < 0.01] = None
+
+    search = rng.random(rows) < 0.15
+    drugs = rng.random(rows) < np.where(search, 0.3, 0.02)
+    arrested = rng.random(rows) < np.where(drugs, 0.6, np.where(search, 0.3, 0.05))
+    outcome = np.where(arrested, 'Arrest', np.array(OUTCOMES)[rng.integers(0, len(OUTCOMES), rows)])
+    search_type = np.where(search, np.array(SEARCH_TYPES)[rng.integers(0, 2, rows)], None)
+    violation = np.array(VIOLATIONS)[rng.integers(0, len(VIOLATIONS), rows)]
+    durations = np.array(list(DURATION_MAP))[rng.choice(3, rows, p=[0.7, 0.2, 0.1])]
+    # Zipf-like reuse, so some vehicles show up many times
+    vehicle = np.minimum(rng.zipf(1.3, rows), vehicles)
+
+    frame = pd.DataFrame({
+        'stop_date': np.datetime_as_string(dates, unit='D'),
+        'stop_time': times,
+        'country_name': np.array(COUNTRIES)[rng.integers(0, len(COUNTRIES), rows)],
+        'driver_gender': gender,
+        'driver_age_raw': pd.array(age, dtype='Int16'),
+        'driver_age': age,
+        'driver_race': np.array(RACES)[rng.integers(0, len(RACES), rows)],
+        'violation_raw': violation,
+        'violation': violation,
+        'search_conducted': search,
+        'search_type': search_type,
+        'stop_outcome': outcome,
+        'is_arrested': arrested,
+        'stop_duration': durations,
+        'drugs_related_stop': drugs,
+        'vehicle_number': 'KA' + pd.Series(vehicle).astype(str).str.zfill(6),
+    })
+    return frame[STOP_COLUMNS]
+
+
+def write_csv(path, rows, seed=0, chunk_size=1_000_000):
+    """Write ``rows`` synthetic stops to ``path``, ``chunk_size`` at a time."""
+    vehicles = max(rows // 4, 1)
+    written = 0
+    part = 0
+    while written < rows or part == 0:
+        n = min(chunk_size, rows - written)
+        # Each chunk covers the next DAYS days, so the file stays in date order
+        start = START_DATE + np.timedelta64(DAYS * part, 'D')
+        chunk = synthetic_stops(n, seed=(seed, part), vehicles=vehicles, start=start)
+        chunk.to_csv(path, mode='w' if part == 0 else 'a', header=part == 0, index=False)
+        written += n
+        part += 1
+    return path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write a synthetic traffic stops CSV.")
+    parser.add_argument('path')
+    parser.add_argument('--rows', type=int, default=10_000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+    write_csv(args.path, args.rows, args.seed)
+    print(f"Wrote {args.rows:,} rows to {args.path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,298 @@
+"""Per-vehicle stop history for check-post lookups.
+
+``VehicleIndex`` maps every ``vehicle_number`` to a slot in a few compact
+arrays (stops, searches, arrests, drug-related stops, first and last stop
+date) and to the row offsets of its stops, so a plate lookup is one dict
+probe and a handful of array reads instead of a scan.  A Bloom filter in
+front of it answers "never stopped" for unknown plates without touching the
+index, and bounded top-K heaps keep the most stopped, most searched and most
+drug-related vehicles current.
+
+The index is built once per loaded frame; logged stops are folded in with
+``update`` (a ``LogWriter`` subscriber), which only touches the vehicles in
+the new rows.
+"""
+import heapq
+import threading
+import time
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+# Summary counters per vehicle; the top-K views rank by them
+COUNTERS = {
+    'stops': None,
+    'searches': 'search_conducted',
+    'arrests': 'is_arrested',
+    'drug_stops': 'drugs_related_stop',
+}
+
+TOP_VIEWS = {'stops': "Most stopped vehicles", 'searches': "Most searched vehicles",
+             'drug_stops': "Most drug-related vehicles"}
+
+VehicleHistory = namedtuple(
+    'VehicleHistory', 'vehicle_number stops searches arrests drug_stops first_seen last_seen offsets'
+)
+
+_HASH_KEYS = ('securecheck0vehi', 'securecheck1bloo')
+
+
+def _hashes(values):
+    values = np.asarray(values, dtype=object)
+    return [pd.util.hash_array(values, hash_key=key, categorize=False) for key in _HASH_KEYS]
+
+
+class BloomFilter:
+    """Set membership with no false negatives and about ``error_rate`` false positives."""
+
+    def __init__(self, capacity, error_rate=0.01):
+        self.capacity = max(int(capacity), 1)
+        self.bits = int(np.ceil(-self.capacity * np.log(error_rate) / np.log(2) ** 2))
+        self.hashes = max(1, int(round(self.bits / self.capacity * np.log(2))))
+        self.count = 0
+        self._array = np.zeros((self.bits + 7) // 8, np.uint8)
+
+    def _positions(self, values):
+        # Double hashing: position i is h1 + i * h2
+        h1, h2 = _hashes(values)
+        steps = np.arange(self.hashes, dtype=np.uint64)
+        return (h1[:, None] + steps[None, :] * h2[:, None]) % np.uint64(self.bits)
+
+    def add(self, values, chunk_size=1_000_000):
+        for start in range(0, len(values), chunk_size):
+            positions = self._positions(values[start:start + chunk_size]).ravel()
+            np.bitwise_or.at(self._array, positions // 8, (1 << (positions % 8)).astype(np.uint8))
+        self.count += len(values)
+
+    def __contains__(self, value):
+        positions = self._positions([value])[0]
+        return bool(np.all(self._array[positions // 8] & (1 << (positions % 8)).astype(np.uint8)))
+
+
+class _Reversed:
+    """Sorts its value in reverse, so the heap's minimum is the worst-ranked vehicle."""
+    __slots__ = ('value',)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __lt__(self, other):
+        return self.value > other.value
+
+    def __eq__(self, other):
+        return self.value == other.value
+
+
+class TopK:
+    """The ``k`` vehicles with the highest count, ties broken by vehicle number.
+
+    A min-heap of the current members with lazy deletion: when a member's
+    count grows it is pushed again and the outdated entry is skipped once it
+    reaches the top.  Counts only ever grow, so a vehicle outside the top
+    can only get in through its own increment, which ``offer`` checks
+    against the current minimum.
+    """
+
+    def __init__(self, k=10):
+        self.k = k
+        self._heap = []
+        self._members = {}
+
+    def _prune(self):
+        while self._heap and self._members.get(self._heap[0][1].value) != self._heap[0][0]:
+            heapq.heappop(self._heap)
+
+    def offer(self, vehicle, count):
+        if count <= 0:
+            return
+        if vehicle not in self._members and len(self._members) >= self.k:
+            self._prune()
+            low_count, low = self._heap[0]
+            if count < low_count or count == low_count and vehicle >= low.value:
+                return
+            heapq.heappop(self._heap)
+            del self._members[low.value]
+        self._members[vehicle] = count
+        heapq.heappush(self._heap, (count, _Reversed(vehicle)))
+        # Outdated entries only take memory; drop them once they dominate
+        if len(self._heap) > 4 * self.k:
+            self._heap = [(c, _Reversed(v)) for v, c in self._members.items()]
+            heapq.heapify(self._heap)
+
+    def items(self):
+        """``(vehicle, count)`` pairs, best first."""
+        return sorted(self._members.items(), key=lambda item: (-item[1], item[0]))
+
+
+def _top_slots(counts, names, k):
+    """Slots of the ``k`` highest positive ``counts``, ties broken by the smallest name."""
+    n = len(counts)
+    if n <= k:
+        slots = np.arange(n)
+    else:
+        kth = np.partition(counts, n - k)[n - k]
+        above = np.flatnonzero(counts > kth)
+        # With mostly unique plates nearly every vehicle ties at the k-th
+        # count; a vectorized sort of their names settles the last places
+        tied = np.flatnonzero(counts == kth)
+        tied = tied[np.argsort(names[tied].astype(str), kind='stable')[:k - len(above)]]
+        slots = np.concatenate([above, tied])
+    return slots[counts[slots] > 0]
+
+
+class VehicleIndex:
+
+    def __init__(self, df, top_k=10, error_rate=0.01):
+        self.df = df
+        self._lock = threading.Lock()
+        codes, vehicles = pd.factorize(df['vehicle_number'])
+        n = len(vehicles)
+        self._slots = dict(zip(vehicles, range(n)))
+        self._vehicles = list(vehicles)
+
+        known = codes >= 0
+        index_type = np.int32 if len(df) < 2 ** 31 else np.int64
+        self._order = np.flatnonzero(known)[np.argsort(codes[known], kind='stable')].astype(index_type)
+        sizes = np.bincount(codes[known], minlength=n)
+        self._starts = np.concatenate([[0], np.cumsum(sizes)])
+        # Offsets of rows added by ``update``, per slot
+        self._extra = {}
+        self._appended = []
+        self._rows = len(df)
+
+        self._counters = {'stops': sizes.astype(np.int64)}
+        for name, col in COUNTERS.items():
+            if col:
+                flags = pd.to_numeric(df[col], errors='coerce').fillna(0).to_numpy(np.int64)
+                self._counters[name] = np.bincount(codes[known], weights=flags[known], minlength=n) \
+                    .astype(np.int64)
+
+        dates = df['stop_date'].to_numpy('datetime64[D]')[self._order]
+        valid = ~np.isnat(dates)
+        self._first = np.full(n, np.datetime64('NaT'), 'datetime64[D]')
+        self._last = self._first.copy()
+        if n:
+            # NaT sorts below every date, so keep it out of min/max
+            far = np.where(valid, dates, np.datetime64('9999-12-31'))
+            self._first = np.minimum.reduceat(far, self._starts[:-1]).astype('datetime64[D]')
+            near = np.where(valid, dates, np.datetime64('0001-01-01'))
+            self._last = np.maximum.reduceat(near, self._starts[:-1]).astype('datetime64[D]')
+            self._first[self._first == np.datetime64('9999-12-31')] = np.datetime64('NaT')
+            self._last[self._last == np.datetime64('0001-01-01')] = np.datetime64('NaT')
+
+        self._bloom = BloomFilter(2 * n + 1024, error_rate)
+        self._bloom.add(self._vehicles)
+        self._error_rate = error_rate
+
+        self._top = {}
+        names = np.asarray(vehicles, dtype=object)
+        for name in TOP_VIEWS:
+            counts = self._counters[name]
+            top = TopK(top_k)
+            # Only the chosen k go through ``offer``
+            for slot in _top_slots(counts, names, top_k):
+                top.offer(self._vehicles[slot], int(counts[slot]))
+            self._top[name] = top
+
+    def _grow(self, size):
+        for name, values in self._counters.items():
+            if len(values) < size:
+                self._counters[name] = np.concatenate([values, np.zeros(max(size, 2 * len(values)) - len(values),
+                                                                        np.int64)])
+        for attr in ('_first', '_last'):
+            values = getattr(self, attr)
+            if len(values) < size:
+                pad = np.full(max(size, 2 * len(values)) - len(values), np.datetime64('NaT'), 'datetime64[D]')
+                setattr(self, attr, np.concatenate([values, pad]))
+
+    def update(self, rows):
+        """Fold newly ingested ``rows`` (cleaned stops) into the index."""
+        rows = rows.reset_index(drop=True)
+        flags = {name: pd.to_numeric(rows[col], errors='coerce').fillna(0).to_numpy(np.int64)
+                 for name, col in COUNTERS.items() if col}
+        dates = rows['stop_date'].to_numpy('datetime64[D]')
+        with self._lock:
+            offset = self._rows
+            new = [v for v in pd.unique(rows['vehicle_number'].dropna()) if v not in self._slots]
+            if new:
+                self._grow(len(self._vehicles) + len(new))
+                for vehicle in new:
+                    self._slots[vehicle] = len(self._vehicles)
+                    self._vehicles.append(vehicle)
+                if self._bloom.count + len(new) > self._bloom.capacity:
+                    self._bloom = BloomFilter(2 * len(self._vehicles) + 1024, self._error_rate)
+                    self._bloom.add(self._vehicles)
+                else:
+                    self._bloom.add(new)
+            touched = set()
+            for i, vehicle in enumerate(rows['vehicle_number']):
+                if pd.isna(vehicle):
+                    continue
+                slot = self._slots[vehicle]
+                self._extra.setdefault(slot, []).append(offset + i)
+                self._counters['stops'][slot] += 1
+                for name, values in flags.items():
+                    self._counters[name][slot] += values[i]
+                if not np.isnat(dates[i]):
+                    if np.isnat(self._first[slot]) or dates[i] < self._first[slot]:
+                        self._first[slot] = dates[i]
+                    if np.isnat(self._last[slot]) or dates[i] > self._last[slot]:
+                        self._last[slot] = dates[i]
+                touched.add(slot)
+            for name, top in self._top.items():
+                for slot in touched:
+                    top.offer(self._vehicles[slot], int(self._counters[name][slot]))
+            self._appended.append(rows)
+            self._rows += len(rows)
+
+    def __len__(self):
+        """Distinct vehicles stopped."""
+        with self._lock:
+            return len(self._vehicles)
+
+    def might_have(self, vehicle_number):
+        """False only for plates that were certainly never stopped."""
+        return vehicle_number in self._bloom
+
+    def lookup(self, vehicle_number):
+        """The ``VehicleHistory`` of ``vehicle_number``, or None if it has no stops."""
+        vehicle_number = vehicle_number.strip()
+        if not self.might_have(vehicle_number):
+            return None
+        with self._lock:
+            slot = self._slots.get(vehicle_number)
+            if slot is None:
+                return None
+            offsets = self._order[self._starts[slot]:self._starts[slot + 1]] if slot < len(self._starts) - 1 \
+                else np.empty(0, self._order.dtype)
+            extra = self._extra.get(slot)
+            if extra:
+                offsets = np.concatenate([offsets, np.asarray(extra, offsets.dtype)])
+            counters = {name: int(values[slot]) for name, values in self._counters.items()}
+            return VehicleHistory(vehicle_number, first_seen=self._first[slot], last_seen=self._last[slot],
+                                  offsets=offsets, **counters)
+
+    def rows(self, history):
+        """The stops behind a ``VehicleHistory``, oldest first."""
+        offsets = history.offsets
+        base = offsets[offsets < len(self.df)]
+        parts = [self.df.iloc[base]]
+        appended = offsets[offsets >= len(self.df)] - len(self.df)
+        if len(appended):
+            with self._lock:
+                logged = pd.concat(self._appended, ignore_index=True)
+            parts.append(logged.iloc[appended])
+        frame = pd.concat(parts, ignore_index=True) if len(parts) > 1 else parts[0].reset_index(drop=True)
+        return frame.sort_values(['stop_date', 'stop_time'], kind='stable', ignore_index=True)
+
+    def top(self, view):
+        """``(vehicle_number, count)`` pairs of a ``TOP_VIEWS`` view, best first."""
+        with self._lock:
+            return self._top[view].items()
+
+    def timed_lookup(self, vehicle_number):
+        """``lookup`` plus the seconds it took."""
+        started = time.perf_counter()
+        history = self.lookup(vehicle_number)
+        return history, time.perf_counter() - started
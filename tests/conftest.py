@@ -0,0 +1,15 @@
+import pytest
+
+from securecheck.data import clean_stops
+from securecheck.synthetic import synthetic_stops
+
+
+@pytest.fixture(scope='session')
+def raw_stops():
+    """20,000 uncleaned synthetic stops, as the benchmark harness generates them."""
+    return synthetic_stops(20_000, seed=1)
+
+
+@pytest.fixture(scope='session')
+def stops(raw_stops):
+    return clean_stops(raw_stops.copy())
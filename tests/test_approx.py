@@ -0,0 +1,102 @@
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from securecheck.approx import (STRATA, ApproxIndex, CountMinSketch, HeavyHitters, HyperLogLog,
+                                StratifiedReservoir, estimate_total)
+from securecheck.partitions import DateRange
+
+
+@pytest.mark.parametrize('distinct', [500, 20_000, 300_000])
+def test_hyperloglog_within_its_error_bound(distinct):
+    sketch = HyperLogLog(p=12)
+    values = np.array([f"TN{i:07d}" for i in range(distinct)], dtype=object)
+    # Repeats do not count
+    sketch.add(values)
+    sketch.add(values[::3])
+    # Four standard errors: a failure is a bug, not bad luck
+    assert abs(sketch.count() - distinct) <= 4 * sketch.relative_error * distinct
+
+
+def test_hyperloglog_union_counts_the_combined_set():
+    a, b = HyperLogLog(), HyperLogLog()
+    a.add(np.array([f"A{i}" for i in range(30_000)], dtype=object))
+    b.add(np.array([f"A{i}" for i in range(20_000, 50_000)], dtype=object))
+    union = HyperLogLog.union([a, b])
+    assert abs(union.count() - 50_000) <= 4 * union.relative_error * 50_000
+
+
+def test_count_min_never_under_and_rarely_over_its_bound():
+    rng = np.random.default_rng(4)
+    values = np.array([f"V{i}" for i in rng.zipf(1.5, 200_000) % 50_000], dtype=object)
+    truth = pd.Series(values).value_counts()
+    sketch = CountMinSketch(width=2048, depth=5)
+    sketch.add(truth.index.to_numpy(object), truth.to_numpy(np.int64))
+    estimates = sketch.estimate(truth.index.to_numpy(object))
+    assert sketch.total == len(values)
+    assert (estimates >= truth.to_numpy()).all()
+    over = estimates - truth.to_numpy() > sketch.error_bound
+    # Each estimate exceeds the bound with probability at most e^-depth
+    assert over.mean() <= 2 * math.exp(-sketch.depth)
+
+
+def test_heavy_hitters_find_the_most_frequent_values():
+    rng = np.random.default_rng(5)
+    values = pd.Series([f"V{i:05d}" for i in rng.zipf(1.4, 100_000) % 20_000])
+    hitters = HeavyHitters(k=5)
+    for start in range(0, len(values), 10_000):
+        hitters.add(values.iloc[start:start + 10_000])
+    expected = values.value_counts().head(5)
+    assert [value for value, _ in hitters.items()] == list(expected.index)
+    for value, estimate in hitters.items():
+        assert expected[value] <= estimate <= expected[value] + hitters.sketch.error_bound
+
+
+def test_reservoir_strata_are_proportional_with_a_floor(stops):
+    reservoir = StratifiedReservoir(size=2_000, min_per_stratum=50, seed=1)
+    reservoir.build(stops)
+    offsets, strata, population, sampled = reservoir.sample()
+    sizes = stops.groupby(STRATA, dropna=False, observed=True).size()
+    assert population.sum() == len(stops)
+    assert sorted(population) == sorted(sizes)
+    assert len(np.unique(offsets)) == len(offsets)
+    for n_h, N_h in zip(sampled, population):
+        assert n_h == min(N_h, max(50, math.ceil(2_000 * N_h / len(stops))))
+    # Every sampled row belongs to the stratum it is counted in
+    keys = stops.iloc[offsets][STRATA].astype(object).apply(tuple, axis=1).to_numpy()
+    for h in np.unique(strata):
+        assert len(set(keys[strata == h])) == 1
+
+
+def test_reservoir_add_keeps_capacity_and_counts_every_row(stops):
+    reservoir = StratifiedReservoir(size=1_000, min_per_stratum=20, seed=2)
+    reservoir.build(stops.iloc[:10_000])
+    before = reservoir.sample()[3].copy()
+    reservoir.add(stops.iloc[10_000:], 10_000)
+    offsets, _, population, sampled = reservoir.sample()
+    assert population.sum() == len(stops)
+    np.testing.assert_array_equal(sampled[:len(before)], before)
+    assert offsets.max() >= 10_000
+
+
+def test_total_estimate_covers_the_truth(stops):
+    index = ApproxIndex(stops, sample_size=3_000, seed=3)
+    sample = index.sample()
+    arrested = pd.to_numeric(sample.rows['is_arrested'], errors='coerce').fillna(0).to_numpy(np.float64)
+    estimate = estimate_total(sample, arrested)
+    truth = pd.to_numeric(stops['is_arrested'], errors='coerce').fillna(0).sum()
+    assert abs(estimate.value - truth) <= 2 * estimate.margin
+    # Stops per stratum are known exactly
+    assert estimate_total(sample, np.ones(len(sample.rows))).value == pytest.approx(len(stops))
+
+
+def test_distinct_vehicles_per_date_range(stops):
+    index = ApproxIndex(stops, sample_size=2_000)
+    date_range = DateRange('2021-01-01', '2021-12-31')
+    truth = stops.loc[date_range.mask(stops['stop_date']), 'vehicle_number'].nunique()
+    estimate = index.distinct_vehicles(date_range)
+    assert abs(estimate.value - truth) <= 2 * estimate.margin
+    overall = index.distinct_vehicles()
+    assert abs(overall.value - stops['vehicle_number'].nunique()) <= 2 * overall.margin
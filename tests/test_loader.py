@@ -0,0 +1,54 @@
+import numpy as np
+import pandas as pd
+
+from securecheck.data import clean_stops
+from securecheck.loader import StoredRows, _storable, diff_rows, row_hashes
+
+
+def _stored(frame, from_row=0):
+    return StoredRows(np.arange(from_row, len(frame)), row_hashes(frame)[from_row:])
+
+
+def test_unchanged_file_writes_nothing(stops):
+    frame = stops.head(100)
+    assert diff_rows(row_hashes(frame), _stored(frame)) == ([], [])
+
+
+def test_changed_rows_are_upserted(raw_stops):
+    before = clean_stops(raw_stops.head(100).copy())
+    edited = raw_stops.head(100).copy()
+    edited.loc[[3, 40], 'violation'] = 'DUI-edited'
+    edited.loc[77, 'driver_age'] = 99
+    after = clean_stops(edited)
+    assert diff_rows(row_hashes(after), _stored(before)) == ([3, 40, 77], [])
+
+
+def test_removed_rows_are_deleted(stops):
+    before, after = stops.head(100), stops.head(90)
+    assert diff_rows(row_hashes(after), _stored(before)) == ([], list(range(90, 100)))
+
+
+def test_appended_rows_from_the_high_water_mark(stops):
+    before, after = stops.head(100), stops.head(130)
+    # The loader re-reads from the last loaded row on
+    assert diff_rows(row_hashes(after), _stored(before, 99), start=99) == (list(range(100, 130)), [])
+
+
+def test_rows_outside_retention_are_skipped_and_removed(stops):
+    frame = stops.head(100)
+    cutoff = frame['stop_date'].iloc[50]
+    storable = _storable(frame, cutoff, dated_only=True)
+    upsert, delete = diff_rows(row_hashes(frame), _stored(frame), storable=storable)
+    assert upsert == []
+    assert delete == list(np.flatnonzero(frame['stop_date'] < cutoff))
+
+    # Nothing stored yet: only the rows on or after the cutoff are written
+    upsert, _ = diff_rows(row_hashes(frame), _stored(frame.head(0)), storable=storable)
+    assert upsert == list(np.flatnonzero(frame['stop_date'] >= cutoff))
+
+
+def test_undated_rows_are_not_stored_once_stop_date_is_required(stops):
+    frame = stops.head(10).copy()
+    frame.loc[[2, 5], 'stop_date'] = pd.NaT
+    assert list(np.flatnonzero(~_storable(frame, None, dated_only=True))) == [2, 5]
+    assert _storable(frame, None, dated_only=False).all()
@@ -0,0 +1,82 @@
+import json
+
+import pytest
+
+from securecheck.logbook import LogWriter, record
+
+
+class FailingJournal:
+    """The journal file, except that one write stores half its bytes and then fails."""
+
+    def __init__(self, journal):
+        self._journal = journal
+        self.failed = False
+
+    def write(self, data):
+        if self.failed:
+            return self._journal.write(data)
+        self.failed = True
+        self._journal.write(data[:len(data) // 2])
+        raise OSError(28, "No space left on device")
+
+    def __getattr__(self, name):
+        return getattr(self._journal, name)
+
+
+def _entries(n, first=0):
+    return [record('2022-05-01', '10:00', driver_gender='M', driver_age=30 + (first + i) % 40,
+                   violation='Speeding', stop_outcome='Warning', vehicle_number=f'TN{first + i:04d}')
+            for i in range(n)]
+
+
+def _journal_lines(writer):
+    with open(writer.path, 'rb') as f:
+        return [json.loads(line) for line in f.read().splitlines()]
+
+
+def test_failed_write_leaves_row_numbers_matching_lines(tmp_path):
+    writer = LogWriter('test', log_dir=str(tmp_path))
+    try:
+        before = _entries(5)
+        assert [writer.append(e) for e in before] == list(range(5))
+
+        writer._journal = FailingJournal(writer._journal)
+        failing = _entries(20, 5)
+        futures = [writer.append(e, wait=False) for e in failing]
+        acked = {}
+        for entry, future in zip(failing, futures):
+            if future.exception() is None:
+                acked[future.result()] = entry
+        assert len(acked) < len(failing)
+
+        after = _entries(10, 25)
+        for entry in after:
+            acked[writer.append(entry)] = entry
+        writer.flush()
+
+        lines = _journal_lines(writer)
+        assert lines[:5] == before
+        assert len(lines) == writer.journaled == 5 + len(acked)
+        for row, entry in acked.items():
+            assert lines[row] == entry
+    finally:
+        writer.close()
+
+
+def test_unrepairable_journal_stops_accepting_rows(tmp_path, monkeypatch):
+    writer = LogWriter('test', log_dir=str(tmp_path))
+    try:
+        writer.append(_entries(1)[0])
+        writer._journal = FailingJournal(writer._journal)
+
+        def ftruncate(fd, length):
+            raise OSError(5, "Input/output error")
+
+        monkeypatch.setattr('securecheck.logbook.os.ftruncate', ftruncate)
+        future = writer.append(_entries(1, 1)[0], wait=False)
+        assert isinstance(future.exception(), OSError)
+        assert writer.broken is not None
+        with pytest.raises(OSError):
+            writer.append(_entries(1, 2)[0])
+    finally:
+        writer.close()
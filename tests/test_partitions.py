@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+
+from securecheck.catalog import iter_queries
+from securecheck.partitions import DateRange, MonthIndex, restrict
+
+from test_scan import assert_same_result
+
+RANGES = [
+    DateRange('2021-03-15', '2021-09-10'),
+    DateRange('2022-06-01', None),
+    DateRange(None, '2020-02-29'),
+]
+
+
+def test_no_range_leaves_the_sql_alone():
+    sql = "SELECT COUNT(*) FROM traffic_stops"
+    assert restrict(sql, None) == sql
+    assert restrict(sql, DateRange()) == sql
+
+
+def test_every_from_is_narrowed():
+    sql = ("SELECT v FROM traffic_stops WHERE x IN (SELECT x FROM Traffic_Stops) "
+           "UNION ALL SELECT v from  traffic_stops")
+    narrowed = restrict(sql, DateRange('2021-01-01', '2021-12-31'))
+    assert narrowed.count("(SELECT * FROM traffic_stops WHERE stop_date >= DATE '2021-01-01' "
+                          "AND stop_date <= DATE '2021-12-31') AS stops_in_range") == 3
+    # Names that only start with the table's are not touched
+    assert restrict("SELECT * FROM traffic_stops_by_day", RANGES[0]) == "SELECT * FROM traffic_stops_by_day"
+
+
+@pytest.mark.parametrize('date_range', RANGES, ids=DateRange.describe)
+def test_restricted_catalog_matches_the_filtered_frame(stops, date_range):
+    pytest.importorskip('duckdb')
+    from securecheck.backends import DuckDBBackend
+
+    everything = DuckDBBackend(stops, 'all')
+    in_range = DuckDBBackend(stops[date_range.mask(stops['stop_date'])].reset_index(drop=True), 'range')
+    for _, name, sql in iter_queries():
+        expected = in_range.run(sql)
+        actual = everything.run(restrict(sql, date_range))
+        if 'LIMIT' in sql.upper():
+            # Ties at the cut may come back in either order
+            assert len(actual) == len(expected), name
+            continue
+        key = list(expected.columns)
+        assert_same_result(actual.sort_values(key, ignore_index=True), expected.sort_values(key, ignore_index=True))
+
+
+@pytest.mark.parametrize('date_range', RANGES, ids=DateRange.describe)
+def test_month_index_selects_the_range(stops, date_range):
+    expected = np.flatnonzero(date_range.mask(stops['stop_date']))
+    np.testing.assert_array_equal(MonthIndex(stops).select(date_range), expected)
+
+
+def test_month_index_includes_logged_rows(stops):
+    index = MonthIndex(stops.iloc[:15_000].reset_index(drop=True))
+    index.update(stops.iloc[15_000:])
+    date_range = RANGES[1]
+    frame = index.frame(date_range)
+    assert len(frame) == date_range.mask(stops['stop_date']).sum()
+    assert index.bounds() == (stops['stop_date'].min().date(), stops['stop_date'].max().date())
+    assert index.select(None) is None
@@ -0,0 +1,56 @@
+import pytest
+
+from securecheck import rollups
+from securecheck.backends import DuckDBBackend, to_duckdb
+from securecheck.catalog import iter_queries
+
+from test_scan import assert_same_result
+
+pytest.importorskip('duckdb')
+
+CATALOG = {name: sql for _, name, sql in iter_queries()}
+
+MEASURE_NAMES = ['stops', 'arrests', 'searches', 'drug_stops', 'search_or_arrest']
+
+
+def _build_rollups(backend):
+    # What rollups.refresh writes on MySQL, with the generated calendar columns inlined
+    measures = [m.strip() for m in rollups.MEASURES.strip().split(',\n')]
+    for table, (_, columns, expressions) in rollups.ROLLUPS.items():
+        backend._conn.execute(to_duckdb("""
+            CREATE TABLE {table} AS
+            SELECT {expressions}, {measures}
+            FROM (SELECT *, YEAR(stop_date) AS stop_year, MONTH(stop_date) AS stop_month,
+                         HOUR(stop_time) AS stop_hour FROM traffic_stops) AS t
+            GROUP BY {positions}
+        """.format(
+            table=table,
+            expressions=', '.join(f"{e} AS {c}" for e, c in zip(expressions, columns)),
+            measures=', '.join(f"{m} AS {n}" for m, n in zip(measures, MEASURE_NAMES)),
+            positions=', '.join(str(i + 1) for i in range(len(columns)))
+        )))
+
+
+@pytest.fixture(scope='module')
+def rollup_backend(stops):
+    frame = stops.copy()
+    # Unknown races and ages, which the rollups store as '' and -1
+    frame.loc[frame.index[::37], 'driver_race'] = None
+    frame.loc[frame.index[::41], 'driver_age'] = None
+    backend = DuckDBBackend(frame, 'test')
+    _build_rollups(backend)
+    return backend
+
+
+@pytest.mark.parametrize('name', sorted(rollups.ROLLUP_QUERIES))
+def test_rollup_queries_match_the_catalog_sql(rollup_backend, name):
+    actual = rollup_backend.run(rollups.ROLLUP_QUERIES[name])
+    expected = rollup_backend.run(CATALOG[name])
+    # Ties in the ORDER BY may come in any order
+    keys = list(expected.columns)
+    assert_same_result(actual.sort_values(keys), expected.sort_values(keys))
+
+
+def test_age_and_race_trends_leave_out_unknown_races(rollup_backend):
+    result = rollup_backend.run(rollups.ROLLUP_QUERIES["Driver Violation Trends Based on Age and Race"])
+    assert result['driver_race'].notna().all()
@@ -0,0 +1,43 @@
+import pandas as pd
+import pytest
+
+from securecheck.backends import DuckDBBackend
+from securecheck.catalog import iter_queries
+from securecheck.scan import SCAN_QUERIES, SharedScan, answer
+
+pytest.importorskip('duckdb')
+
+CATALOG = {name: sql for _, name, sql in iter_queries()}
+
+
+def assert_same_result(actual, expected):
+    assert list(actual.columns) == list(expected.columns)
+    pd.testing.assert_frame_equal(actual.reset_index(drop=True).astype(object),
+                                  expected.reset_index(drop=True).astype(object),
+                                  check_dtype=False, check_exact=False, rtol=1e-9)
+
+
+@pytest.fixture(scope='module')
+def duckdb_backend(stops):
+    return DuckDBBackend(stops, 'test')
+
+
+def test_scan_queries_are_catalog_queries():
+    assert set(SCAN_QUERIES) <= set(CATALOG)
+
+
+@pytest.mark.parametrize('name', sorted(SCAN_QUERIES))
+def test_shared_scan_matches_sql(stops, duckdb_backend, name):
+    results, _ = answer(SharedScan(stops))
+    assert_same_result(results[name], duckdb_backend.run(CATALOG[name]))
+
+
+def test_appended_rows_match_sql_over_all_rows(stops):
+    loaded, logged = stops.iloc[:15_000], stops.iloc[15_000:]
+    scan = SharedScan(loaded.reset_index(drop=True))
+    scan.append(logged.iloc[:2_000].reset_index(drop=True))
+    scan.append(logged.iloc[2_000:].reset_index(drop=True))
+    backend = DuckDBBackend(stops, 'test')
+    results, _ = answer(scan)
+    for name in SCAN_QUERIES:
+        assert_same_result(results[name], backend.run(CATALOG[name]))
@@ -0,0 +1,68 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from securecheck.vehicles import COUNTERS, TOP_VIEWS, BloomFilter, TopK, VehicleIndex
+
+
+def exact_top(frame, view, k=10):
+    flags = frame['vehicle_number'].notna()
+    if COUNTERS[view] is None:
+        counts = frame.loc[flags, 'vehicle_number'].value_counts()
+    else:
+        values = pd.to_numeric(frame[COUNTERS[view]], errors='coerce').fillna(0)
+        counts = values[flags].groupby(frame.loc[flags, 'vehicle_number']).sum().astype(int)
+    counts = counts[counts > 0]
+    ranked = sorted(counts.items(), key=lambda item: (-item[1], item[0]))
+    return [(vehicle, int(count)) for vehicle, count in ranked[:k]]
+
+
+def test_bloom_filter_has_no_false_negatives_and_about_its_error_rate():
+    members = [f"TN{i:08d}" for i in range(20_000)]
+    bloom = BloomFilter(len(members), error_rate=0.01)
+    bloom.add(members)
+    assert all(member in bloom for member in members[::7])
+    strangers = [f"KL{i:08d}" for i in range(50_000)]
+    false_positives = sum(stranger in bloom for stranger in strangers)
+    assert false_positives / len(strangers) < 0.02
+
+
+def test_top_k_breaks_ties_by_vehicle_number():
+    top = TopK(3)
+    for vehicle, count in [('B', 2), ('A', 2), ('C', 5), ('D', 1), ('E', 2)]:
+        top.offer(vehicle, count)
+    assert top.items() == [('C', 5), ('A', 2), ('B', 2)]
+    top.offer('D', 6)
+    assert top.items() == [('D', 6), ('C', 5), ('A', 2)]
+
+
+@pytest.mark.parametrize('view', TOP_VIEWS)
+def test_top_views_match_exact_counts(stops, view):
+    assert VehicleIndex(stops).top(view) == exact_top(stops, view)
+
+
+@pytest.mark.parametrize('view', TOP_VIEWS)
+def test_top_views_with_mostly_unique_plates(stops, view):
+    frame = stops.head(2_000).copy()
+    frame['vehicle_number'] = [f"TN{i:06d}" for i in range(len(frame))]
+    frame.loc[[5, 9, 11], 'vehicle_number'] = 'TN000700'
+    assert VehicleIndex(frame).top(view) == exact_top(frame, view)
+
+
+def test_update_matches_a_rebuilt_index(stops):
+    loaded, logged = stops.iloc[:15_000].reset_index(drop=True), stops.iloc[15_000:]
+    index = VehicleIndex(loaded)
+    index.update(logged.iloc[:3_000])
+    index.update(logged.iloc[3_000:])
+    rebuilt = VehicleIndex(stops.reset_index(drop=True))
+    for view in TOP_VIEWS:
+        assert index.top(view) == rebuilt.top(view)
+    vehicle = logged['vehicle_number'].dropna().iloc[-1]
+    history, expected = index.lookup(vehicle), rebuilt.lookup(vehicle)
+    assert history._replace(offsets=None) == expected._replace(offsets=None)
+    np.testing.assert_array_equal(np.sort(history.offsets), np.sort(expected.offsets))
+    assert len(index.rows(history)) == history.stops
+
+
+def test_unknown_plate_has_no_history(stops):
+    assert VehicleIndex(stops).lookup('ZZ999999') is None